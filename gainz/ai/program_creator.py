@@ -1,5 +1,6 @@
 from gainz.workouts.models import Program, Routine, ProgramRoutine, RoutineExercise, RoutineExerciseSet
 from gainz.exercises.models import Exercise, ExerciseAlternativeName
+from gainz.exercises.name_index import find_similar_exercise
 import re
 
 
@@ -149,22 +150,10 @@ class AIProgramCreator:
         clean_name = self._clean_exercise_name(exercise_name)
         print(f"[DEBUG] Looking for exercise: '{exercise_name}' (cleaned: '{clean_name}')")
 
-        # First, try exact match (case-insensitive)
-        exercise = Exercise.objects.filter(name__iexact=clean_name).first()
+        # Exact name, alternative name, then fuzzy match via the shared name index
+        exercise = find_similar_exercise(clean_name)
         if exercise:
-            print(f"[DEBUG] Found exact match: {exercise.name}")
-            return exercise
-
-        # Try matching with alternative names
-        for alt_name in ExerciseAlternativeName.objects.all():
-            if alt_name.name.lower() == clean_name.lower():
-                print(f"[DEBUG] Found alternative name match: {alt_name.exercise.name}")
-                return alt_name.exercise
-
-        # Try fuzzy matching with existing exercises
-        exercise = self._fuzzy_match_exercise(clean_name)
-        if exercise:
-            print(f"[DEBUG] Found fuzzy match: {exercise.name}")
+            print(f"[DEBUG] Found match: {exercise.name}")
             return exercise
 
         # If no match found, create a new exercise
@@ -177,59 +166,6 @@ class AIProgramCreator:
         cleaned = re.sub(r'\s+', ' ', name.strip())
         return cleaned.title()
 
-    def _fuzzy_match_exercise(self, search_name):
-        """Fuzzy match exercise names"""
-        search_name_lower = search_name.lower()
-
-        # Get all exercises with their alternative names
-        all_exercises = Exercise.objects.all()
-
-        best_match = None
-        best_score = 0
-
-        for exercise in all_exercises:
-            # Check main name
-            score = self._calculate_similarity(search_name_lower, exercise.name.lower())
-            if score > best_score:
-                best_score = score
-                best_match = exercise
-
-            # Check alternative names
-            for alt_name in exercise.alternative_names.all():
-                score = self._calculate_similarity(search_name_lower, alt_name.name.lower())
-                if score > best_score:
-                    best_score = score
-                    best_match = exercise
-
-        # Return match if similarity is high enough (70% or more)
-        if best_score >= 0.7:
-            print(f"[DEBUG] Fuzzy match found with {best_score:.2f} similarity: {best_match.name}")
-            return best_match
-
-        return None
-
-    def _calculate_similarity(self, str1, str2):
-        """Calculate similarity between two strings (simple implementation)"""
-        # Simple similarity calculation
-        if str1 == str2:
-            return 1.0
-
-        # Check if one contains the other
-        if str1 in str2 or str2 in str1:
-            return 0.8
-
-        # Check for common words
-        words1 = set(str1.split())
-        words2 = set(str2.split())
-
-        if words1 and words2:
-            intersection = words1.intersection(words2)
-            union = words1.union(words2)
-            if union:
-                return len(intersection) / len(union)
-
-        return 0.0
-
     def _create_new_exercise(self, exercise_name):
         """Create a new exercise with appropriate category"""
         # Determine category based on exercise name
@@ -0,0 +1,65 @@
+"""Background jobs for the AI program creator (run by the RQ worker)."""
+
+import json
+
+from gainz.ai.services import WorkoutProgramAI, ConversationManager
+
+FORCE_GENERATION_MESSAGES = [
+    'generate now',
+    'please generate a workout program with the information we have so far',
+    'generate program now',
+    'create program',
+]
+ACCEPT_PROGRAM_MESSAGES = ['accept this program', 'accept program']
+
+
+def is_accept_message(user_input):
+    """Accepting a program is answered locally without calling the AI."""
+    return user_input.lower() in ACCEPT_PROGRAM_MESSAGES
+
+
+def process_conversation_turn(user_id, session_id, user_input):
+    """
+    Answer one user message of an AI program conversation and store both
+    messages in the conversation history. Returns the AI response dict.
+    """
+    conversation_manager = ConversationManager()
+
+    # Get conversation history
+    conversation_history = conversation_manager.get_conversation(user_id, session_id)
+
+    # Add user message to history
+    conversation_history.append({
+        'role': 'user',
+        'content': user_input
+    })
+
+    # Check if this is a program generation request
+    if user_input.lower() in FORCE_GENERATION_MESSAGES:
+        # Use the specialized force generation method
+        ai_response = WorkoutProgramAI().force_program_generation(conversation_history)
+        print(f"[DEBUG] Force Generate Response: {ai_response}")  # Debug logging
+
+        # Log program generation attempt
+        if ai_response.get('type') == 'program_generated':
+            conversation_manager.log_outcome(user_id, session_id, program_generated=True)
+    elif is_accept_message(user_input):
+        # User wants to accept the program - trigger the finalize flow
+        ai_response = {
+            "type": "accept_program",
+            "message": "Perfect! Let me create this program for you in the app."
+        }
+    else:
+        # Normal conversation
+        ai_response = WorkoutProgramAI().process_conversation(user_input, conversation_history)
+
+    # Add AI response to history
+    conversation_history.append({
+        'role': 'assistant',
+        'content': json.dumps(ai_response) if isinstance(ai_response, dict) else ai_response
+    })
+
+    # Save updated conversation
+    conversation_manager.save_conversation(user_id, session_id, conversation_history)
+
+    return ai_response
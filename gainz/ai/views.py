@@ -2,12 +2,14 @@ import json
 import uuid
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from gainz.utils.json_rendering import FastJsonResponse as JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
 
-from gainz.ai.services import WorkoutProgramAI, ConversationManager
+from gainz.ai.services import ConversationManager
+from gainz.ai.tasks import is_accept_message, process_conversation_turn
 from gainz.ai.program_creator import AIProgramCreator
+from gainz.utils.background_jobs import enqueue_user_job
 
 
 @login_required
@@ -34,48 +36,42 @@ def ai_conversation(request):
     if not user_input or not session_id:
         return JsonResponse({'error': 'Message and session_id required'}, status=400)
 
-    # Initialize services
-    ai_service = WorkoutProgramAI()
-    conversation_manager = ConversationManager()
-
-    # Get conversation history
-    conversation_history = conversation_manager.get_conversation(request.user.id, session_id)
-
-    # Add user message to history
-    conversation_history.append({
-        'role': 'user',
-        'content': user_input
-    })
-
-        # Check if this is a program generation request
-    if user_input.lower() in ['generate now', 'please generate a workout program with the information we have so far', 'generate program now', 'create program']:
-        # Use the specialized force generation method
-        ai_response = ai_service.force_program_generation(conversation_history)
-        print(f"[DEBUG] Force Generate Response: {ai_response}")  # Debug logging
-
-        # Log program generation attempt
-        if ai_response.get('type') == 'program_generated':
-            conversation_manager.log_outcome(request.user.id, session_id, program_generated=True)
-    elif user_input.lower() in ['accept this program', 'accept program']:
-        # User wants to accept the program - trigger the finalize flow
-        ai_response = {
-            "type": "accept_program",
-            "message": "Perfect! Let me create this program for you in the app."
-        }
-    else:
-        # Normal conversation
-        ai_response = ai_service.process_conversation(user_input, conversation_history)
-
-    # Add AI response to history
-    conversation_history.append({
-        'role': 'assistant',
-        'content': json.dumps(ai_response) if isinstance(ai_response, dict) else ai_response
-    })
-
-    # Save updated conversation
-    conversation_manager.save_conversation(request.user.id, session_id, conversation_history)
-
-    return JsonResponse(ai_response)
+    if is_accept_message(user_input):
+        # No AI call involved, answer right away
+        return JsonResponse(process_conversation_turn(request.user.id, session_id, user_input))
+
+    # The Gemini call can take up to 30 seconds, so it runs on the RQ worker
+    # and the client polls the job status endpoint for the response
+    job = enqueue_user_job(
+        request.user.id,
+        process_conversation_turn,
+        request.user.id, session_id, user_input,
+        dedup_key=f"ai_conversation:{request.user.id}:{session_id}",
+        retries=2,
+    )
+
+    if job['deduplicated']:
+        return JsonResponse({
+            'type': 'error',
+            'message': 'Still working on your previous message, please wait a moment.',
+            'job_id': job['job_id'],
+            'status_url': job['status_url'],
+        }, status=409)
+
+    if job['job_id'] is None:
+        # Ran inline (no Redis): respond like before
+        if job['status'] == 'failed':
+            return JsonResponse({
+                'type': 'error',
+                'message': "Sorry, I'm having trouble connecting to the AI service. Please try again."
+            })
+        return JsonResponse(job['result'])
+
+    return JsonResponse({
+        'type': 'pending',
+        'job_id': job['job_id'],
+        'status_url': job['status_url'],
+    }, status=202)
 
 
 @csrf_exempt
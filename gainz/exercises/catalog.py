@@ -0,0 +1,241 @@
+"""
+Exercise Catalog Cache
+
+The exercise catalog (categories, built-in exercises and each user's custom
+exercises) backs the add-exercise dropdowns, the exercise library and the
+catalog API. It changes rarely, so it is cached in two parts:
+
+- the global part: categories and built-in exercises, shared by everyone
+- a per-user part: that user's custom exercises
+
+Each part carries a version stamp in the cache (Redis): the global stamp is
+bumped when a built-in exercise, category or category assignment changes
+(admin edits, data loads), a user's stamp when one of their custom
+exercises changes (ExerciseViewSet writes). A user's part is keyed by both
+stamps, since its exercises refer to categories (deleting one sends no
+m2m_changed for the assignments it cascades). Parts are stored in Redis as
+JSON keyed by their version and kept in a small per-process LRU in front of
+it, so a page load costs one cache read for the stamps and usually nothing
+else.
+
+When the cache is unreachable the local copies are trusted for
+LOCAL_CATALOG_TTL_SECONDS, like the exercise name index.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from gainz.utils.version_stamps import bump_version, current_versions
+
+from .models import Exercise, ExerciseCategory
+
+GLOBAL_VERSION_KEY = 'exercise_catalog_version'
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # Parts are keyed by version, so this only bounds memory
+LOCAL_CATALOG_SIZE = 256  # Catalog parts kept per process (the global part plus active users)
+LOCAL_CATALOG_TTL_SECONDS = 60
+
+EXERCISE_TYPE_LABELS = dict(Exercise.EXERCISE_TYPE_CHOICES)
+
+
+def user_version_key(user_id: int) -> str:
+    return f"exercise_catalog_version:user:{user_id}"
+
+
+def _part_key(part: str, version) -> str:
+    return f"exercise_catalog:{part}:v{version}"
+
+
+@dataclass
+class CatalogExercise:
+    """Read-only exercise row from the catalog; quacks like Exercise in templates."""
+    id: int
+    name: str
+    description: str
+    exercise_type: str
+    category_ids: List[int] = field(default_factory=list)
+    is_custom: bool = False
+    user_id: Optional[int] = None
+
+    @property
+    def pk(self) -> int:
+        return self.id
+
+    def get_exercise_type_display(self) -> str:
+        return EXERCISE_TYPE_LABELS.get(self.exercise_type, self.exercise_type)
+
+    def get_category_ids_string(self) -> str:
+        return ','.join(str(category_id) for category_id in self.category_ids)
+
+    def as_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'exercise_type': self.exercise_type,
+            'category_ids': self.category_ids,
+            'is_custom': self.is_custom,
+        }
+
+
+@dataclass
+class CatalogPart:
+    """One cached part of the catalog and the hash of its JSON."""
+    categories: List[Dict]
+    exercises: List[CatalogExercise]
+    digest: str
+
+
+@dataclass
+class ExerciseCatalog:
+    """The catalog as one user sees it: categories, built-ins and their custom exercises."""
+    categories: List[Dict]
+    exercises: List[CatalogExercise]
+    version: str
+    digest: str
+
+    def categories_by_id(self) -> Dict[int, Dict]:
+        return {category['id']: category for category in self.categories}
+
+    def as_dict(self) -> Dict:
+        return {
+            'version': self.version,
+            'hash': self.digest,
+            'categories': self.categories,
+            'exercises': [exercise.as_dict() for exercise in self.exercises],
+        }
+
+
+def _build_part(user_id: Optional[int]) -> Dict:
+    """Query one part from the database: built-ins and categories, or one user's custom exercises."""
+    if user_id is None:
+        exercises = Exercise.objects.filter(is_custom=False)
+        categories = list(ExerciseCategory.objects.order_by('name', 'id').values('id', 'name'))
+    else:
+        exercises = Exercise.objects.filter(is_custom=True, user_id=user_id)
+        categories = []
+
+    category_ids: Dict[int, List[int]] = {}
+    links = Exercise.categories.through.objects.filter(exercise__in=exercises.values('id'))
+    for exercise_id, category_id in links.order_by('exercisecategory_id').values_list('exercise_id', 'exercisecategory_id'):
+        category_ids.setdefault(exercise_id, []).append(category_id)
+
+    rows = [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'exercise_type': row['exercise_type'],
+            'category_ids': category_ids.get(row['id'], []),
+            'is_custom': row['is_custom'],
+            'user_id': row['user_id'],
+        }
+        for row in exercises.order_by('name', 'id').values(
+            'id', 'name', 'description', 'exercise_type', 'is_custom', 'user_id'
+        )
+    ]
+    return {'categories': categories, 'exercises': rows}
+
+
+def _to_part(data: Dict, payload: str) -> CatalogPart:
+    return CatalogPart(
+        categories=data['categories'],
+        exercises=[CatalogExercise(**row) for row in data['exercises']],
+        digest=hashlib.sha1(payload.encode('utf-8')).hexdigest(),
+    )
+
+
+class _LocalCatalogs:
+    """Per-process LRU of catalog parts by (part, version)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.parts: 'OrderedDict[Tuple[str, object], Tuple[CatalogPart, float]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, max_age: Optional[float] = None) -> Optional[CatalogPart]:
+        with self.lock:
+            entry = self.parts.get(key)
+            if entry is None:
+                return None
+            part, built_at = entry
+            if max_age is not None and time.monotonic() - built_at > max_age:
+                del self.parts[key]
+                return None
+            self.parts.move_to_end(key)
+            return part
+
+    def put(self, key, part: CatalogPart) -> None:
+        with self.lock:
+            self.parts[key] = (part, time.monotonic())
+            self.parts.move_to_end(key)
+            while len(self.parts) > self.size:
+                self.parts.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.parts.clear()
+
+
+_local = _LocalCatalogs(LOCAL_CATALOG_SIZE)
+
+
+def _get_part(user_id: Optional[int], version) -> CatalogPart:
+    part_name = 'global' if user_id is None else f"user:{user_id}"
+    local_key = (part_name, version)
+    part = _local.get(local_key, max_age=LOCAL_CATALOG_TTL_SECONDS if version is None else None)
+    if part is not None:
+        return part
+
+    payload = None
+    if version is not None:
+        try:
+            payload = cache.get(_part_key(part_name, version))
+        except Exception as e:
+            print(f"Exercise catalog cache unavailable: {e}")
+    if payload is None:
+        payload = json.dumps(_build_part(user_id), separators=(',', ':'))
+        if version is not None:
+            try:
+                cache.set(_part_key(part_name, version), payload, CATALOG_CACHE_TIMEOUT)
+            except Exception as e:
+                print(f"Could not cache exercise catalog: {e}")
+
+    part = _to_part(json.loads(payload), payload)
+    _local.put(local_key, part)
+    return part
+
+
+def get_exercise_catalog(user) -> ExerciseCatalog:
+    """Categories, built-in exercises and the user's custom exercises, sorted by name."""
+    global_version, user_version = current_versions([GLOBAL_VERSION_KEY, user_version_key(user.id)])
+    shared = _get_part(None, global_version)
+    # Custom parts list category ids, so a category change (e.g. a delete) stales them too
+    custom_version = f"{global_version}.{user_version}" if None not in (global_version, user_version) else None
+    custom = _get_part(user.id, custom_version)
+
+    exercises = shared.exercises
+    if custom.exercises:
+        exercises = sorted(shared.exercises + custom.exercises, key=lambda exercise: (exercise.name, exercise.id))
+    return ExerciseCatalog(
+        categories=shared.categories,
+        exercises=exercises,
+        version=f"{global_version}.{user_version}",
+        digest=hashlib.sha1(f"{shared.digest}:{custom.digest}".encode('ascii')).hexdigest()[:16],
+    )
+
+
+def invalidate_exercise_catalog(user_id: Optional[int] = None) -> None:
+    """
+    Bump the version of a user's custom exercises, or of the global part
+    (built-ins and categories) when `user_id` is None. Other processes pick
+    up the new version on their next read; this one drops its copies now.
+    """
+    bump_version(GLOBAL_VERSION_KEY if user_id is None else user_version_key(user_id))
+    _local.clear()
@@ -104,53 +104,28 @@ class Exercise(models.Model):
         1. User-specific exercise timer override
         2. User's default timer preference for exercise type
         3. System defaults (180s for primary, 120s for secondary, 90s for accessory)
+
+        Workout pages also layer routine and program settings on top; see
+        gainz/workouts/timers.py.
         """
-        # Check for user-specific override first
-        try:
-            override = user.exercise_timer_overrides.get(exercise=self)
-            return override.timer_seconds
-        except:
-            pass
-        
-        # Fall back to user's default preferences for exercise type
-        try:
-            preferences = user.timer_preferences
-            if self.exercise_type == 'primary':
-                return preferences.primary_timer_seconds
-            elif self.exercise_type == 'secondary':
-                return preferences.secondary_timer_seconds
-            else:  # accessory
-                return preferences.accessory_timer_seconds
-        except:
-            pass
-        
-        # Final fallback to system defaults
-        if self.exercise_type == 'primary':
-            return 180
-        elif self.exercise_type == 'secondary':
-            return 120
-        else:  # accessory
-            return 90
+        from gainz.workouts.timers import get_timer_profile
+        return get_timer_profile(user.id).resolve(self.id, self.exercise_type)['timer_seconds']
 
     def get_auto_start_timer_setting(self, user):
         """
         Get the auto-start timer setting for this user.
         Returns False if user has no preferences set.
         """
-        try:
-            return user.timer_preferences.auto_start_timer
-        except:
-            return False
+        from gainz.workouts.timers import get_timer_profile
+        return get_timer_profile(user.id).auto_start
 
     def get_timer_sound_setting(self, user):
         """
         Get the timer sound setting for this user.
         Returns True if user has no preferences set (default enabled).
         """
-        try:
-            return user.timer_preferences.timer_sound_enabled
-        except:
-            return True
+        from gainz.workouts.timers import get_timer_profile
+        return get_timer_profile(user.id).sound_enabled
 
     def get_category_ids_string(self):
         """
@@ -171,4 +146,49 @@ class ExerciseAlternativeName(models.Model):
         verbose_name_plural = "Exercise Alternative Names"
 
     def __str__(self):
-        return f"{self.exercise.name} - {self.name}"
\ No newline at end of file
+        return f"{self.exercise.name} - {self.name}"
+
+
+# Signal handlers to keep the in-memory exercise name index fresh
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+@receiver(post_save, sender=ExerciseAlternativeName)
+@receiver(post_delete, sender=ExerciseAlternativeName)
+def invalidate_exercise_name_index_on_change(sender, **kwargs):
+    """Rebuild the exercise name index after an exercise or alternative name changes"""
+    from gainz.exercises.name_index import invalidate_exercise_name_index
+    invalidate_exercise_name_index()
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def invalidate_exercise_catalog_on_exercise_change(sender, instance, **kwargs):
+    """Bump the catalog version of the part (built-ins or the owner's custom exercises) that changed"""
+    from gainz.exercises.catalog import invalidate_exercise_catalog
+    if instance.user_id:
+        invalidate_exercise_catalog(instance.user_id)
+    if not instance.is_custom:
+        invalidate_exercise_catalog()
+
+
+@receiver(m2m_changed, sender=Exercise.categories.through)
+def invalidate_exercise_catalog_on_categories_change(sender, instance, action, **kwargs):
+    """Category assignments are part of the catalog too"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Exercise):
+        invalidate_exercise_catalog_on_exercise_change(Exercise, instance)
+    else:
+        from gainz.exercises.catalog import invalidate_exercise_catalog
+        invalidate_exercise_catalog()
+
+
+@receiver(post_save, sender=ExerciseCategory)
+@receiver(post_delete, sender=ExerciseCategory)
+def invalidate_exercise_catalog_on_category_change(sender, **kwargs):
+    """Categories live in the global part of the catalog"""
+    from gainz.exercises.catalog import invalidate_exercise_catalog
+    invalidate_exercise_catalog()
@@ -0,0 +1,251 @@
+"""
+Exercise Name Index
+
+In-memory lookup of exercises by name and alternative name, shared by the
+workout text importer and the AI program creator. The index is built once per
+process from two queries and holds:
+
+- a hash map from normalized name to exercise id for exact matches
+- a token inverted index and a trigram inverted index that narrow fuzzy
+  matching down to a handful of candidate names
+
+A version stamp in the cache is bumped whenever an exercise or alternative
+name changes, so every process rebuilds its copy on the next lookup.
+"""
+
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from gainz.utils.version_stamps import bump_version, current_version
+
+from .models import Exercise, ExerciseAlternativeName
+
+INDEX_VERSION_KEY = 'exercise_name_index_version'
+# Rebuild at least this often when the cache holding the version is unreachable
+LOCAL_INDEX_TTL_SECONDS = 60
+
+
+def normalize_exercise_name(name: str) -> str:
+    """Lowercase and collapse whitespace so lookups ignore case and spacing."""
+    return re.sub(r'\s+', ' ', (name or '').strip().lower())
+
+
+def _trigrams(value: str) -> Set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def name_similarity(str1: str, str2: str) -> float:
+    """Similarity used for fuzzy matching: exact, containment, then word overlap."""
+    if str1 == str2:
+        return 1.0
+
+    # Check if one contains the other
+    if str1 in str2 or str2 in str1:
+        return 0.8
+
+    # Check for common words
+    words1 = set(str1.split())
+    words2 = set(str2.split())
+
+    if words1 and words2:
+        intersection = words1.intersection(words2)
+        union = words1.union(words2)
+        if union:
+            return len(intersection) / len(union)
+
+    return 0.0
+
+
+class ExerciseNameIndex:
+    """Exact and fuzzy exercise name lookups over a snapshot of all names."""
+
+    def __init__(self, names: Iterable[Tuple[int, str, bool]]):
+        """
+        Args:
+            names: (exercise_id, name, is_alternative) tuples in priority
+                order; main names should come before alternative names of
+                the same exercise.
+        """
+        self.entries: List[Tuple[int, str]] = []
+        self.exact_names: Dict[str, int] = {}
+        self.token_index: Dict[str, Set[int]] = defaultdict(set)
+        self.trigram_index: Dict[str, Set[int]] = defaultdict(set)
+        self.trigram_counts: List[int] = []
+        self.short_entries: List[int] = []  # Names too short for trigrams
+
+        alternative_names: Dict[str, int] = {}
+        for exercise_id, name, is_alternative in names:
+            normalized = normalize_exercise_name(name)
+            if not normalized:
+                continue
+
+            position = len(self.entries)
+            self.entries.append((exercise_id, normalized))
+            if is_alternative:
+                alternative_names.setdefault(normalized, exercise_id)
+            else:
+                self.exact_names.setdefault(normalized, exercise_id)
+
+            for token in normalized.split():
+                self.token_index[token].add(position)
+
+            trigrams = _trigrams(normalized)
+            self.trigram_counts.append(len(trigrams))
+            if trigrams:
+                for trigram in trigrams:
+                    self.trigram_index[trigram].add(position)
+            else:
+                self.short_entries.append(position)
+
+        # Main names win over alternative names of other exercises
+        for normalized, exercise_id in alternative_names.items():
+            self.exact_names.setdefault(normalized, exercise_id)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def exact(self, name: str) -> Optional[int]:
+        """Exercise id whose name or alternative name equals `name` (case-insensitive)."""
+        return self.exact_names.get(normalize_exercise_name(name))
+
+    def _containment_candidates(self, normalized: str) -> Set[int]:
+        """Entries that may contain, or be contained in, the search string."""
+        search_trigrams = _trigrams(normalized)
+        if not search_trigrams:
+            # Too short to index: any name containing it is a candidate
+            return set(range(len(self.entries)))
+
+        # Entry contains the search -> it has every trigram of the search
+        postings = [self.trigram_index.get(trigram, set()) for trigram in search_trigrams]
+        containing = set.intersection(*postings) if postings else set()
+
+        # Search contains the entry -> every trigram of the entry is in the search
+        hits: Dict[int, int] = defaultdict(int)
+        for posting in postings:
+            for position in posting:
+                hits[position] += 1
+        contained = {position for position, count in hits.items() if count == self.trigram_counts[position]}
+
+        return containing | contained | set(self.short_entries)
+
+    def find_containing(self, name: str) -> Optional[int]:
+        """
+        First exercise (by priority order) with a name containing, or contained
+        in, `name`; mirrors Exercise.matches_name.
+        """
+        normalized = normalize_exercise_name(name)
+        if not normalized:
+            return None
+
+        exercise_id = self.exact_names.get(normalized)
+        if exercise_id is not None:
+            return exercise_id
+
+        for position in sorted(self._containment_candidates(normalized)):
+            exercise_id, entry = self.entries[position]
+            if normalized in entry or entry in normalized:
+                return exercise_id
+        return None
+
+    def best_match(self, name: str, threshold: float = 0.7) -> Tuple[Optional[int], float]:
+        """
+        Exercise with the most similar name, if the similarity reaches
+        `threshold`. Returns (exercise_id, score).
+        """
+        normalized = normalize_exercise_name(name)
+        if not normalized:
+            return None, 0.0
+
+        exercise_id = self.exact_names.get(normalized)
+        if exercise_id is not None:
+            return exercise_id, 1.0
+
+        candidates = self._containment_candidates(normalized)
+        for token in normalized.split():
+            candidates |= self.token_index.get(token, set())
+
+        best_id, best_score = None, 0.0
+        for position in sorted(candidates):
+            candidate_id, entry = self.entries[position]
+            score = name_similarity(normalized, entry)
+            if score > best_score:
+                best_id, best_score = candidate_id, score
+
+        if best_score >= threshold:
+            return best_id, best_score
+        return None, best_score
+
+
+def build_exercise_name_index(exercises=None) -> ExerciseNameIndex:
+    """
+    Build a fresh index from the database (two queries).
+
+    `exercises` optionally narrows the index to a queryset, e.g. the
+    exercises visible to one user.
+    """
+    if exercises is None:
+        exercises = Exercise.objects.all()
+
+    names: Dict[int, List[Tuple[str, bool]]] = defaultdict(list)
+    for exercise_id, name in exercises.order_by('id').values_list('id', 'name'):
+        names[exercise_id].append((name, False))
+    alternative_names = ExerciseAlternativeName.objects.filter(exercise__in=exercises.values('id'))
+    for exercise_id, name in alternative_names.order_by('id').values_list('exercise_id', 'name'):
+        if exercise_id in names:
+            names[exercise_id].append((name, True))
+
+    return ExerciseNameIndex(
+        (exercise_id, name, is_alternative)
+        for exercise_id in sorted(names)
+        for name, is_alternative in names[exercise_id]
+    )
+
+
+_lock = threading.Lock()
+_index: Optional[ExerciseNameIndex] = None
+_index_version = None
+_index_built_at = 0.0
+
+
+def get_exercise_name_index() -> ExerciseNameIndex:
+    """Return this process's index, rebuilding it if exercises changed since it was built."""
+    global _index, _index_version, _index_built_at
+
+    version = current_version(INDEX_VERSION_KEY)
+    with _lock:
+        stale = _index is None or version != _index_version
+        if version is None:
+            stale = stale or time.monotonic() - _index_built_at > LOCAL_INDEX_TTL_SECONDS
+        if stale:
+            _index = build_exercise_name_index()
+            _index_version = version
+            _index_built_at = time.monotonic()
+        return _index
+
+
+def invalidate_exercise_name_index() -> None:
+    """Drop the local index and bump the shared version so other processes rebuild too."""
+    global _index
+    with _lock:
+        _index = None
+    bump_version(INDEX_VERSION_KEY)
+
+
+def _get_exercise(exercise_id: Optional[int]) -> Optional[Exercise]:
+    if exercise_id is None:
+        return None
+    return Exercise.objects.filter(pk=exercise_id).first()
+
+
+def find_exercise_by_name(name: str) -> Optional[Exercise]:
+    """Exact name or alternative name match, else the first containment match."""
+    return _get_exercise(get_exercise_name_index().find_containing(name))
+
+
+def find_similar_exercise(name: str, threshold: float = 0.7) -> Optional[Exercise]:
+    """Exact name or alternative name match, else the most similar name above `threshold`."""
+    exercise_id, _ = get_exercise_name_index().best_match(name, threshold)
+    return _get_exercise(exercise_id)
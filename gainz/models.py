@@ -12,6 +12,7 @@ from gainz.exercises.models import (
 from gainz.workouts.models import (
     Program,
     ProgramRoutine,
+    ProgramSchedule,
     Routine,
     RoutineExercise,
     RoutineExerciseSet,
@@ -19,10 +20,18 @@ from gainz.workouts.models import (
     WorkoutExercise,
     ExerciseSet,
     UserTimerPreference,
+    UserPreference,
     ExerciseTimerOverride,
     PersonalRecord,
+    ExerciseBest,
+    WorkoutImportJob,
+    SetOperation,
+    SyncState,
+    SyncChange,
     ProgramTimerPreference,
     RoutineTimerPreference,
+    DailyExerciseRollup,
+    WeeklyExerciseRollup,
 )
 
 # Social app models
@@ -48,6 +57,7 @@ __all__ = [
     # Workouts
     'Program',
     'ProgramRoutine',
+    'ProgramSchedule',
     'Routine',
     'RoutineExercise',
     'RoutineExerciseSet',
@@ -55,10 +65,18 @@ __all__ = [
     'WorkoutExercise',
     'ExerciseSet',
     'UserTimerPreference',
+    'UserPreference',
     'ExerciseTimerOverride',
     'PersonalRecord',
+    'ExerciseBest',
+    'WorkoutImportJob',
+    'SetOperation',
+    'SyncState',
+    'SyncChange',
     'ProgramTimerPreference',
     'RoutineTimerPreference',
+    'DailyExerciseRollup',
+    'WeeklyExerciseRollup',
 
     # Social
     'UserProfile',
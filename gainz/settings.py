@@ -68,6 +68,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'corsheaders',
     'debug_toolbar',
+    'django_rq',  # Background job queue (manage.py rqworker)
 
     # Local apps
     'gainz.exercises',  # Full path to the app
@@ -278,55 +279,54 @@ MEDIA_ROOT = BASE_DIR / 'mediafiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST Framework: render JSON with orjson (gainz/utils/json_rendering.py)
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'gainz.utils.json_rendering.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 # Authentication Settings
 LOGIN_REDIRECT_URL = '/'  # Redirect to homepage after login
 LOGIN_URL = 'login'       # URL name of the login view
 
 # RQ Queue configuration
+# Connections are configured with HOST/PORT rather than URL: django-rq always
+# passes ssl_cert_reqs to Redis.from_url, which plain redis:// connections reject
 if REDIS_URL:
     # Parse Redis URL for SSL/TLS connections
     from urllib.parse import urlparse
     parsed_redis_url = urlparse(REDIS_URL)
 
+    RQ_QUEUES = {
+        'default': {
+            'HOST': parsed_redis_url.hostname,
+            'PORT': parsed_redis_url.port or 6379,
+            'DB': int(parsed_redis_url.path.lstrip('/') or 0),
+            'USERNAME': parsed_redis_url.username or None,
+            'PASSWORD': parsed_redis_url.password,
+            'DEFAULT_TIMEOUT': 500,
+            'DEFAULT_RESULT_TTL': 500,
+        },
+        'django-redis': {
+            'USE_REDIS_CACHE': 'default',
+        },
+    }
     if parsed_redis_url.scheme == 'rediss':
         # Configure for SSL/TLS connection
-        # Use individual connection parameters with REDIS_CLIENT_KWARGS for SSL
-        RQ_QUEUES = {
-            'default': {
-                'HOST': parsed_redis_url.hostname,
-                'PORT': parsed_redis_url.port or 6379,
-                'DB': 0,
-                'PASSWORD': parsed_redis_url.password,
-                'DEFAULT_TIMEOUT': 500,
-                'DEFAULT_RESULT_TTL': 500,
-                'REDIS_CLIENT_KWARGS': {
-                    'ssl_cert_reqs': ssl.CERT_NONE,  # Don't require SSL certificates
-                }
-            },
-            'django-redis': {
-                'USE_REDIS_CACHE': 'default',
-            },
-        }
-    else:
-        # Regular Redis connection without SSL
-        RQ_QUEUES = {
-            'default': {
-                'URL': REDIS_URL,
-                'DEFAULT_TIMEOUT': 500,
-                'DEFAULT_RESULT_TTL': 500,
-            },
-            'django-redis': {
-                'USE_REDIS_CACHE': 'default',
-            },
-        }
+        RQ_QUEUES['default'].update({
+            'SSL': True,
+            'SSL_CERT_REQS': ssl.CERT_NONE,  # Don't require SSL certificates
+        })
 else:
     # Fall back to individual settings
-    redis_url = f"redis://:{REDIS_PASSWORD}@" if REDIS_PASSWORD else "redis://"
-    redis_url += f"{REDIS_HOST}:{REDIS_PORT}/0"
-
     RQ_QUEUES = {
         'default': {
-            'URL': redis_url,
+            'HOST': REDIS_HOST,
+            'PORT': int(REDIS_PORT),
+            'DB': 0,
+            'PASSWORD': REDIS_PASSWORD,
             'DEFAULT_TIMEOUT': 500,
             'DEFAULT_RESULT_TTL': 500,
         },
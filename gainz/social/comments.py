@@ -0,0 +1,61 @@
+"""
+Comment Threads
+
+Loads a workout's threaded comments without walking `parent_comment`
+recursively: comments are fetched flat with their authors and the tree is
+assembled in memory. Long threads page over top-level comments with a
+(created_at, id) cursor; each page costs two queries (the top-level page and
+the replies whose `thread_root` is on it) however many comments or reply
+levels there are.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from gainz.utils.pagination import KeysetPage, keyset_page
+from .models import WorkoutComment
+
+COMMENT_PAGE_SIZE = 50  # Top-level comments per page; replies come with their thread
+
+
+def build_comment_tree(comments: Iterable[WorkoutComment]) -> List[WorkoutComment]:
+    """
+    Attach each comment's replies as `thread_replies` (chronological) and
+    return the comments that have no parent among the given ones.
+    """
+    comments = list(comments)
+    by_id: Dict[int, WorkoutComment] = {comment.id: comment for comment in comments}
+    for comment in comments:
+        comment.thread_replies = []
+
+    roots = []
+    for comment in comments:
+        parent = by_id.get(comment.parent_comment_id)
+        if parent is not None:
+            parent.thread_replies.append(comment)
+        else:
+            roots.append(comment)
+    return roots
+
+
+def load_comment_tree(workout) -> List[WorkoutComment]:
+    """All comments of a workout as a tree of top-level comments, in one query."""
+    comments = WorkoutComment.objects.filter(workout=workout).select_related('user').order_by('created_at', 'id')
+    return build_comment_tree(comments)
+
+
+def load_comment_page(workout, cursor: Optional[str] = None, page_size: int = COMMENT_PAGE_SIZE) -> KeysetPage:
+    """A page of top-level comments (oldest first) with their full reply threads."""
+    page = keyset_page(
+        WorkoutComment.objects.filter(workout=workout, parent_comment__isnull=True).select_related('user'),
+        cursor,
+        page_size,
+        date_field='created_at',
+        descending=False,
+    )
+    if page.items:
+        roots = {comment.id for comment in page.items}
+        replies = WorkoutComment.objects.filter(
+            thread_root_id__in=roots
+        ).select_related('user').order_by('created_at', 'id')
+        page.items = build_comment_tree(list(page.items) + list(replies))
+    return page
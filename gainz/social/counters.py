@@ -0,0 +1,129 @@
+"""
+Social Counters
+
+Workout.like_count/comment_count and UserProfile.followers_count/
+following_count are denormalized so feeds, profiles and search results don't
+run COUNT(*) per row. They're changed with F() expressions in the same
+transaction as the like, comment or follow, and the reconcile functions
+repair drift from deletes that bypass the views (admin, cascades).
+"""
+
+from typing import Iterable, Set
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from gainz.workouts.models import Workout
+from .models import UserProfile, UserFollow, WorkoutLike, WorkoutComment
+
+
+def adjust_workout_counter(workout_id: int, field: str, delta: int) -> int:
+    """Atomically add `delta` to a workout counter and return the new value."""
+    Workout.objects.filter(pk=workout_id).update(**{field: Greatest(F(field) + delta, Value(0))})
+    return Workout.objects.filter(pk=workout_id).values_list(field, flat=True).first() or 0
+
+
+def adjust_follow_counters(follower_id: int, following_id: int, delta: int) -> int:
+    """
+    Atomically add `delta` to the follower's following_count and the followed
+    user's followers_count. Returns the followed user's new followers_count.
+    """
+    UserProfile.objects.filter(user_id=follower_id).update(
+        following_count=Greatest(F('following_count') + delta, Value(0))
+    )
+    UserProfile.objects.filter(user_id=following_id).update(
+        followers_count=Greatest(F('followers_count') + delta, Value(0))
+    )
+    return UserProfile.objects.filter(user_id=following_id).values_list('followers_count', flat=True).first() or 0
+
+
+def liked_workout_ids(user, workouts: Iterable[Workout]) -> Set[int]:
+    """Ids of the given workouts the user has liked, in a single query."""
+    if not user.is_authenticated:
+        return set()
+    workout_ids = [workout.id for workout in workouts]
+    if not workout_ids:
+        return set()
+    return set(
+        WorkoutLike.objects.filter(user=user, workout_id__in=workout_ids).values_list('workout_id', flat=True)
+    )
+
+
+def mark_liked_by(user, workouts: Iterable[Workout]) -> None:
+    """Set `user_has_liked` on each workout of a page."""
+    workouts = list(workouts)
+    liked_ids = liked_workout_ids(user, workouts)
+    for workout in workouts:
+        workout.user_has_liked = workout.id in liked_ids
+
+
+def _count_subquery(model, field: str = 'workout', outer_field: str = 'pk') -> Subquery:
+    counts = model.objects.filter(**{field: OuterRef(outer_field)}).order_by().values(field).annotate(
+        total=Count('id')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def reconcile_workout_counters(batch_size: int = 1000) -> int:
+    """
+    Recount likes and comments and fix workouts whose counters drifted.
+
+    Walks the workout table in primary key batches. Returns the number of
+    workouts corrected.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Workout.objects.filter(id__gt=last_id).order_by('id').annotate(
+                actual_likes=_count_subquery(WorkoutLike),
+                actual_comments=_count_subquery(WorkoutComment),
+            ).only('id', 'like_count', 'comment_count')[:batch_size]
+        )
+        if not batch:
+            return fixed
+
+        drifted = []
+        for workout in batch:
+            if workout.like_count != workout.actual_likes or workout.comment_count != workout.actual_comments:
+                workout.like_count = workout.actual_likes
+                workout.comment_count = workout.actual_comments
+                drifted.append(workout)
+        if drifted:
+            Workout.objects.bulk_update(drifted, ['like_count', 'comment_count'])
+            fixed += len(drifted)
+
+        last_id = batch[-1].id
+
+
+def reconcile_follow_counters(batch_size: int = 1000) -> int:
+    """
+    Recount follows and fix profiles whose follower/following counters drifted.
+
+    Walks the profile table in primary key batches. Returns the number of
+    profiles corrected.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            UserProfile.objects.filter(id__gt=last_id).order_by('id').annotate(
+                actual_followers=_count_subquery(UserFollow, 'following', 'user_id'),
+                actual_following=_count_subquery(UserFollow, 'follower', 'user_id'),
+            ).only('id', 'followers_count', 'following_count')[:batch_size]
+        )
+        if not batch:
+            return fixed
+
+        drifted = []
+        for profile in batch:
+            if (profile.followers_count != profile.actual_followers
+                    or profile.following_count != profile.actual_following):
+                profile.followers_count = profile.actual_followers
+                profile.following_count = profile.actual_following
+                drifted.append(profile)
+        if drifted:
+            UserProfile.objects.bulk_update(drifted, ['followers_count', 'following_count'])
+            fixed += len(drifted)
+
+        last_id = batch[-1].id
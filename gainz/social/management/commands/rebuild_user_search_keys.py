@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from gainz.social.search import rebuild_search_keys
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the normalized search keys used by user search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users processed per batch (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_search_keys(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search keys for {total} users.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from gainz.social.counters import reconcile_follow_counters, reconcile_workout_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount workout likes/comments and profile follows and repair drifted denormalized counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of workouts or profiles checked per batch (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        fixed_workouts = reconcile_workout_counters(batch_size=batch_size)
+        fixed_profiles = reconcile_follow_counters(batch_size=batch_size)
+
+        if fixed_workouts == 0 and fixed_profiles == 0:
+            self.stdout.write(self.style.SUCCESS('All social counters are consistent.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Repaired counters on {fixed_workouts} workouts and {fixed_profiles} profiles.'
+            ))
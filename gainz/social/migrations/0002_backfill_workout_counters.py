@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_workout_counters(apps, schema_editor):
+    """Fill the new Workout.like_count/comment_count columns from existing rows."""
+    Workout = apps.get_model('workouts', 'Workout')
+    WorkoutLike = apps.get_model('social', 'WorkoutLike')
+    WorkoutComment = apps.get_model('social', 'WorkoutComment')
+
+    def count(model):
+        counts = model.objects.filter(workout=OuterRef('pk')).order_by().values('workout').annotate(
+            total=Count('id')
+        ).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    Workout.objects.update(like_count=count(WorkoutLike), comment_count=count(WorkoutComment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0001_initial'),
+        ('workouts', '0019_workout_social_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_workout_counters, migrations.RunPython.noop),
+    ]
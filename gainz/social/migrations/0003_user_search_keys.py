@@ -0,0 +1,59 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:07
+
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def normalize_search_text(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def search_keys_for(user):
+    """The keys of gainz.social.search at the time of this migration, frozen here."""
+    names = [user.username, user.first_name, user.last_name, f"{user.first_name} {user.last_name}"]
+    keys = {normalize_search_text(name)[:255] for name in names}
+    keys.discard('')
+    return keys
+
+
+def backfill_search_keys(apps, schema_editor):
+    """Index the names of existing users."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserSearchKey = apps.get_model('social', 'UserSearchKey')
+    users = User.objects.only('id', 'username', 'first_name', 'last_name').iterator(chunk_size=1000)
+    batch = []
+    for user in users:
+        batch.extend(UserSearchKey(user_id=user.id, key=key) for key in search_keys_for(user))
+        if len(batch) >= 5000:
+            UserSearchKey.objects.bulk_create(batch)
+            batch = []
+    UserSearchKey.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('social', '0002_backfill_workout_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=255)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Search Key',
+                'verbose_name_plural': 'User Search Keys',
+                'unique_together': {('user', 'key')},
+            },
+        ),
+        migrations.RunPython(backfill_search_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:08
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counters(apps, schema_editor):
+    """Fill the new UserProfile.followers_count/following_count columns from existing follows."""
+    UserProfile = apps.get_model('social', 'UserProfile')
+    UserFollow = apps.get_model('social', 'UserFollow')
+
+    def count(field):
+        counts = UserFollow.objects.filter(**{field: OuterRef('user_id')}).order_by().values(field).annotate(
+            total=Count('id')
+        ).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    UserProfile.objects.update(followers_count=count('following'), following_count=count('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0003_user_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_follow_counters, migrations.RunPython.noop),
+    ]
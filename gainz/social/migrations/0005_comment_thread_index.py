@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0004_profile_follow_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutcomment',
+            index=models.Index(fields=['workout', 'parent_comment', 'created_at', 'id'], name='social_work_workout_662884_idx'),
+        ),
+    ]
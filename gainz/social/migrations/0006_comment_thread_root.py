@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_thread_roots(apps, schema_editor):
+    """Point every existing reply at the top-level comment of its thread."""
+    WorkoutComment = apps.get_model('social', 'WorkoutComment')
+    parents = dict(
+        WorkoutComment.objects.filter(parent_comment__isnull=False).values_list('id', 'parent_comment_id').iterator()
+    )
+    replies = []
+    for comment_id, parent_id in parents.items():
+        root_id = parent_id
+        while root_id in parents:
+            root_id = parents[root_id]
+        replies.append(WorkoutComment(id=comment_id, thread_root_id=root_id))
+    WorkoutComment.objects.bulk_update(replies, ['thread_root'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0005_comment_thread_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutcomment',
+            name='thread_root',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_comments', to='social.workoutcomment'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutcomment',
+            index=models.Index(fields=['thread_root', 'created_at', 'id'], name='social_work_thread__1d5768_idx'),
+        ),
+        migrations.RunPython(backfill_thread_roots, migrations.RunPython.noop),
+    ]
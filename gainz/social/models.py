@@ -46,6 +46,11 @@ class UserProfile(models.Model):
         help_text="Send email notification when someone comments on your workout"
     )
     
+    # Denormalized follow counters, updated with F() expressions by the follow
+    # views; `manage.py reconcile_social_counters` repairs any drift
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    
     # Metadata
     date_joined_social = models.DateTimeField(auto_now_add=True)
     
@@ -58,11 +63,11 @@ class UserProfile(models.Model):
     
     def get_followers_count(self):
         """Get count of users following this user"""
-        return UserFollow.objects.filter(following=self.user).count()
+        return self.followers_count
     
     def get_following_count(self):
         """Get count of users this user is following"""
-        return UserFollow.objects.filter(follower=self.user).count()
+        return self.following_count
     
     def is_following(self, target_user):
         """Check if this user is following target_user"""
@@ -101,6 +106,28 @@ class UserFollow(models.Model):
             raise ValidationError("Users cannot follow themselves.")
 
 
+class UserSearchKey(models.Model):
+    """
+    Normalized name token of a user (username, first name, last name, full
+    name) for indexed prefix search. Maintained by a User post_save signal;
+    see search.py.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='search_keys'
+    )
+    key = models.CharField(max_length=255, db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+        verbose_name = "User Search Key"
+        verbose_name_plural = "User Search Keys"
+
+    def __str__(self):
+        return f"{self.key} -> {self.user_id}"
+
+
 class WorkoutLike(models.Model):
     """Like/reaction on workouts"""
     user = models.ForeignKey(
@@ -149,15 +176,39 @@ class WorkoutComment(models.Model):
         blank=True,
         related_name='replies'
     )
+    # Top-level comment of the thread a reply belongs to (null on top-level
+    # comments), so a page of threads loads only its own replies
+    thread_root = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='thread_comments'
+    )
     
     class Meta:
         verbose_name = "Workout Comment"
         verbose_name_plural = "Workout Comments"
         ordering = ['created_at']  # Chronological order
+        indexes = [
+            # Keyset pages of a workout's top-level comments (see comments.py)
+            models.Index(fields=['workout', 'parent_comment', 'created_at', 'id']),
+            # Replies of a page's threads, in order
+            models.Index(fields=['thread_root', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"Comment by {self.user.username} on {self.workout.name}"
     
+    def save(self, *args, **kwargs):
+        if self.parent_comment_id and self.thread_root_id is None:
+            # A reply joins its parent's thread, or starts one under a top-level parent
+            parent_root_id = WorkoutComment.objects.filter(pk=self.parent_comment_id).values_list(
+                'thread_root_id', flat=True
+            ).first()
+            self.thread_root_id = parent_root_id or self.parent_comment_id
+        super().save(*args, **kwargs)
+    
     def is_reply(self):
         """Check if this comment is a reply to another comment"""
         return self.parent_comment is not None
@@ -168,8 +219,10 @@ class WorkoutComment(models.Model):
 
 
 # Signal to create UserProfile when User is created
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from gainz.workouts.models import Workout
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -181,4 +234,49 @@ def create_user_profile(sender, instance, created, **kwargs):
 def save_user_profile(sender, instance, **kwargs):
     """Save UserProfile when User is saved"""
     if hasattr(instance, 'social_profile'):
-        instance.social_profile.save()
\ No newline at end of file
+        # Leave the follow counters alone: this copy may predate a follow
+        profile = instance.social_profile
+        profile.save(update_fields=[
+            field.name for field in profile._meta.concrete_fields
+            if not field.primary_key and field.name not in ('followers_count', 'following_count')
+        ])
+
+@receiver(post_save, sender=User)
+def update_user_search_keys(sender, instance, update_fields=None, **kwargs):
+    """Refresh the user's search keys unless only non-name fields were saved (e.g. last_login)"""
+    if update_fields is not None and not {'username', 'first_name', 'last_name'} & set(update_fields):
+        return
+    from .search import sync_user_search_keys
+    sync_user_search_keys(instance)
+
+
+# Signals keeping the social timelines (see timeline.py) in sync; the fan-out
+# runs on the job queue once the transaction commits
+def _enqueue_timeline_job(user_id, func, *args):
+    from gainz.utils.background_jobs import enqueue_user_job
+    transaction.on_commit(lambda: enqueue_user_job(user_id, func, *args, retries=1))
+
+@receiver(post_save, sender=Workout)
+def push_workout_to_timelines(sender, instance, **kwargs):
+    """Add a saved workout to its followers' timelines, or remove it when it's private"""
+    from .timeline import fan_out_workout
+    _enqueue_timeline_job(instance.user_id, fan_out_workout, instance.id)
+
+@receiver(post_delete, sender=Workout)
+def remove_workout_from_timelines(sender, instance, **kwargs):
+    """Remove a deleted workout from its owner's and followers' timelines"""
+    from .timeline import remove_workout
+    _enqueue_timeline_job(instance.user_id, remove_workout, instance.user_id, instance.id)
+
+@receiver(post_save, sender=UserFollow)
+def backfill_timeline_on_follow(sender, instance, created, **kwargs):
+    """Add the followed user's recent public workouts to the follower's timeline"""
+    if created:
+        from .timeline import backfill_followed_user
+        _enqueue_timeline_job(instance.follower_id, backfill_followed_user, instance.follower_id, instance.following_id)
+
+@receiver(post_delete, sender=UserFollow)
+def prune_timeline_on_unfollow(sender, instance, **kwargs):
+    """Remove the unfollowed user's workouts from the follower's timeline"""
+    from .timeline import prune_unfollowed_user
+    _enqueue_timeline_job(instance.follower_id, prune_unfollowed_user, instance.follower_id, instance.following_id)
@@ -0,0 +1,90 @@
+"""
+User Search
+
+Prefix search over normalized name tokens stored in UserSearchKey, so a
+query is an index range scan on `key LIKE 'prefix%'` instead of a
+sequential icontains scan over auth_user. All matches are ranked by mutual
+follows (how many of the searcher's followed users follow the match) in the
+same query that limits them, which also returns the follow state of every
+result.
+"""
+
+import unicodedata
+from typing import List, Set
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .models import UserFollow, UserSearchKey
+
+SEARCH_RESULT_LIMIT = 20
+KEY_MAX_LENGTH = UserSearchKey._meta.get_field('key').max_length
+
+
+def normalize_search_text(text: str) -> str:
+    """Casefold, strip accents and collapse whitespace: 'Zoë  Smith' -> 'zoe smith'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def search_keys_for(user) -> Set[str]:
+    """The normalized tokens a user can be found by."""
+    names = [user.username, user.first_name, user.last_name, f"{user.first_name} {user.last_name}"]
+    keys = {normalize_search_text(name)[:KEY_MAX_LENGTH] for name in names}
+    keys.discard('')
+    return keys
+
+
+def sync_user_search_keys(user) -> None:
+    """Bring a user's stored search keys in line with their current names."""
+    wanted = search_keys_for(user)
+    existing = set(UserSearchKey.objects.filter(user=user).values_list('key', flat=True))
+    if wanted == existing:
+        return
+    with transaction.atomic():
+        UserSearchKey.objects.filter(user=user, key__in=existing - wanted).delete()
+        UserSearchKey.objects.bulk_create([UserSearchKey(user=user, key=key) for key in wanted - existing])
+
+
+def rebuild_search_keys(batch_size: int = 1000) -> int:
+    """Regenerate every user's search keys in primary key batches. Returns the number of users."""
+    total = 0
+    last_id = 0
+    while True:
+        users = list(
+            User.objects.filter(id__gt=last_id).order_by('id').only('id', 'username', 'first_name', 'last_name')[:batch_size]
+        )
+        if not users:
+            return total
+        with transaction.atomic():
+            UserSearchKey.objects.filter(user_id__in=[user.id for user in users]).delete()
+            UserSearchKey.objects.bulk_create(
+                [UserSearchKey(user=user, key=key) for user in users for key in search_keys_for(user)]
+            )
+        total += len(users)
+        last_id = users[-1].id
+
+
+def search_users(viewer, query: str, limit: int = SEARCH_RESULT_LIMIT) -> List[User]:
+    """
+    Users whose username or name starts with `query`, best connected first.
+
+    Each result carries `mutual_count` and `is_followed_by_current_user`.
+    """
+    normalized = normalize_search_text(query)[:KEY_MAX_LENGTH]
+    if not normalized:
+        return []
+
+    matches = UserSearchKey.objects.filter(user_id=OuterRef('pk'), key__startswith=normalized)
+    viewer_following = UserFollow.objects.filter(follower=viewer).values('following_id')
+    # Every prefix match is ranked, so the best connected ones are never cut before ordering
+    return list(
+        User.objects.filter(Exists(matches)).exclude(id=viewer.id).select_related('social_profile').annotate(
+            mutual_count=Count('followers', filter=Q(followers__follower_id__in=viewer_following)),
+            is_followed_by_current_user=Exists(
+                UserFollow.objects.filter(follower=viewer, following=OuterRef('pk'))
+            ),
+        ).order_by('-mutual_count', 'username')[:limit]
+    )
@@ -0,0 +1,213 @@
+"""
+Social Timelines
+
+Fan-out-on-write feed store: every user has a Redis sorted set of workout ids
+(scored by workout date) holding their own workouts plus the public workouts
+of the users they follow. Workouts are pushed when saved, removed when they
+become private or are deleted, backfilled on follow and pruned on unfollow,
+so reading a feed page is a ZREVRANGEBYSCORE of page size plus one
+hydration query.
+
+A sentinel member with the lowest score marks a timeline as built; a
+timeline without it (new key, evicted by Redis) is rebuilt from the database
+on the next read. When Redis is unavailable the feed falls back to querying
+the database directly.
+"""
+
+import datetime
+from typing import Iterable, List, Optional
+
+from django.db.models import Q
+
+from gainz.utils.pagination import KeysetPage, decode_cursor, encode_cursor
+from gainz.utils.redis_store import get_redis_connection
+from gainz.workouts.models import Workout
+from .models import UserFollow
+
+TIMELINE_MAX_LENGTH = 800  # Workouts kept per timeline; older ones fall off
+SENTINEL = b'built'
+SENTINEL_SCORE = -1
+
+
+def timeline_key(user_id: int) -> str:
+    return f"timeline:{user_id}"
+
+
+def _score(workout_date) -> float:
+    return workout_date.timestamp()
+
+
+def _push(pipe, user_id: int, entries: dict) -> None:
+    """Queue ZADDs of {workout_id: score} and trim, keeping the sentinel at rank 0."""
+    key = timeline_key(user_id)
+    pipe.zadd(key, entries)
+    pipe.zremrangebyrank(key, 1, -(TIMELINE_MAX_LENGTH + 2))
+
+
+def _follower_ids(user_id: int) -> List[int]:
+    return list(UserFollow.objects.filter(following_id=user_id).values_list('follower_id', flat=True))
+
+
+def rebuild_timeline(user_id: int, redis_conn=None) -> None:
+    """Rebuild one user's timeline from the database."""
+    redis_conn = redis_conn or get_redis_connection(ping=True)
+    if redis_conn is None:
+        return
+
+    following_ids = UserFollow.objects.filter(follower_id=user_id).values_list('following_id', flat=True)
+    rows = Workout.objects.filter(
+        Q(user_id__in=following_ids, visibility='public') | Q(user_id=user_id)
+    ).order_by('-date').values_list('id', 'date')[:TIMELINE_MAX_LENGTH]
+
+    key = timeline_key(user_id)
+    pipe = redis_conn.pipeline()
+    pipe.delete(key)
+    pipe.zadd(key, {SENTINEL: SENTINEL_SCORE})
+    entries = {workout_id: _score(date) for workout_id, date in rows}
+    if entries:
+        pipe.zadd(key, entries)
+    pipe.execute()
+
+
+def fan_out_workout(workout_id: int) -> None:
+    """
+    Push a workout to its owner's and followers' timelines, or pull it from
+    the followers' timelines when it isn't public (any more).
+    """
+    fan_out_workouts([workout_id])
+
+
+def fan_out_workouts(workout_ids: Iterable[int]) -> None:
+    """fan_out_workout for many workouts (a chunk of imports) in one pipeline."""
+    redis_conn = get_redis_connection(ping=True)
+    if redis_conn is None:
+        return
+
+    workouts = list(Workout.objects.filter(id__in=list(workout_ids)).values('id', 'user_id', 'date', 'visibility'))
+    if not workouts:
+        return
+
+    # Re-adding an existing member just updates its score, so moved workouts are re-sorted
+    pipe = redis_conn.pipeline(transaction=False)
+    for user_id in {workout['user_id'] for workout in workouts}:
+        owned = [workout for workout in workouts if workout['user_id'] == user_id]
+        public = {workout['id']: _score(workout['date']) for workout in owned if workout['visibility'] == 'public'}
+        hidden = [workout['id'] for workout in owned if workout['visibility'] != 'public']
+        _push(pipe, user_id, {workout['id']: _score(workout['date']) for workout in owned})
+        for follower_id in _follower_ids(user_id):
+            if public:
+                _push(pipe, follower_id, public)
+            if hidden:
+                pipe.zrem(timeline_key(follower_id), *hidden)
+    pipe.execute()
+
+
+def remove_workout(user_id: int, workout_id: int) -> None:
+    """Remove a deleted workout from its owner's and followers' timelines."""
+    redis_conn = get_redis_connection(ping=True)
+    if redis_conn is None:
+        return
+
+    pipe = redis_conn.pipeline(transaction=False)
+    for timeline_user_id in [user_id] + _follower_ids(user_id):
+        pipe.zrem(timeline_key(timeline_user_id), workout_id)
+    pipe.execute()
+
+
+def backfill_followed_user(follower_id: int, following_id: int) -> None:
+    """Add the recent public workouts of a newly followed user to the follower's timeline."""
+    redis_conn = get_redis_connection(ping=True)
+    if redis_conn is None or not redis_conn.exists(timeline_key(follower_id)):
+        return
+
+    rows = Workout.objects.filter(user_id=following_id, visibility='public').order_by('-date').values_list(
+        'id', 'date'
+    )[:TIMELINE_MAX_LENGTH]
+    entries = {workout_id: _score(date) for workout_id, date in rows}
+    if entries:
+        pipe = redis_conn.pipeline()
+        _push(pipe, follower_id, entries)
+        pipe.execute()
+
+
+def prune_unfollowed_user(follower_id: int, following_id: int) -> None:
+    """Remove an unfollowed user's workouts from the follower's timeline."""
+    redis_conn = get_redis_connection(ping=True)
+    if redis_conn is None:
+        return
+
+    workout_ids = list(Workout.objects.filter(user_id=following_id).values_list('id', flat=True))
+    key = timeline_key(follower_id)
+    for start in range(0, len(workout_ids), 1000):
+        redis_conn.zrem(key, *workout_ids[start:start + 1000])
+
+
+class TimelineWorkouts:
+    """
+    Keyset-paged workouts of a user's timeline: a page is a ZREVRANGEBYSCORE
+    below the cursor's (date, id) plus one hydration query.
+    """
+
+    def __init__(self, user, redis_conn):
+        self.user = user
+        self.redis = redis_conn
+        self.key = timeline_key(user.id)
+
+    def page(self, cursor: Optional[str], page_size: int) -> KeysetPage:
+        """Return the page after `cursor` (a cursor from this store or the database fallback)."""
+        position = decode_cursor(cursor)
+        max_score = '+inf'
+        fetch = page_size + 1
+        if position is not None:
+            max_score = _score(position[0])
+            # Workouts sharing the cursor's timestamp are fetched too and filtered by id below
+            fetch += self.redis.zcount(self.key, max_score, max_score)
+
+        rows = self.redis.zrevrangebyscore(
+            self.key, max_score, f"({SENTINEL_SCORE}", start=0, num=fetch, withscores=True
+        )
+        entries = sorted(
+            ((score, int(member)) for member, score in rows if member != SENTINEL),
+            reverse=True,
+        )
+        if position is not None:
+            entries = [(score, workout_id) for score, workout_id in entries
+                       if score < max_score or workout_id < position[1]]
+
+        page_entries = entries[:page_size]
+        next_cursor = None
+        if len(entries) > page_size:
+            last_score, last_id = page_entries[-1]
+            next_cursor = encode_cursor(datetime.datetime.fromtimestamp(last_score, datetime.timezone.utc), last_id)
+        return KeysetPage(
+            items=self.hydrate(workout_id for _, workout_id in page_entries),
+            next_cursor=next_cursor,
+            cursor=cursor if position else None,
+        )
+
+    def hydrate(self, workout_ids: Iterable[int]) -> List[Workout]:
+        """Load the workouts in timeline order, dropping stale ids."""
+        workout_ids = list(workout_ids)
+        workouts = Workout.objects.filter(
+            Q(visibility='public') | Q(user=self.user),
+            id__in=workout_ids,
+        ).select_related(
+            'user', 'routine_source'
+        ).prefetch_related(
+            'exercises__exercise'
+        ).in_bulk()
+
+        stale_ids = [workout_id for workout_id in workout_ids if workout_id not in workouts]
+        if stale_ids:
+            self.redis.zrem(self.key, *stale_ids)
+        return [workouts[workout_id] for workout_id in workout_ids if workout_id in workouts]
+
+
+def get_timeline(user) -> Optional[TimelineWorkouts]:
+    """Return the user's timeline, building it first if needed, or None without Redis."""
+    redis_conn = get_redis_connection(ping=True)
+    if redis_conn is None:
+        return None
+    if redis_conn.zscore(timeline_key(user.id), SENTINEL) is None:
+        rebuild_timeline(user.id, redis_conn)
+    return TimelineWorkouts(user, redis_conn)
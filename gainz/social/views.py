@@ -2,15 +2,22 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
+from gainz.utils.json_rendering import FastJsonResponse as JsonResponse
+from django.db import transaction
 from django.db.models import Q, Count, Prefetch
-from django.core.paginator import Paginator
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 
 from .models import UserProfile, UserFollow, WorkoutLike, WorkoutComment
+from .counters import adjust_follow_counters, adjust_workout_counter, mark_liked_by
+from .timeline import get_timeline
+from .search import search_users
+from .comments import load_comment_page
 from gainz.workouts.models import Workout
+from gainz.utils.pagination import keyset_page
+
+FEED_PAGE_SIZE = 10
 
 
 @login_required
@@ -18,28 +25,30 @@ def social_feed(request):
     """Main social feed showing workouts from followed users"""
     user = request.user
     
-    # Get users that current user follows
-    following_users = UserFollow.objects.filter(
-        follower=user
-    ).values_list('following', flat=True)
-    
-    # Get public workouts from followed users + user's own workouts
-    workouts = Workout.objects.filter(
-        Q(user__in=following_users, visibility='public') | Q(user=user)
-    ).select_related(
-        'user', 'routine_source'
-    ).prefetch_related(
-        'likes', 'comments__user', 'exercises__exercise'
-    ).order_by('-date')
+    # Read the page from the user's timeline store; only that page's workouts are loaded
+    cursor = request.GET.get('cursor')
+    timeline = get_timeline(user)
     
-    # Add like status for each workout
-    for workout in workouts:
-        workout.user_has_liked = workout.likes.filter(user=user).exists()
+    if timeline is not None:
+        page_obj = timeline.page(cursor, FEED_PAGE_SIZE)
+    else:
+        # No timeline store available: query followed users' workouts directly
+        following_users = UserFollow.objects.filter(
+            follower=user
+        ).values_list('following', flat=True)
+        
+        # Get public workouts from followed users + user's own workouts, keyset paged on (date, id)
+        workouts = Workout.objects.filter(
+            Q(user__in=following_users, visibility='public') | Q(user=user)
+        ).select_related(
+            'user', 'routine_source'
+        ).prefetch_related(
+            'exercises__exercise'
+        )
+        page_obj = keyset_page(workouts, cursor, FEED_PAGE_SIZE)
     
-    # Paginate results
-    paginator = Paginator(workouts, 10)  # 10 workouts per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Add like status for the workouts on this page (one query)
+    mark_liked_by(user, page_obj)
     
     return render(request, 'social/feed.html', {
         'page_obj': page_obj,
@@ -68,13 +77,7 @@ def user_profile_view(request, username):
     else:
         workouts = Workout.objects.filter(user=target_user, visibility='public')
     
-    workouts = workouts.select_related('routine_source').prefetch_related(
-        'likes', 'comments'
-    ).order_by('-date')[:10]  # Latest 10 workouts
-    
-    # Get follow counts
-    followers_count = UserFollow.objects.filter(following=target_user).count()
-    following_count = UserFollow.objects.filter(follower=target_user).count()
+    workouts = workouts.select_related('routine_source').order_by('-date')[:10]  # Latest 10 workouts
     
     return render(request, 'social/profile.html', {
         'target_user': target_user,
@@ -82,8 +85,8 @@ def user_profile_view(request, username):
         'workouts': workouts,
         'is_own_profile': is_own_profile,
         'is_following': is_following,
-        'followers_count': followers_count,
-        'following_count': following_count,
+        'followers_count': profile.followers_count,
+        'following_count': profile.following_count,
     })
 
 
@@ -94,20 +97,8 @@ def user_search(request):
     users = []
     
     if query:
-        users = User.objects.filter(
-            Q(username__icontains=query) | 
-            Q(first_name__icontains=query) | 
-            Q(last_name__icontains=query)
-        ).select_related('social_profile').exclude(
-            id=request.user.id  # Exclude current user
-        )[:20]  # Limit to 20 results
-        
-        # Add follow status for each user
-        for user in users:
-            user.is_followed_by_current_user = UserFollow.objects.filter(
-                follower=request.user, 
-                following=user
-            ).exists()
+        # Indexed prefix match, ranked by mutual follows, follow state included
+        users = search_users(request.user, query)
     
     return render(request, 'social/user_search.html', {
         'query': query,
@@ -125,10 +116,13 @@ def follow_user(request, username):
             messages.error(request, "You can't follow yourself!")
             return redirect('social:profile', username=username)
         
-        follow, created = UserFollow.objects.get_or_create(
-            follower=request.user,
-            following=target_user
-        )
+        with transaction.atomic():
+            follow, created = UserFollow.objects.get_or_create(
+                follower=request.user,
+                following=target_user
+            )
+            if created:
+                adjust_follow_counters(request.user.id, target_user.id, 1)
         
         if created:
             messages.success(request, f"You are now following {target_user.username}!")
@@ -144,13 +138,16 @@ def unfollow_user(request, username):
     if request.method == 'POST':
         target_user = get_object_or_404(User, username=username)
         
-        follow = UserFollow.objects.filter(
-            follower=request.user,
-            following=target_user
-        ).first()
+        with transaction.atomic():
+            # Only the request that actually removed the follow adjusts the counters
+            deleted, _ = UserFollow.objects.filter(
+                follower=request.user,
+                following=target_user
+            ).delete()
+            if deleted:
+                adjust_follow_counters(request.user.id, target_user.id, -1)
         
-        if follow:
-            follow.delete()
+        if deleted:
             messages.success(request, f"You have unfollowed {target_user.username}")
         else:
             messages.error(request, f"You are not following {target_user.username}")
@@ -169,21 +166,26 @@ def api_like_workout(request, workout_id):
         if not workout.can_be_viewed_by(request.user):
             return JsonResponse({'error': 'Workout not accessible'}, status=403)
         
-        like, created = WorkoutLike.objects.get_or_create(
-            user=request.user,
-            workout=workout
-        )
-        
-        if not created:
-            # Unlike - remove the like
-            like.delete()
-            liked = False
-        else:
-            liked = True
+        with transaction.atomic():
+            like, created = WorkoutLike.objects.get_or_create(
+                user=request.user,
+                workout=workout
+            )
+            
+            if not created:
+                # Unlike - remove the like (a concurrent unlike may have removed it already)
+                deleted, _ = like.delete()
+                liked = False
+                delta = -1 if deleted else 0
+            else:
+                liked = True
+                delta = 1
+            
+            like_count = adjust_workout_counter(workout.id, 'like_count', delta)
         
         return JsonResponse({
             'liked': liked,
-            'like_count': workout.get_like_count()
+            'like_count': like_count
         })
     
     return JsonResponse({'error': 'Invalid method'}, status=405)
@@ -210,11 +212,13 @@ def api_add_comment(request, workout_id):
         if len(content) > 1000:
             return JsonResponse({'error': 'Comment too long'}, status=400)
         
-        comment = WorkoutComment.objects.create(
-            user=request.user,
-            workout=workout,
-            content=content
-        )
+        with transaction.atomic():
+            comment = WorkoutComment.objects.create(
+                user=request.user,
+                workout=workout,
+                content=content
+            )
+            comment_count = adjust_workout_counter(workout.id, 'comment_count', 1)
         
         return JsonResponse({
             'success': True,
@@ -223,7 +227,7 @@ def api_add_comment(request, workout_id):
                 'content': comment.content,
                 'user': comment.user.username,
                 'created_at': comment.created_at.strftime('%Y-%m-%d %H:%M'),
-                'comment_count': workout.get_comment_count()
+                'comment_count': comment_count
             }
         })
     
@@ -239,25 +243,30 @@ def api_follow_toggle(request, username):
         if target_user == request.user:
             return JsonResponse({'error': 'Cannot follow yourself'}, status=400)
         
-        follow = UserFollow.objects.filter(
-            follower=request.user,
-            following=target_user
-        ).first()
-        
-        if follow:
-            follow.delete()
-            following = False
-            action = 'unfollowed'
-        else:
-            UserFollow.objects.create(
+        with transaction.atomic():
+            follow = UserFollow.objects.filter(
                 follower=request.user,
                 following=target_user
-            )
-            following = True
-            action = 'followed'
-        
-        # Get updated follower count
-        followers_count = UserFollow.objects.filter(following=target_user).count()
+            ).first()
+            
+            if follow:
+                # A concurrent unfollow may have removed it already
+                deleted, _ = UserFollow.objects.filter(pk=follow.pk).delete()
+                following = False
+                action = 'unfollowed'
+                delta = -1 if deleted else 0
+            else:
+                # ... and a concurrent follow may have created it
+                _, created = UserFollow.objects.get_or_create(
+                    follower=request.user,
+                    following=target_user
+                )
+                following = True
+                action = 'followed'
+                delta = 1 if created else 0
+            
+            # Updated follower count from the counter, not a COUNT(*)
+            followers_count = adjust_follow_counters(request.user.id, target_user.id, delta)
         
         return JsonResponse({
             'following': following,
@@ -278,13 +287,11 @@ def workout_detail_social(request, workout_id):
         messages.error(request, "You don't have permission to view this workout.")
         return redirect('social:feed')
     
-    # Get comments for this workout
-    comments = WorkoutComment.objects.filter(
-        workout=workout
-    ).select_related('user').order_by('created_at')
+    # Get a page of comment threads for this workout (constant number of queries)
+    comments = load_comment_page(workout, request.GET.get('comments_cursor'))
     
     # Check if current user has liked this workout
-    user_has_liked = workout.likes.filter(user=request.user).exists() if request.user.is_authenticated else False
+    user_has_liked = workout.is_liked_by(request.user)
     
     return render(request, 'social/workout_detail.html', {
         'workout': workout,
@@ -1458,6 +1458,121 @@ async function toggleSetCompletion(event) {
     }
 }
 
+// --- Offline Sync Results ---
+// The service worker queues set writes made offline and flushes them to
+// /api/sync/push/ (see static/service-worker.js). It posts each flush's
+// results here: temporary "tmp-<key>" set ids are swapped for real ones and
+// conflicts or rejections are shown, as are flushes that failed.
+function requestOfflineSync() {
+    if (!('serviceWorker' in navigator)) {
+        return;
+    }
+    navigator.serviceWorker.ready.then(function(registration) {
+        if (registration.active) {
+            registration.active.postMessage({ type: 'sync-now', csrfToken: getCsrfToken() });
+        }
+    });
+}
+
+// A persistent notice (toasts are suppressed on the mobile workout view)
+function showSyncNotice(message, withRetry = false) {
+    let notice = document.getElementById('sync-notice');
+    if (!message) {
+        if (notice) notice.remove();
+        return;
+    }
+    if (!notice) {
+        notice = document.createElement('div');
+        notice.id = 'sync-notice';
+        notice.className = 'alert alert-warning position-fixed bottom-0 start-50 translate-middle-x mb-3 d-flex align-items-center gap-2';
+        notice.style.zIndex = '1100';
+        notice.setAttribute('role', 'alert');
+        document.body.appendChild(notice);
+    }
+    notice.innerHTML = `
+        <i class="fas fa-exclamation-triangle"></i>
+        <span class="sync-notice-text"></span>
+        ${withRetry ? '<button type="button" class="btn btn-sm btn-outline-dark sync-notice-retry">Retry</button>' : ''}
+        <button type="button" class="btn-close" aria-label="Close"></button>
+    `;
+    notice.querySelector('.sync-notice-text').textContent = message;
+    notice.querySelector('.btn-close').addEventListener('click', () => notice.remove());
+    notice.querySelector('.sync-notice-retry')?.addEventListener('click', requestOfflineSync);
+}
+
+function setRowsFor(setId) {
+    return document.querySelectorAll(`.set-row[data-set-id="${setId}"]`);
+}
+
+// Show the server's values of a set that changed elsewhere
+function applyServerSetValues(setId, values) {
+    const weight = values.weight !== null && values.weight !== undefined && values.weight !== ''
+        ? parseFloat(values.weight).toFixed(1)
+        : '';
+    setRowsFor(setId).forEach(row => {
+        row.dataset.reps = values.reps ?? '';
+        row.dataset.weight = weight;
+        row.dataset.isCompleted = values.is_completed ? 'true' : 'false';
+        row.classList.toggle('set-completed', !!values.is_completed);
+        const repsInput = row.querySelector('[data-field="reps"]');
+        if (repsInput) repsInput.value = values.reps ?? '';
+        const weightInput = row.querySelector('[data-field="weight"]');
+        if (weightInput) weightInput.value = weight;
+        const warmupInput = row.querySelector('[data-field="is_warmup"]');
+        if (warmupInput) warmupInput.checked = !!values.is_warmup;
+        const doneButton = row.querySelector('.mark-set-btn');
+        if (doneButton) {
+            doneButton.dataset.completed = values.is_completed ? 'true' : 'false';
+            doneButton.classList.toggle('btn-success', !!values.is_completed);
+            doneButton.classList.toggle('text-white', !!values.is_completed);
+            doneButton.classList.toggle('btn-outline-success', !values.is_completed);
+        }
+    });
+}
+
+function applySyncResults(results = [], pending = 0) {
+    const problems = [];
+    results.forEach(result => {
+        if (!result) return;
+        const tmpId = `tmp-${result.key}`;
+        if (result.status === 'applied' || result.status === 'replayed') {
+            if (result.op === 'create' && result.id) {
+                document.querySelectorAll(`[data-set-id="${tmpId}"]`).forEach(el => {
+                    el.dataset.setId = String(result.id);
+                });
+            }
+        } else if (result.status === 'conflict') {
+            if (result.current) {
+                applyServerSetValues(result.current.id, result.current);
+                problems.push('A set was changed on another device; showing the saved values.');
+            } else {
+                const setId = result.id || tmpId;
+                setRowsFor(setId).forEach(row => row.remove());
+                problems.push('A set you edited offline had been deleted.');
+            }
+        } else if (result.status === 'rejected') {
+            if (result.op === 'create') {
+                setRowsFor(tmpId).forEach(row => {
+                    row.classList.add('table-danger');
+                    row.title = 'Not saved';
+                });
+            }
+            problems.push(`A set edit could not be saved: ${result.error || 'rejected'}`);
+        }
+    });
+
+    if (problems.length) {
+        showSyncNotice(problems.length === 1 ? problems[0] : `${problems[0]} (${problems.length} sync issues)`);
+    } else if (!pending) {
+        showSyncNotice(null);
+    }
+}
+
+function showSyncFailure(error, pending = 0) {
+    const edits = pending === 1 ? '1 set edit is' : `${pending} set edits are`;
+    showSyncNotice(`${edits} not saved yet (${error}).`, true);
+}
+
 // --- Update Exercise Feedback ---
 // Triggered by data-function="click->updateExerciseFeedback"
 // Needs data-exercise-id and data-feedback on the button
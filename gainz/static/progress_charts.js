@@ -442,11 +442,14 @@
             }
 
             try {
+                // Revalidate with the stored ETag; unchanged data comes back as a 304
+                // and the browser serves the cached body.
                 const response = await fetch(buildChartUrl(exerciseId, filters), {
                     headers: {
                         'X-Requested-With': 'XMLHttpRequest',
                     },
                     credentials: 'same-origin',
+                    cache: 'no-cache',
                 });
 
                 if (!response.ok) {
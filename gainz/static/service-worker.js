@@ -5,7 +5,11 @@ self.addEventListener('install', event => {
 });
 
 self.addEventListener('activate', event => {
-    event.waitUntil(self.clients.claim());
+    // Also push set writes a previous worker or session left queued
+    event.waitUntil(Promise.all([
+        self.clients.claim(),
+        flushSyncQueueOnce().catch(() => undefined)
+    ]));
 });
 
 function showTimerNotification(payload = {}) {
@@ -51,3 +55,193 @@ self.addEventListener('notificationclick', event => {
         })
     );
 });
+
+// --- Offline set logging ---
+// Set creates, edits and deletes made while offline (or while older ones are
+// still queued) are stored in IndexedDB and answered with a synthetic
+// response; the queue is flushed to /api/sync/push/ when the worker starts,
+// when a page loads or comes back online, by Background Sync where the
+// browser has it, and before every later set write. New sets get a temporary
+// id ("tmp-<key>") that later edits can target. Pages get each flush's
+// results ("sync-results", to swap temporary ids and show conflicts) and its
+// failures ("sync-failed"); see applySyncResults in gainz.js.
+
+const SYNC_DB_NAME = 'gainz-sync';
+const SYNC_STORE = 'ops';
+const SYNC_PUSH_URL = '/api/sync/push/';
+const SYNC_PUSH_CHUNK = 100;
+const SYNC_TAG = 'gainz-sync';
+const SET_CREATE_PATTERN = /^\/api\/workouts\/exercises\/(\d+)\/sets\/$/;
+const SET_DETAIL_PATTERN = /^\/api\/workouts\/sets\/((?:tmp-)?[\w-]+)\/$/;
+
+function openSyncDb() {
+    return new Promise((resolve, reject) => {
+        const request = indexedDB.open(SYNC_DB_NAME, 1);
+        request.onupgradeneeded = () => {
+            request.result.createObjectStore(SYNC_STORE, { keyPath: 'seq', autoIncrement: true });
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function syncStoreRequest(mode, callback) {
+    return openSyncDb().then(db => new Promise((resolve, reject) => {
+        const transaction = db.transaction(SYNC_STORE, mode);
+        const request = callback(transaction.objectStore(SYNC_STORE));
+        transaction.oncomplete = () => resolve(request ? request.result : undefined);
+        transaction.onerror = () => reject(transaction.error);
+    }));
+}
+
+const queuedOps = () => syncStoreRequest('readonly', store => store.getAll());
+const queueOp = entry => syncStoreRequest('readwrite', store => store.add(entry));
+const dropOps = seqs => syncStoreRequest('readwrite', store => {
+    seqs.forEach(seq => store.delete(seq));
+});
+
+function newOpKey() {
+    return self.crypto && self.crypto.randomUUID
+        ? self.crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+}
+
+function jsonResponse(data, status = 200) {
+    return new Response(JSON.stringify(data), {
+        status,
+        headers: { 'Content-Type': 'application/json' }
+    });
+}
+
+function setOperationFor(request, body) {
+    const path = new URL(request.url).pathname;
+    const key = newOpKey();
+    const createMatch = path.match(SET_CREATE_PATTERN);
+    if (createMatch && request.method === 'POST') {
+        const { set_number, ...fields } = body || {};
+        return { op: 'create', key, workout_exercise: Number(createMatch[1]), ...fields };
+    }
+
+    const detailMatch = path.match(SET_DETAIL_PATTERN);
+    if (!detailMatch || !['PATCH', 'DELETE'].includes(request.method)) {
+        return null;
+    }
+    const target = detailMatch[1].startsWith('tmp-')
+        ? { create_key: detailMatch[1].slice(4) }
+        : { id: Number(detailMatch[1]) };
+    const kind = request.method === 'DELETE' ? 'delete' : 'update';
+    return { op: kind, key, ...target, ...(kind === 'update' ? body : {}) };
+}
+
+async function handleSetWrite(request) {
+    latestCsrfToken = request.headers.get('X-CSRFToken') || latestCsrfToken;
+    let queued = await queuedOps().catch(() => []);
+    if (queued.length) {
+        // Earlier writes go first; this also retries whatever a failed flush left behind
+        await flushSyncQueueOnce().catch(() => undefined);
+        queued = await queuedOps().catch(() => []);
+    }
+    // Sets with a temporary id are only known to the server by their create key
+    const targetsQueuedSet = new URL(request.url).pathname.includes('/tmp-');
+    let online = !queued.length;
+    if (!queued.length && !targetsQueuedSet) {
+        try {
+            return await fetch(request.clone());
+        } catch (error) {
+            online = false;  // Offline: fall through and queue it
+        }
+    }
+
+    const body = request.method === 'DELETE' ? null : await request.clone().json().catch(() => ({}));
+    const op = setOperationFor(request, body);
+    await queueOp({ op, csrfToken: request.headers.get('X-CSRFToken') });
+    if (online) {
+        // Only the queue is behind; push this write through it right away
+        await flushSyncQueueOnce().catch(() => undefined);
+    } else if (self.registration.sync) {
+        self.registration.sync.register(SYNC_TAG).catch(() => undefined);
+    }
+
+    if (op.op === 'delete') {
+        return new Response(null, { status: 204 });
+    }
+    const id = op.op === 'create' ? `tmp-${op.key}` : (op.id || `tmp-${op.create_key}`);
+    return jsonResponse({ ...body, id, queued: true }, op.op === 'create' ? 201 : 200);
+}
+
+let flushing = null;
+let latestCsrfToken = null;  // From the newest page request; queued tokens may have rotated since
+
+async function notifyClients(message) {
+    const clientList = await self.clients.matchAll({ type: 'window' });
+    clientList.forEach(client => client.postMessage(message));
+}
+
+async function flushSyncQueue() {
+    const queued = await queuedOps();
+    for (let start = 0; start < queued.length; start += SYNC_PUSH_CHUNK) {
+        const chunk = queued.slice(start, start + SYNC_PUSH_CHUNK);
+        const response = await fetch(SYNC_PUSH_URL, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': latestCsrfToken || chunk[chunk.length - 1].csrfToken || ''
+            },
+            body: JSON.stringify({ operations: chunk.map(entry => entry.op) })
+        });
+        if (!response.ok) {
+            const error = new Error(`Sync push failed with status ${response.status}`);
+            error.pending = queued.length - start;
+            throw error;
+        }
+
+        // Every operation got a final answer (applied, replayed, conflict or rejected)
+        const data = await response.json();
+        await dropOps(chunk.map(entry => entry.seq));
+        await notifyClients({
+            type: 'sync-results',
+            results: data.results,
+            cursor: data.cursor,
+            pending: queued.length - start - chunk.length
+        });
+    }
+}
+
+function flushSyncQueueOnce() {
+    if (!flushing) {
+        flushing = flushSyncQueue().catch(async error => {
+            // Queued edits stay queued; tell the user they aren't saved yet
+            const pending = error.pending ?? (await queuedOps().catch(() => [])).length;
+            await notifyClients({ type: 'sync-failed', error: error.message, pending });
+            throw error;
+        }).finally(() => {
+            flushing = null;
+        });
+    }
+    return flushing;
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method === 'GET' || new URL(request.url).origin !== self.location.origin) {
+        return;
+    }
+    const path = new URL(request.url).pathname;
+    if (SET_CREATE_PATTERN.test(path) || SET_DETAIL_PATTERN.test(path)) {
+        event.respondWith(handleSetWrite(request));
+    }
+});
+
+self.addEventListener('sync', event => {
+    if (event.tag === SYNC_TAG) {
+        event.waitUntil(flushSyncQueueOnce());
+    }
+});
+
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'sync-now') {
+        latestCsrfToken = event.data.csrfToken || latestCsrfToken;
+        event.waitUntil(flushSyncQueueOnce().catch(error => console.warn('Offline sync failed:', error)));
+    }
+});
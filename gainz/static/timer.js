@@ -755,6 +755,11 @@ class TimerManager {
      * @returns {Promise<number>} Default duration in seconds
      */
     async getDefaultDurationForExercise(exerciseId) {
+        const embeddedSettings = getEmbeddedTimerSettings(exerciseId);
+        if (embeddedSettings) {
+            return embeddedSettings.timer_seconds;
+        }
+
         try {
             // Get exercise type from DOM
             const exerciseCard = document.querySelector(`[data-exercise-id="${exerciseId}"]`);
@@ -1164,6 +1169,16 @@ window.updateTimerDisplays = function() {
  */
 async function handleTimerAutoStart(addSetButton) {
     try {
+        // Settings embedded in the page already have every layer resolved
+        const embeddedExerciseId = addSetButton.closest('.workout-exercise-card')?.dataset.exerciseId;
+        const embeddedSettings = embeddedExerciseId ? getEmbeddedTimerSettings(embeddedExerciseId) : null;
+        if (embeddedSettings) {
+            if (embeddedSettings.auto_start && embeddedSettings.timer_seconds > 0) {
+                window.timerManager.startTimer(embeddedExerciseId, embeddedSettings.timer_seconds);
+            }
+            return;
+        }
+
         // Fetch user timer preferences
         const preferencesResponse = await httpRequestHelper('/api/timer-preferences/', 'GET');
 
@@ -1211,6 +1226,27 @@ async function handleTimerAutoStart(addSetButton) {
     }
 }
 
+/**
+ * Resolved timer settings for a workout exercise, embedded in the workout page
+ * by the server with every override layer applied (see gainz/workouts/timers.py).
+ * Exercises added after the page loaded aren't in it.
+ *
+ * @param {string} exerciseId - Workout exercise ID
+ * @returns {object|null} {timer_seconds, source, auto_start, sound_enabled}, or null if not embedded
+ */
+function getEmbeddedTimerSettings(exerciseId) {
+    if (window.workoutTimerSettings === undefined) {
+        const settingsElement = document.getElementById('workout-timer-settings');
+        try {
+            window.workoutTimerSettings = settingsElement ? JSON.parse(settingsElement.textContent) : null;
+        } catch (error) {
+            console.warn('Could not read embedded timer settings:', error);
+            window.workoutTimerSettings = null;
+        }
+    }
+    return (window.workoutTimerSettings && window.workoutTimerSettings[exerciseId]) || null;
+}
+
 /**
  * Determine timer duration using the complete override hierarchy:
  * 1. Program-specific setting (highest priority)
@@ -1224,6 +1260,11 @@ async function handleTimerAutoStart(addSetButton) {
  * @returns {Promise<number>} Timer duration in seconds
  */
 async function determineTimerDuration(exerciseId, preferences) {
+    const embeddedSettings = getEmbeddedTimerSettings(exerciseId);
+    if (embeddedSettings) {
+        return embeddedSettings.timer_seconds;
+    }
+
     try {
         // Get exercise type first (needed for all levels)
         const exerciseCard = document.querySelector(`[data-exercise-id="${exerciseId}"]`);
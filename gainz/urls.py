@@ -41,6 +41,14 @@ from gainz.views import (
     api_exercises_search, # Add exercises search API view
     api_program_timer_preferences, # Add program timer preferences API view
     api_routine_timer_preferences, # Add routine timer preferences API view
+    api_routine_prefill_preview, # Routine prefill preview API view
+    api_workout_imports, # Workout history import API views
+    api_workout_import_detail,
+    api_workout_import_resume,
+    api_job_status, # Background job status API view
+    api_sync_changes, # Offline sync change feed
+    api_sync_push, # Offline sync batched writes
+    api_upcoming_sessions, # Active program schedule
     health_check, # Add health check view
     register, # Add register view
     generate_sample_data, # Add sample data generation view
@@ -102,6 +110,21 @@ urlpatterns = [
     # Program and routine timer preferences API endpoints
     path('api/programs/<int:program_id>/timer-preferences/', api_program_timer_preferences, name='api-program-timer-preferences'),
     path('api/routines/<int:routine_id>/timer-preferences/', api_routine_timer_preferences, name='api-routine-timer-preferences'),
+    path('api/routines/<int:routine_id>/prefill-preview/', api_routine_prefill_preview, name='api-routine-prefill-preview'),
+
+    # Workout history import API endpoints
+    path('api/imports/', api_workout_imports, name='api-workout-imports'),
+    path('api/imports/<int:import_id>/', api_workout_import_detail, name='api-workout-import-detail'),
+    path('api/imports/<int:import_id>/resume/', api_workout_import_resume, name='api-workout-import-resume'),
+
+    # Background job status API endpoint
+    path('api/jobs/<str:job_id>/', api_job_status, name='api-job-status'),
+
+    # Offline sync API endpoints
+    path('api/sync/changes/', api_sync_changes, name='api-sync-changes'),
+    path('api/sync/push/', api_sync_push, name='api-sync-push'),
+    # Program schedule API endpoint
+    path('api/schedule/upcoming/', api_upcoming_sessions, name='api-upcoming-sessions'),
 
     # Nested API endpoints
     path('api/workouts/exercises/<int:workout_exercise_id>/sets/',
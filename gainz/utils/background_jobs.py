@@ -0,0 +1,167 @@
+"""
+Background Jobs
+
+Thin layer over django-rq for work that shouldn't run inside a gunicorn
+request: AI conversation turns, workout history imports and progress rollup
+rebuilds. It adds:
+
+- per-user deduplication: while a job with the same dedup key is queued or
+  running, enqueueing again returns that job instead of a new one
+- retries with backoff (the worker must run with --with-scheduler)
+- a JSON status payload for the polling endpoint
+
+When Redis is unreachable (local development without Redis) jobs run inline
+and the payload reports them as already finished. Any other error setting up
+the queue is a configuration problem and raises ImproperlyConfigured.
+"""
+
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+try:
+    import django_rq
+    from rq import Retry
+    from rq.exceptions import NoSuchJobError
+    from rq.job import Job
+except ImportError:  # pragma: no cover - django-rq is in requirements.txt
+    django_rq = None
+
+QUEUE_NAME = 'default'
+DEFAULT_RETRY_INTERVALS = [10, 30, 60]  # Seconds before the 1st, 2nd and 3rd retry
+RESULT_TTL = 60 * 60  # Keep results around long enough for the client to poll them
+FAILURE_TTL = 60 * 60 * 24
+ACTIVE_STATUSES = {'queued', 'started', 'deferred', 'scheduled'}
+
+
+def _dedup_key(dedup_key: str) -> str:
+    return f"job_dedup:{dedup_key}"
+
+
+def _get_queue():
+    """The job queue, or None when Redis can't be reached; a misconfigured queue raises."""
+    if django_rq is None:
+        return None
+    try:
+        queue = django_rq.get_queue(QUEUE_NAME)
+        queue.connection.ping()
+        return queue
+    except (RedisConnectionError, RedisTimeoutError) as e:
+        print(f"Background queue unavailable, running job inline: {e}")
+        return None
+    except Exception as e:
+        # Running everything inline would hide a broken RQ_QUEUES setting
+        print(f"Background queue misconfigured: {e.__class__.__name__}: {e}")
+        raise ImproperlyConfigured(f"RQ queue '{QUEUE_NAME}' could not be set up: {e}") from e
+
+
+def _status_name(job) -> str:
+    status = job.get_status(refresh=False)
+    return getattr(status, 'value', status) or 'unknown'
+
+
+def _fetch_job(queue, job_id: str):
+    try:
+        return Job.fetch(job_id, connection=queue.connection)
+    except NoSuchJobError:
+        return None
+
+
+def job_payload(job, deduplicated: bool = False) -> Dict[str, Any]:
+    """JSON-serializable status of an rq job for the polling endpoint."""
+    status = _status_name(job)
+    payload = {
+        'job_id': job.id,
+        'status': status,
+        'status_url': reverse('api-job-status', args=[job.id]),
+        'deduplicated': deduplicated,
+        'result': None,
+        'error': None,
+        'retries_left': job.retries_left,
+    }
+    if status == 'finished':
+        payload['result'] = job.result
+    elif status == 'failed':
+        exc_info = (job.exc_info or '').strip().splitlines()
+        payload['error'] = exc_info[-1] if exc_info else 'Job failed'
+    return payload
+
+
+def enqueue_user_job(
+    user_id: int,
+    func: Callable,
+    *args,
+    dedup_key: Optional[str] = None,
+    retries: int = len(DEFAULT_RETRY_INTERVALS),
+    timeout: Optional[int] = None,
+    **kwargs,
+) -> Dict[str, Any]:
+    """
+    Enqueue `func(*args, **kwargs)` on behalf of a user and return its status payload.
+
+    Jobs sharing a `dedup_key` run one at a time: while one is queued or
+    running its payload is returned with `deduplicated` set. Keys should
+    include the user id, e.g. f"rebuild_rollups:{user_id}".
+    """
+    queue = _get_queue()
+    if queue is None:
+        return run_inline(func, *args, **kwargs)
+
+    job_id = str(uuid.uuid4())
+    connection = queue.connection
+    if dedup_key:
+        key = _dedup_key(dedup_key)
+        if not connection.set(key, job_id, nx=True, ex=FAILURE_TTL):
+            existing_id = connection.get(key)
+            existing = _fetch_job(queue, existing_id.decode('utf-8')) if existing_id else None
+            if existing is not None and _status_name(existing) in ACTIVE_STATUSES:
+                return job_payload(existing, deduplicated=True)
+            connection.set(key, job_id, ex=FAILURE_TTL)
+
+    job = queue.enqueue_call(
+        func,
+        args=args,
+        kwargs=kwargs,
+        job_id=job_id,
+        timeout=timeout,
+        result_ttl=RESULT_TTL,
+        failure_ttl=FAILURE_TTL,
+        meta={'user_id': user_id},
+        retry=Retry(max=retries, interval=DEFAULT_RETRY_INTERVALS[:retries] or 0) if retries else None,
+    )
+    return job_payload(job)
+
+
+def run_inline(func: Callable, *args, **kwargs) -> Dict[str, Any]:
+    """Run a job in-process and describe it like a finished (or failed) queued job."""
+    payload = {
+        'job_id': None,
+        'status': 'finished',
+        'status_url': None,
+        'deduplicated': False,
+        'result': None,
+        'error': None,
+        'retries_left': 0,
+    }
+    try:
+        payload['result'] = func(*args, **kwargs)
+    except Exception as e:
+        print(f"Inline job {getattr(func, '__name__', func)} failed: {e}")
+        payload['status'] = 'failed'
+        payload['error'] = str(e)
+    return payload
+
+
+def get_user_job(user_id: int, job_id: str):
+    """Return the rq job if it exists and was enqueued for this user, else None."""
+    queue = _get_queue()
+    if queue is None:
+        return None
+    job = _fetch_job(queue, job_id)
+    if job is None or job.meta.get('user_id') != user_id:
+        return None
+    return job
@@ -0,0 +1,94 @@
+"""
+Exercise Chart Cache
+
+Caches the per-workout chart points served by api_exercise_chart_data in the
+configured Redis cache. Every (user, exercise) pair has a version counter
+that is part of each cache key (see version_stamps.py), so bumping it
+invalidates all filter combinations for that exercise at once without
+scanning keys. Stamps never repeat, so neither do the ETags built from them.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.http import parse_etags
+
+from .version_stamps import bump_version, current_version
+
+CHART_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+
+
+def _version_key(user_id: int, exercise_id: int) -> str:
+    return f"chart_data_version:{user_id}:{exercise_id}"
+
+
+def get_chart_version(user_id: int, exercise_id: int) -> Optional[int]:
+    """Return the current cache version for a user's exercise chart, or None when the cache is down."""
+    return current_version(_version_key(user_id, exercise_id))
+
+
+def invalidate_exercise_chart(user_id: int, exercise_id: int) -> None:
+    """Drop every cached chart variant for one user and exercise."""
+    bump_version(_version_key(user_id, exercise_id))
+
+
+def invalidate_exercise_charts(user_id: int, exercise_ids: Iterable[int]) -> None:
+    """Invalidate the charts of several exercises for one user."""
+    for exercise_id in set(exercise_ids):
+        if exercise_id is not None:
+            invalidate_exercise_chart(user_id, exercise_id)
+
+
+def chart_cache_key(user_id: int, exercise_id: int, params: Dict[str, Any]) -> Optional[str]:
+    """
+    Build the cache key for one chart request.
+
+    The current day is part of the key because the period window is relative
+    to today. Returns None when the cache backend is unavailable.
+    """
+    version = get_chart_version(user_id, exercise_id)
+    if version is None:
+        return None
+
+    fingerprint = json.dumps(
+        dict(params, day=timezone.localdate().isoformat()),
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+    return f"chart_data:{user_id}:{exercise_id}:v{version}:{digest}"
+
+
+def chart_etag(cache_key: str) -> str:
+    """Return a quoted ETag for a chart cache key."""
+    return '"%s"' % hashlib.md5(cache_key.encode('utf-8')).hexdigest()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header lists the ETag (or is '*'), compared weakly."""
+    etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)] if if_none_match else []
+    return etag in etags or '*' in etags
+
+
+def get_cached_chart(cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Return a cached chart payload, or None on a miss."""
+    if not cache_key:
+        return None
+    try:
+        return cache.get(cache_key)
+    except Exception as e:
+        print(f"Chart cache read failed: {e}")
+        return None
+
+
+def set_cached_chart(cache_key: Optional[str], payload: Dict[str, Any]) -> None:
+    """Store a chart payload under its cache key."""
+    if not cache_key:
+        return
+    try:
+        cache.set(cache_key, payload, CHART_CACHE_TIMEOUT)
+    except Exception as e:
+        print(f"Chart cache write failed: {e}")
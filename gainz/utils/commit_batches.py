@@ -0,0 +1,52 @@
+"""
+On-Commit Batches
+
+Signal handlers fire once per row, but the work they trigger (refreshing a
+rollup, rebuilding an exercise's records) only needs doing once per
+transaction. Handlers queue that work here by key; each batch hands its
+items to its flush function once, when the transaction commits, so deleting
+a workout's 25 sets rebuilds each affected exercise once. Queuing a key
+again replaces its value.
+
+Outside a transaction the flush runs right away. Batches live in a
+thread-local dict (database connections are per thread too) and hold only a
+weak reference to their on-commit callback: when the transaction, or the
+savepoint the batch was started in, rolls back, Django drops the callback,
+the reference dies and the next item starts a fresh batch. Items queued in
+a savepoint that rolled back while its batch lives on are still flushed, so
+flush functions must recompute from the database rather than trust them.
+"""
+
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+def add_to_commit_batch(name: str, key: Hashable, flush: Callable[[Dict[Hashable, Any]], None], value: Any = None) -> None:
+    """
+    Queue `key` (with `value`) in the batch `name`, whose `flush(items)` runs
+    once when the current transaction commits. Every caller of one batch
+    name must pass the same flush function.
+    """
+    batches = getattr(_local, 'batches', None)
+    if batches is None:
+        batches = _local.batches = {}
+
+    entry = batches.get(name)
+    if entry is not None and entry[1]() is not None:
+        entry[0][key] = value
+        return
+
+    items = {key: value}
+
+    def run():
+        if batches.get(name, (None,))[0] is items:
+            del batches[name]
+        flush(items)
+
+    batches[name] = (items, weakref.ref(run))
+    transaction.on_commit(run)
@@ -0,0 +1,90 @@
+"""
+Fast JSON Rendering
+
+orjson-backed replacements for django.http.JsonResponse and DRF's
+JSONRenderer. orjson serializes datetimes, dates, UUIDs and numpy scalars
+itself and is several times faster than the stdlib encoder on the large
+chart and progress payloads; Decimal, lazy translation strings and
+timedeltas go through a small default hook.
+
+Output matches what the views returned before: Decimals stay strings in
+JsonResponse payloads (DjangoJSONEncoder) and become numbers in DRF
+responses (DRF's encoder), UTC datetimes end in "Z", int dict keys become
+strings. Datetimes keep their microseconds where DjangoJSONEncoder cut them
+to milliseconds.
+
+Without orjson installed both fall back to the stdlib encoders.
+"""
+
+import datetime
+import decimal
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.duration import duration_iso_string
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+
+def _default(obj, decimal_type=str):
+    """Types orjson doesn't serialize itself."""
+    if isinstance(obj, decimal.Decimal):
+        return decimal_type(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return duration_iso_string(obj)
+    if hasattr(obj, 'item') and hasattr(obj, 'dtype'):
+        return obj.item()  # numpy scalar orjson didn't take (e.g. float128)
+    if hasattr(obj, '__iter__') and not isinstance(obj, (str, bytes)):
+        return list(obj)  # Sets, querysets and generators, as DRF's encoder allows
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _default_decimal_as_float(obj):
+    return _default(obj, decimal_type=float)
+
+
+def dumps(data, decimal_as_float: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes with orjson, or the stdlib encoder without it."""
+    if orjson is None:
+        return JSONRenderer().render(data) if decimal_as_float else DjangoJSONEncoder().encode(data).encode('utf-8')
+    return orjson.dumps(data, default=_default_decimal_as_float if decimal_as_float else _default, option=ORJSON_OPTIONS)
+
+
+class FastJsonResponse(HttpResponse):
+    """Drop-in for django.http.JsonResponse (same arguments) that renders with orjson."""
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        if encoder is DjangoJSONEncoder and not json_dumps_params:
+            content = dumps(data)
+        else:
+            # Custom encoders and dumps options (indent etc.) need the stdlib encoder
+            content = json.dumps(data, cls=encoder, **(json_dumps_params or {}))
+        super().__init__(content=content, **kwargs)
+
+
+class OrjsonRenderer(JSONRenderer):
+    """DRF JSON renderer using orjson; the browsable API's indented output still uses the stdlib."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data, decimal_as_float=True)
@@ -0,0 +1,153 @@
+"""
+Keyset (Cursor) Pagination
+
+Pages through date-ordered rows using the last row's (date, id) as the
+cursor instead of an OFFSET, so every page costs the same index range scan
+as the first one and no COUNT(*) is needed. Used by the workout list, the
+social feed, comment threads and the workout/set REST endpoints.
+"""
+
+import base64
+import datetime
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = Tuple[datetime.datetime, int]
+
+
+def encode_cursor(date: datetime.datetime, pk: int) -> str:
+    """Opaque, URL-safe cursor for the position after (date, pk)."""
+    raw = json.dumps([date.isoformat(), pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    """Decode a cursor; a missing or malformed cursor means the first page."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date_value, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        date = parse_datetime(date_value)
+        if date is None:
+            return None
+        return date, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+@dataclass
+class KeysetPage:
+    """One page of a keyset-paginated list."""
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    cursor: Optional[str] = None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.cursor is not None
+
+
+def keyset_page(
+    queryset: QuerySet,
+    cursor: Optional[str],
+    page_size: int,
+    date_field: str = 'date',
+    descending: bool = True,
+) -> KeysetPage:
+    """
+    Return the page of `queryset` after `cursor`, ordered by (date_field, id),
+    newest first unless `descending` is False.
+
+    `date_field` may name an annotation, e.g. the workout date of a set.
+    Fetches one extra row to know whether there is a next page.
+    """
+    sign, lookup = ('-', 'lt') if descending else ('', 'gt')
+    queryset = queryset.order_by(f'{sign}{date_field}', f'{sign}id')
+    position = decode_cursor(cursor)
+    if position is not None:
+        date, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}': date}) | Q(**{date_field: date, f'id__{lookup}': pk})
+        )
+
+    rows = list(queryset[:page_size + 1])
+    items = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, date_field), last.id)
+    return KeysetPage(items=items, next_cursor=next_cursor, cursor=cursor if position else None)
+
+
+class DateIdCursorPagination(BasePagination):
+    """
+    DRF pagination over (date, id), newest first. Views set `cursor_date_field`
+    when the date comes from a related model (annotate it in get_queryset).
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request) -> int:
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        date_field = getattr(view, 'cursor_date_field', 'date')
+        self.request = request
+        self.page = keyset_page(
+            queryset,
+            request.query_params.get(self.cursor_query_param),
+            self.get_page_size(request),
+            date_field=date_field,
+        )
+        return self.page.items
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.page.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.page.next_cursor)
+
+    def get_first_link(self) -> Optional[str]:
+        if not self.page.has_previous:
+            return None
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
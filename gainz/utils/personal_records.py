@@ -0,0 +1,353 @@
+"""
+Personal Record Detection
+
+Detects personal records as sets are completed; planned sets (from routines,
+or logged ahead) count once they are marked done. Every (user, exercise)
+pair has an ExerciseBest row holding the current estimated 1RM, the heaviest
+weight per rep count and the best session volume, so a new set is checked
+against that index instead of the full history. Edits that only raise a set's values are
+checked the same way; other edits and deletes replay the history of the one
+affected exercise; the backfill command replays whole users. Checks and
+replays run once per transaction (see set_upkeep.py).
+"""
+
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from ..workouts.models import ExerciseBest, ExerciseSet, PersonalRecord
+
+# Record types maintained by the detector; other types are left to the user
+DETECTED_RECORD_TYPES = ('1rm', 'rep_max', 'volume')
+
+RecordKey = Tuple[int, str, Optional[int]]
+
+
+def _record_key(workout_exercise_id: int, record_type: str, reps: int) -> RecordKey:
+    """One record per session and type, and per rep count for rep maxes."""
+    return (workout_exercise_id, record_type, reps if record_type == 'rep_max' else None)
+
+
+def check_set(
+    best: ExerciseBest,
+    exercise_set: ExerciseSet,
+    session_volume: Optional[Decimal] = None,
+) -> List[Tuple[str, Decimal]]:
+    """
+    Compare a set against the current bests and update them in place.
+
+    Returns (record_type, value) pairs for every record the set broke. The
+    first value seen for a metric only establishes a baseline and is not
+    reported as a record.
+    """
+    records = []
+    if not _counts(exercise_set.weight, exercise_set.reps, exercise_set.is_warmup, exercise_set.is_completed):
+        return records
+
+    estimate = exercise_set.get_best_1rm_estimate()
+    if estimate is not None:
+        estimate = estimate.quantize(Decimal('0.01'))
+        if best.best_1rm is None:
+            best.best_1rm = estimate
+        elif estimate > best.best_1rm:
+            best.best_1rm = estimate
+            records.append(('1rm', estimate))
+
+    weight = Decimal(exercise_set.weight).quantize(Decimal('0.01'))
+    rep_key = str(exercise_set.reps)
+    previous_weight = best.rep_maxes.get(rep_key)
+    if previous_weight is None or weight > Decimal(previous_weight):
+        best.rep_maxes[rep_key] = str(weight)
+        if previous_weight is not None:
+            records.append(('rep_max', weight))
+
+    if session_volume:
+        # Compare against the best of other sessions, not earlier sets of this one
+        same_session = best.best_volume_source_id == exercise_set.workout_exercise_id
+        baseline = best.previous_best_volume if same_session else best.best_volume
+        if best.best_volume is None or session_volume > best.best_volume:
+            if not same_session:
+                best.previous_best_volume = best.best_volume
+                best.best_volume_source_id = exercise_set.workout_exercise_id
+            best.best_volume = session_volume
+        if baseline is not None and session_volume > baseline:
+            records.append(('volume', session_volume))
+
+    return records
+
+
+def _replay_sets(
+    user_id: int,
+    sets: Iterable[ExerciseSet],
+    bests: Optional[Dict[int, ExerciseBest]] = None,
+    session_volumes: Optional[Dict[int, Decimal]] = None,
+) -> Tuple[Dict[int, ExerciseBest], Dict[RecordKey, Dict]]:
+    """
+    Replay sets in chronological order and collect the bests and records they produce.
+
+    Sets must come with workout_exercise and its workout selected. `bests` and
+    `session_volumes` seed the replay when continuing from stored state.
+    """
+    bests = {} if bests is None else bests
+    session_volumes = {} if session_volumes is None else session_volumes
+    records: Dict[RecordKey, Dict] = {}
+
+    for exercise_set in sets:
+        workout_exercise = exercise_set.workout_exercise
+        best = bests.get(workout_exercise.exercise_id)
+        if best is None:
+            best = bests[workout_exercise.exercise_id] = ExerciseBest(
+                user_id=user_id,
+                exercise_id=workout_exercise.exercise_id,
+                rep_maxes={},
+            )
+
+        session_volume = None
+        if exercise_set.is_completed and not exercise_set.is_warmup:
+            session_volume = session_volumes.get(workout_exercise.id, Decimal('0')) + exercise_set.get_volume()
+            session_volumes[workout_exercise.id] = session_volume
+
+        for record_type, value in check_set(best, exercise_set, session_volume):
+            records[_record_key(workout_exercise.id, record_type, exercise_set.reps)] = {
+                'user_id': user_id,
+                'exercise_id': workout_exercise.exercise_id,
+                'workout_exercise_source_id': workout_exercise.id,
+                'exercise_set_source_id': exercise_set.id,
+                'record_type': record_type,
+                'weight': exercise_set.weight,
+                'reps': exercise_set.reps,
+                'value': value,
+                'date_achieved': workout_exercise.workout.date,
+            }
+
+    return bests, records
+
+
+def _sync_records(
+    user_id: int,
+    records: Dict[RecordKey, Dict],
+    exercise_ids: Optional[Iterable[int]] = None,
+    batch_size: int = 500,
+) -> int:
+    """
+    Make a user's detected records match a replay result.
+
+    Only exercises in `exercise_ids` are touched when given. Existing rows are
+    updated in place, and only when changed, so attached videos and notes
+    survive. Returns the number of records created.
+    """
+    existing = PersonalRecord.objects.filter(
+        user_id=user_id,
+        record_type__in=DETECTED_RECORD_TYPES,
+        workout_exercise_source__isnull=False,
+    )
+    if exercise_ids is not None:
+        existing = existing.filter(exercise_id__in=list(exercise_ids))
+
+    pending = dict(records)
+    to_update = []
+    stale_ids = []
+    for record in existing:
+        data = pending.pop(_record_key(record.workout_exercise_source_id, record.record_type, record.reps), None)
+        if data is None:
+            stale_ids.append(record.id)
+            continue
+        fields = ('exercise_set_source_id', 'weight', 'reps', 'value', 'date_achieved')
+        if any(getattr(record, field) != data[field] for field in fields):
+            for field in fields:
+                setattr(record, field, data[field])
+            to_update.append(record)
+
+    if stale_ids:
+        PersonalRecord.objects.filter(id__in=stale_ids).delete()
+    if to_update:
+        PersonalRecord.objects.bulk_update(
+            to_update,
+            ['exercise_set_source', 'weight', 'reps', 'value', 'date_achieved'],
+            batch_size=batch_size,
+        )
+    PersonalRecord.objects.bulk_create(
+        [PersonalRecord(**data) for data in pending.values()],
+        batch_size=batch_size,
+    )
+    return len(pending)
+
+
+def detect_personal_records_for_sets(user_id: int, exercise_sets: List[ExerciseSet], batch_size: int = 500) -> int:
+    """
+    Check a batch of newly created sets for PRs in a fixed number of queries.
+
+    For callers that write sets with bulk_create, which skips the per-set
+    signal. Sets must be saved, in logging order, and carry their
+    workout_exercise and workout. Returns the number of records created.
+    """
+    if not exercise_sets:
+        return 0
+
+    exercise_ids = {exercise_set.workout_exercise.exercise_id for exercise_set in exercise_sets}
+    workout_exercise_ids = {exercise_set.workout_exercise_id for exercise_set in exercise_sets}
+
+    with transaction.atomic():
+        bests = {
+            best.exercise_id: best
+            for best in ExerciseBest.objects.select_for_update().filter(user_id=user_id, exercise_id__in=exercise_ids)
+        }
+
+        # Sets already logged in the same sessions count towards session volume
+        session_volumes = {
+            row['workout_exercise_id']: row['total']
+            for row in ExerciseSet.objects.filter(
+                workout_exercise_id__in=workout_exercise_ids,
+                is_warmup=False,
+                is_completed=True,
+            ).exclude(
+                id__in=[exercise_set.id for exercise_set in exercise_sets]
+            ).values('workout_exercise_id').annotate(total=Sum(F('weight') * F('reps')))
+        }
+
+        bests, records = _replay_sets(user_id, exercise_sets, bests, session_volumes)
+
+        ExerciseBest.objects.bulk_update(
+            [best for best in bests.values() if best.pk],
+            ['best_1rm', 'rep_maxes', 'best_volume', 'best_volume_source', 'previous_best_volume'],
+            batch_size=batch_size,
+        )
+        ExerciseBest.objects.bulk_create([best for best in bests.values() if not best.pk], batch_size=batch_size)
+
+        if not records:
+            return 0
+
+        to_update = []
+        for record in PersonalRecord.objects.filter(
+            workout_exercise_source_id__in=workout_exercise_ids,
+            record_type__in=DETECTED_RECORD_TYPES,
+        ):
+            data = records.pop(_record_key(record.workout_exercise_source_id, record.record_type, record.reps), None)
+            if data is None:
+                continue
+            for field in ('exercise_set_source_id', 'weight', 'reps', 'value', 'date_achieved'):
+                setattr(record, field, data[field])
+            to_update.append(record)
+
+        PersonalRecord.objects.bulk_update(
+            to_update,
+            ['exercise_set_source', 'weight', 'reps', 'value', 'date_achieved'],
+            batch_size=batch_size,
+        )
+        PersonalRecord.objects.bulk_create([PersonalRecord(**data) for data in records.values()], batch_size=batch_size)
+
+    return len(records)
+
+
+def _chronological_sets(user_id: int):
+    return ExerciseSet.objects.filter(
+        workout_exercise__workout__user_id=user_id,
+        is_completed=True,
+    ).select_related('workout_exercise__workout').order_by(
+        'workout_exercise__workout__date',
+        'workout_exercise__workout_id',
+        'workout_exercise__order',
+        'set_number',
+        'id',
+    )
+
+
+def check_logged_sets(user_id: int, set_ids: Iterable[int]) -> int:
+    """detect_personal_records_for_sets for saved sets by id; sets not completed yet are skipped."""
+    return detect_personal_records_for_sets(user_id, list(_chronological_sets(user_id).filter(id__in=list(set_ids))))
+
+
+def rebuild_exercise_records(user_id: int, exercise_id: int) -> None:
+    """Recompute the bests and detected records of one exercise after an edit or delete."""
+    sets = _chronological_sets(user_id).filter(workout_exercise__exercise_id=exercise_id)
+
+    with transaction.atomic():
+        bests, records = _replay_sets(user_id, sets)
+        best = bests.get(exercise_id)
+        if best is None:
+            ExerciseBest.objects.filter(user_id=user_id, exercise_id=exercise_id).delete()
+        else:
+            ExerciseBest.objects.update_or_create(
+                user_id=user_id,
+                exercise_id=exercise_id,
+                defaults={
+                    'best_1rm': best.best_1rm,
+                    'rep_maxes': best.rep_maxes,
+                    'best_volume': best.best_volume,
+                    'best_volume_source_id': best.best_volume_source_id,
+                    'previous_best_volume': best.previous_best_volume,
+                },
+            )
+        _sync_records(user_id, records, exercise_ids=[exercise_id])
+
+
+def _counts(weight, reps, is_warmup, is_completed) -> bool:
+    """Whether set values feed the bests at all."""
+    return is_completed and not is_warmup and bool(reps) and bool(weight) and weight > 0
+
+
+def edit_only_raises(exercise_set: ExerciseSet, previous_values, user_id: int, exercise_id: int) -> bool:
+    """
+    Whether an edit can only raise the bests, so checking the new values like
+    a new set's keeps them right. A set that changes rep count leaves its old
+    rep max bucket (and may move to a 1RM formula that estimates lower). A
+    set marked done is checked like a new one; one marked not done is not.
+    """
+    if previous_values is None:
+        return False
+    weight, reps, is_warmup, is_completed = previous_values
+    if not exercise_set.is_completed:
+        return not is_completed
+    if not is_completed:
+        return True
+    if is_warmup != exercise_set.is_warmup:
+        return False
+    if (exercise_set.weight or 0) < (weight or 0) or (exercise_set.reps or 0) < (reps or 0):
+        return False
+    if reps == exercise_set.reps or not _counts(weight, reps, is_warmup, is_completed):
+        return True
+
+    previous_estimate = ExerciseSet(weight=weight, reps=reps, is_warmup=False).get_best_1rm_estimate()
+    estimate = exercise_set.get_best_1rm_estimate()
+    if previous_estimate is not None and (estimate is None or estimate < previous_estimate):
+        return False
+    if PersonalRecord.objects.filter(exercise_set_source=exercise_set, record_type='rep_max', reps=reps).exists():
+        return False
+    rep_maxes = ExerciseBest.objects.filter(user_id=user_id, exercise_id=exercise_id).values_list(
+        'rep_maxes', flat=True
+    ).first() or {}
+    held = rep_maxes.get(str(reps))
+    if held is None or Decimal(held) > Decimal(weight):
+        return True
+    # The set may hold the old bucket's max; fine if another set ties it
+    return ExerciseSet.objects.filter(
+        workout_exercise__workout__user_id=user_id,
+        workout_exercise__exercise_id=exercise_id,
+        reps=reps,
+        weight__gte=Decimal(held),
+        is_warmup=False,
+        is_completed=True,
+    ).exclude(pk=exercise_set.pk).exists()
+
+
+def backfill_records_for_user(user, batch_size: int = 500) -> int:
+    """
+    Replay a user's entire history to rebuild their bests and detected records.
+
+    Returns the number of records created.
+    """
+    sets = _chronological_sets(user.id).only(
+        'reps', 'weight', 'is_warmup', 'is_completed', 'set_number', 'workout_exercise',
+        'workout_exercise__exercise', 'workout_exercise__order',
+        'workout_exercise__workout__date',
+    )
+
+    with transaction.atomic():
+        bests, records = _replay_sets(user.id, sets.iterator(chunk_size=2000))
+
+        ExerciseBest.objects.filter(user=user).delete()
+        ExerciseBest.objects.bulk_create(bests.values(), batch_size=batch_size)
+
+        return _sync_records(user.id, records, batch_size=batch_size)
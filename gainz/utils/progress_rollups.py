@@ -0,0 +1,285 @@
+"""
+Progress Rollup Maintenance
+
+Keeps the DailyExerciseRollup / WeeklyExerciseRollup tables in sync with
+logged sets so the progress dashboard never has to scan raw ExerciseSet rows.
+Each refresh only recomputes the single (user, exercise, day) bucket that
+changed, plus the week containing it.
+"""
+
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db.models import Sum, Max
+from django.utils import timezone
+
+from ..workouts.models import (
+    Workout, WorkoutExercise, ExerciseSet,
+    DailyExerciseRollup, WeeklyExerciseRollup,
+)
+
+
+def rollup_day(value: datetime.datetime) -> datetime.date:
+    """Return the calendar day (in the active timezone) a workout date belongs to."""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def week_start_for(day: datetime.date) -> datetime.date:
+    """Return the Monday of the week containing the given day."""
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def _day_bounds(day: datetime.date) -> Tuple[datetime.datetime, datetime.datetime]:
+    start = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    return start, start + datetime.timedelta(days=1)
+
+
+def _empty_totals() -> Dict:
+    return {
+        'volume': Decimal('0'),
+        'warmup_volume': Decimal('0'),
+        'set_count': 0,
+        'warmup_set_count': 0,
+        'max_weight': None,
+        'top_set_weight': None,
+        'top_set_reps': None,
+        'best_e1rm': None,
+    }
+
+
+def accumulate_set(totals: Dict, exercise_set: ExerciseSet) -> None:
+    """Fold a single set into a rollup totals dict."""
+    weight = exercise_set.weight
+    reps = exercise_set.reps
+    if weight is None or reps is None:
+        return
+
+    if totals['max_weight'] is None or weight > totals['max_weight']:
+        totals['max_weight'] = weight
+
+    if exercise_set.is_warmup:
+        totals['warmup_volume'] += exercise_set.get_volume()
+        totals['warmup_set_count'] += 1
+        return
+
+    totals['volume'] += exercise_set.get_volume()
+    totals['set_count'] += 1
+
+    top_weight = totals['top_set_weight']
+    if top_weight is None or weight > top_weight or (weight == top_weight and reps > (totals['top_set_reps'] or 0)):
+        totals['top_set_weight'] = weight
+        totals['top_set_reps'] = reps
+
+    estimate = exercise_set.get_best_1rm_estimate()
+    if estimate is not None:
+        estimate = estimate.quantize(Decimal('0.01'))
+        if totals['best_e1rm'] is None or estimate > totals['best_e1rm']:
+            totals['best_e1rm'] = estimate
+
+
+def _merge_totals(into: Dict, totals: Dict) -> None:
+    """Fold one bucket's totals into a wider bucket (e.g. a day into its week)."""
+    into['volume'] += totals['volume']
+    into['warmup_volume'] += totals['warmup_volume']
+    into['set_count'] += totals['set_count']
+    into['warmup_set_count'] += totals['warmup_set_count']
+    for field in ('max_weight', 'best_e1rm'):
+        if totals[field] is not None and (into[field] is None or totals[field] > into[field]):
+            into[field] = totals[field]
+    if totals['top_set_weight'] is not None and (
+        into['top_set_weight'] is None
+        or (totals['top_set_weight'], totals['top_set_reps']) > (into['top_set_weight'], into['top_set_reps'])
+    ):
+        into['top_set_weight'] = totals['top_set_weight']
+        into['top_set_reps'] = totals['top_set_reps']
+
+
+def refresh_daily_rollup(user_id: int, exercise_id: int, day: datetime.date) -> Optional[DailyExerciseRollup]:
+    """
+    Recompute the rollup row for one user, exercise and day from its sets.
+
+    Removes the row when no sets are left for that day. The matching weekly
+    rollup is refreshed afterwards.
+    """
+    start, end = _day_bounds(day)
+    sets = ExerciseSet.objects.filter(
+        workout_exercise__workout__user_id=user_id,
+        workout_exercise__exercise_id=exercise_id,
+        workout_exercise__workout__date__gte=start,
+        workout_exercise__workout__date__lt=end,
+    ).only('reps', 'weight', 'is_warmup')
+
+    totals = _empty_totals()
+    has_sets = False
+    for exercise_set in sets:
+        has_sets = True
+        accumulate_set(totals, exercise_set)
+
+    rollup = None
+    if has_sets:
+        rollup, _ = DailyExerciseRollup.objects.update_or_create(
+            user_id=user_id,
+            exercise_id=exercise_id,
+            date=day,
+            defaults=totals,
+        )
+    else:
+        DailyExerciseRollup.objects.filter(user_id=user_id, exercise_id=exercise_id, date=day).delete()
+
+    refresh_weekly_rollup(user_id, exercise_id, week_start_for(day))
+    return rollup
+
+
+def refresh_weekly_rollup(user_id: int, exercise_id: int, week_start: datetime.date) -> Optional[WeeklyExerciseRollup]:
+    """Recompute a weekly rollup from the (at most seven) daily rows of that week."""
+    daily_rows = DailyExerciseRollup.objects.filter(
+        user_id=user_id,
+        exercise_id=exercise_id,
+        date__gte=week_start,
+        date__lt=week_start + datetime.timedelta(days=7),
+    )
+
+    totals = daily_rows.aggregate(
+        volume=Sum('volume'),
+        warmup_volume=Sum('warmup_volume'),
+        set_count=Sum('set_count'),
+        warmup_set_count=Sum('warmup_set_count'),
+        max_weight=Max('max_weight'),
+        best_e1rm=Max('best_e1rm'),
+    )
+
+    if totals['set_count'] is None:
+        WeeklyExerciseRollup.objects.filter(user_id=user_id, exercise_id=exercise_id, week_start=week_start).delete()
+        return None
+
+    top_row = daily_rows.filter(top_set_weight__isnull=False).order_by('-top_set_weight', '-top_set_reps').first()
+    totals['top_set_weight'] = top_row.top_set_weight if top_row else None
+    totals['top_set_reps'] = top_row.top_set_reps if top_row else None
+
+    rollup, _ = WeeklyExerciseRollup.objects.update_or_create(
+        user_id=user_id,
+        exercise_id=exercise_id,
+        week_start=week_start,
+        defaults=totals,
+    )
+    return rollup
+
+
+def refresh_rollups_for_workout_exercise(workout_exercise_id: int) -> None:
+    """Refresh the rollup bucket a WorkoutExercise's sets belong to."""
+    row = WorkoutExercise.objects.filter(pk=workout_exercise_id).values_list(
+        'workout__user_id', 'exercise_id', 'workout__date'
+    ).first()
+    if row is None:
+        return
+    user_id, exercise_id, workout_date = row
+    refresh_daily_rollup(user_id, exercise_id, rollup_day(workout_date))
+
+
+def refresh_daily_rollups(user_id: int, day: datetime.date, exercise_ids: Iterable[int]) -> None:
+    """
+    Recompute the daily and weekly rollups of several exercises on one day.
+
+    Runs a fixed number of queries regardless of how many exercises or sets
+    are involved, for callers that write sets with bulk_create.
+    """
+    exercise_ids = set(exercise_ids)
+    if not exercise_ids:
+        return
+
+    start, end = _day_bounds(day)
+    sets = ExerciseSet.objects.filter(
+        workout_exercise__workout__user_id=user_id,
+        workout_exercise__exercise_id__in=exercise_ids,
+        workout_exercise__workout__date__gte=start,
+        workout_exercise__workout__date__lt=end,
+    ).select_related('workout_exercise').only('reps', 'weight', 'is_warmup', 'workout_exercise__exercise')
+
+    daily: Dict[int, Dict] = defaultdict(_empty_totals)
+    for exercise_set in sets:
+        accumulate_set(daily[exercise_set.workout_exercise.exercise_id], exercise_set)
+
+    DailyExerciseRollup.objects.filter(user_id=user_id, exercise_id__in=exercise_ids, date=day).delete()
+    DailyExerciseRollup.objects.bulk_create([
+        DailyExerciseRollup(user_id=user_id, exercise_id=exercise_id, date=day, **totals)
+        for exercise_id, totals in daily.items()
+    ])
+
+    week_start = week_start_for(day)
+    weekly: Dict[int, Dict] = defaultdict(_empty_totals)
+    daily_rows = DailyExerciseRollup.objects.filter(
+        user_id=user_id,
+        exercise_id__in=exercise_ids,
+        date__gte=week_start,
+        date__lt=week_start + datetime.timedelta(days=7),
+    ).values('exercise_id', *_empty_totals().keys())
+    for row in daily_rows:
+        _merge_totals(weekly[row.pop('exercise_id')], row)
+
+    WeeklyExerciseRollup.objects.filter(user_id=user_id, exercise_id__in=exercise_ids, week_start=week_start).delete()
+    WeeklyExerciseRollup.objects.bulk_create([
+        WeeklyExerciseRollup(user_id=user_id, exercise_id=exercise_id, week_start=week_start, **totals)
+        for exercise_id, totals in weekly.items()
+    ])
+
+
+def refresh_rollups_for_workout(workout: Workout, extra_dates: Iterable[datetime.datetime] = ()) -> None:
+    """
+    Refresh every rollup bucket touched by a workout.
+
+    `extra_dates` lets callers include previous dates of a workout that was
+    moved, so the old day is cleaned up as well.
+    """
+    days = {rollup_day(workout.date)}
+    days.update(rollup_day(value) for value in extra_dates)
+    exercise_ids = set(workout.exercises.values_list('exercise_id', flat=True))
+
+    for day in days:
+        # The old day may still hold exercises that were removed from the workout
+        stale_ids = DailyExerciseRollup.objects.filter(user_id=workout.user_id, date=day).values_list('exercise_id', flat=True)
+        refresh_daily_rollups(workout.user_id, day, exercise_ids.union(stale_ids))
+
+
+def rebuild_rollups_for_user(user) -> int:
+    """
+    Rebuild all rollups for a user from scratch in a single pass over their sets.
+
+    Returns the number of daily rollup rows written.
+    """
+    daily: Dict[Tuple[int, datetime.date], Dict] = defaultdict(_empty_totals)
+
+    sets = ExerciseSet.objects.filter(
+        workout_exercise__workout__user=user,
+    ).select_related('workout_exercise__workout').only(
+        'reps', 'weight', 'is_warmup',
+        'workout_exercise__exercise', 'workout_exercise__workout__date',
+    )
+
+    for exercise_set in sets.iterator(chunk_size=2000):
+        workout_exercise = exercise_set.workout_exercise
+        key = (workout_exercise.exercise_id, rollup_day(workout_exercise.workout.date))
+        accumulate_set(daily[key], exercise_set)
+
+    weekly: Dict[Tuple[int, datetime.date], Dict] = defaultdict(_empty_totals)
+    for (exercise_id, day), totals in daily.items():
+        _merge_totals(weekly[(exercise_id, week_start_for(day))], totals)
+
+    DailyExerciseRollup.objects.filter(user=user).delete()
+    WeeklyExerciseRollup.objects.filter(user=user).delete()
+
+    DailyExerciseRollup.objects.bulk_create([
+        DailyExerciseRollup(user=user, exercise_id=exercise_id, date=day, **totals)
+        for (exercise_id, day), totals in daily.items()
+    ], batch_size=1000)
+    WeeklyExerciseRollup.objects.bulk_create([
+        WeeklyExerciseRollup(user=user, exercise_id=exercise_id, week_start=week_start, **totals)
+        for (exercise_id, week_start), totals in weekly.items()
+    ], batch_size=1000)
+
+    return len(daily)
@@ -9,11 +9,16 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple, Any
 from decimal import Decimal
-from django.db.models import QuerySet, Q, Max, Min, Avg
+from django.db.models import QuerySet, Q, Max, Min, Avg, Sum, F, Case, When, Value, FloatField
+from django.db.models.functions import Cast
 from django.utils import timezone
 
-from ..workouts.models import Workout, WorkoutExercise, PersonalRecord, ExerciseSet
+from ..workouts.models import (
+    Workout, WorkoutExercise, PersonalRecord, ExerciseSet,
+    DailyExerciseRollup, WeeklyExerciseRollup,
+)
 from ..exercises.models import Exercise
+from .progress_rollups import rollup_day
 
 
 @dataclass
@@ -54,6 +59,47 @@ class StrengthTrend:
     top_exercises: List[str]
 
 
+def _rollup_date_range(period_days: int) -> Tuple[datetime, datetime]:
+    """Return the (start, end) datetimes of a look-back period ending now."""
+    end_date = timezone.now()
+    return end_date - timedelta(days=period_days), end_date
+
+
+def _daily_rollups(user, start_date: datetime, end_date: datetime) -> QuerySet:
+    """Daily rollup rows for a user whose day falls inside the given range."""
+    return DailyExerciseRollup.objects.filter(
+        user=user,
+        date__range=[rollup_day(start_date), rollup_day(end_date)]
+    )
+
+
+def estimated_1rm_expression(prefix: str = '') -> Case:
+    """
+    SQL expression mirroring ExerciseSet.get_best_1rm_estimate().
+
+    Singles count as-is, 2-5 reps use Epley, 6-15 reps use Brzycki; warmups,
+    zero-weight sets and anything above 15 reps evaluate to NULL. `prefix` lets
+    the expression be used from related models (e.g. 'sets__').
+    """
+    weight = Cast(f'{prefix}weight', FloatField())
+    reps = Cast(f'{prefix}reps', FloatField())
+    valid = Q(**{f'{prefix}is_warmup': False, f'{prefix}weight__gt': 0})
+
+    return Case(
+        When(valid & Q(**{f'{prefix}reps': 1}), then=weight),
+        When(
+            valid & Q(**{f'{prefix}reps__range': (2, 5)}),
+            then=weight * (Value(1.0) + Value(0.0333) * reps),
+        ),
+        When(
+            valid & Q(**{f'{prefix}reps__range': (6, 15)}),
+            then=weight / (Value(1.0278) - Value(0.0278) * reps),
+        ),
+        default=None,
+        output_field=FloatField(),
+    )
+
+
 def calculate_workout_volume(workout: Workout) -> Decimal:
     """
     Calculate total volume (weight × reps × sets) for a workout session.
@@ -64,15 +110,11 @@ def calculate_workout_volume(workout: Workout) -> Decimal:
     Returns:
         Total volume as Decimal
     """
-    total_volume = Decimal('0')
-    
-    for exercise in workout.exercises.all():
-        for exercise_set in exercise.sets.all():
-            if exercise_set.weight and exercise_set.reps:
-                set_volume = exercise_set.weight * exercise_set.reps
-                total_volume += set_volume
+    total_volume = ExerciseSet.objects.filter(
+        workout_exercise__workout=workout
+    ).aggregate(total=Sum(F('weight') * F('reps')))['total']
     
-    return total_volume
+    return total_volume or Decimal('0')
 
 
 def get_progress_metrics(user, period_days: int = 30) -> ProgressMetrics:
@@ -86,8 +128,7 @@ def get_progress_metrics(user, period_days: int = 30) -> ProgressMetrics:
     Returns:
         ProgressMetrics instance with calculated metrics
     """
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=period_days)
+    start_date, end_date = _rollup_date_range(period_days)
     
     # Get workout sessions in the period
     sessions = Workout.objects.filter(
@@ -102,14 +143,13 @@ def get_progress_metrics(user, period_days: int = 30) -> ProgressMetrics:
         workout__in=sessions
     ).count()
     
-    # Calculate total volume
-    total_volume = Decimal('0')
-    total_duration = timedelta()
-    
-    for session in sessions:
-        total_volume += calculate_workout_volume(session)
-        if session.duration:
-            total_duration += session.duration
+    # Calculate total volume (working + warmup sets) from the daily rollups
+    volume_totals = _daily_rollups(user, start_date, end_date).aggregate(
+        volume=Sum('volume'),
+        warmup_volume=Sum('warmup_volume'),
+    )
+    total_volume = (volume_totals['volume'] or Decimal('0')) + (volume_totals['warmup_volume'] or Decimal('0'))
+    total_duration = sessions.aggregate(total=Sum('duration'))['total'] or timedelta()
     
     # Calculate average duration
     average_duration = total_duration / total_workouts if total_workouts > 0 else timedelta()
@@ -149,44 +189,39 @@ def calculate_strength_gains(user, period_days: int = 30) -> Dict[str, Decimal]:
     Returns:
         Dictionary mapping exercise names to strength gain percentages
     """
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=period_days)
+    start_date, end_date = _rollup_date_range(period_days)
+    midpoint = rollup_day(start_date + timedelta(days=period_days//2))
     
     strength_gains = {}
     
-    # Get all exercises the user has performed
-    exercises = Exercise.objects.filter(
-        workoutexercise__workout__user=user
-    ).distinct()
-    
-    for exercise in exercises:
-        # Get exercise sets from first and last workout with this exercise in the period
-        
-        exercise_sets = ExerciseSet.objects.filter(
-            workout_exercise__workout__user=user,
-            workout_exercise__exercise=exercise,
-            workout_exercise__workout__date__range=[start_date, end_date],
-            weight__isnull=False
-        ).order_by('workout_exercise__workout__date')
-        
-        if exercise_sets.count() < 2:
+    # Walk the daily rollups once, splitting each exercise's days around the midpoint
+    per_exercise: Dict[str, Dict[str, Any]] = {}
+    rollups = _daily_rollups(user, start_date, end_date).filter(
+        max_weight__isnull=False
+    ).values('exercise__name', 'date', 'max_weight', 'set_count', 'warmup_set_count')
+    
+    for row in rollups:
+        stats = per_exercise.setdefault(row['exercise__name'], {
+            'set_count': 0,
+            'initial': None,
+            'current': None,
+        })
+        stats['set_count'] += row['set_count'] + row['warmup_set_count']
+        if row['date'] <= midpoint and (stats['initial'] is None or row['max_weight'] > stats['initial']):
+            stats['initial'] = row['max_weight']
+        if row['date'] >= midpoint and (stats['current'] is None or row['max_weight'] > stats['current']):
+            stats['current'] = row['max_weight']
+    
+    for exercise_name, stats in per_exercise.items():
+        if stats['set_count'] < 2:
             continue
-            
-        # Get max weight from first and last periods
-        first_period_sets = exercise_sets.filter(
-            workout_exercise__workout__date__lte=start_date + timedelta(days=period_days//2)
-        )
-        last_period_sets = exercise_sets.filter(
-            workout_exercise__workout__date__gte=start_date + timedelta(days=period_days//2)
-        )
         
-        if first_period_sets.exists() and last_period_sets.exists():
-            initial_strength = first_period_sets.aggregate(Max('weight'))['weight__max']
-            current_strength = last_period_sets.aggregate(Max('weight'))['weight__max']
-            
-            if initial_strength and current_strength and initial_strength > 0:
-                gain_percentage = ((current_strength - initial_strength) / initial_strength) * 100
-                strength_gains[exercise.name] = gain_percentage
+        initial_strength = stats['initial']
+        current_strength = stats['current']
+        
+        if initial_strength and current_strength and initial_strength > 0:
+            gain_percentage = ((current_strength - initial_strength) / initial_strength) * 100
+            strength_gains[exercise_name] = gain_percentage
     
     return strength_gains
 
@@ -203,8 +238,7 @@ def get_exercise_progress(user, exercise: Exercise, period_days: int = 90) -> Ex
     Returns:
         ExerciseProgress instance with detailed progress data
     """
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=period_days)
+    start_date, end_date = _rollup_date_range(period_days)
     
     # Get all workout exercises for this exercise
     
@@ -228,38 +262,25 @@ def get_exercise_progress(user, exercise: Exercise, period_days: int = 90) -> Ex
             trend='stable'
         )
     
-    # Calculate current max from exercise sets
-    current_exercise_sets = ExerciseSet.objects.filter(
-        workout_exercise__workout__user=user,
-        workout_exercise__exercise=exercise,
-        workout_exercise__workout__date__range=[start_date, end_date],
-        weight__isnull=False
-    ).select_related('workout_exercise__workout', 'workout_exercise__exercise')
+    # Calculate current max, volume and best 1RM from the daily rollups
+    current_totals = _daily_rollups(user, start_date, end_date).filter(
+        exercise=exercise
+    ).aggregate(
+        current_max=Max('max_weight'),
+        total_volume=Sum('volume'),
+        best_1rm=Max('best_e1rm'),
+    )
 
-    current_max = current_exercise_sets.aggregate(Max('weight'))['weight__max'] if current_exercise_sets.exists() else None
+    current_max = current_totals['current_max']
+    total_volume = current_totals['total_volume'] or Decimal('0')
+    best_1rm = current_totals['best_1rm']
     last_performed = workout_exercises.last().workout.date
-
-    total_volume = Decimal('0')
-    best_1rm = None
-    for exercise_set in current_exercise_sets:
-        if not exercise_set.is_warmup:
-            total_volume += exercise_set.get_volume()
-        if exercise_set.is_valid_for_1rm():
-            estimate = exercise_set.get_best_1rm_estimate()
-            if estimate is not None:
-                if best_1rm is None or estimate > best_1rm:
-                    best_1rm = estimate
     
     # Calculate previous max (from earlier period)
     previous_period_start = start_date - timedelta(days=period_days)
-    previous_exercise_sets = ExerciseSet.objects.filter(
-        workout_exercise__workout__user=user,
-        workout_exercise__exercise=exercise,
-        workout_exercise__workout__date__range=[previous_period_start, start_date],
-        weight__isnull=False
-    )
-    
-    previous_max = previous_exercise_sets.aggregate(Max('weight'))['weight__max'] if previous_exercise_sets.exists() else None
+    previous_max = _daily_rollups(user, previous_period_start, start_date).filter(
+        exercise=exercise
+    ).aggregate(Max('max_weight'))['max_weight__max']
     
     # Calculate improvement
     improvement = None
@@ -362,56 +383,55 @@ def get_top_exercises_by_volume(
     Returns:
         List of exercise names ordered by volume
     """
-    end_date = timezone.now()
-    start_date = end_date - timedelta(days=period_days)
-    
-    # Calculate volume by exercise
-    exercise_stats: Dict[int, Dict[str, Any]] = {}
-
-    exercise_sets = ExerciseSet.objects.filter(
-        workout_exercise__workout__user=user,
-        workout_exercise__workout__date__range=[start_date, end_date],
-        weight__isnull=False,
-        reps__isnull=False
-    ).select_related('workout_exercise__exercise')
-
-    for exercise_set in exercise_sets:
-        exercise_obj = exercise_set.workout_exercise.exercise
-        if exercise_obj is None:
-            continue
-
-        if exercise_set.is_warmup:
-            continue
-
-        exercise_id = exercise_obj.id
-        if exercise_id not in exercise_stats:
-            exercise_stats[exercise_id] = {
-                'exercise': exercise_obj,
-                'volume': Decimal('0'),
-                'set_count': 0,
-            }
-
-        exercise_stats[exercise_id]['volume'] += exercise_set.get_volume()
-        exercise_stats[exercise_id]['set_count'] += 1
-
-    sorted_exercises = sorted(
-        exercise_stats.values(),
-        key=lambda x: x['volume'],
-        reverse=True
-    )[:limit]
+    start_date, end_date = _rollup_date_range(period_days)
+    
+    # Calculate volume by exercise from the daily rollups (working sets only)
+    sorted_exercises = _daily_rollups(user, start_date, end_date).values(
+        'exercise_id', 'exercise__name'
+    ).annotate(
+        total_volume=Sum('volume'),
+        total_sets=Sum('set_count'),
+    ).filter(
+        total_sets__gt=0
+    ).order_by('-total_volume')[:limit]
 
     if with_volume:
         return [
             {
-                'id': data['exercise'].id,
-                'name': data['exercise'].name,
-                'volume': data['volume'],
-                'set_count': data['set_count'],
+                'id': data['exercise_id'],
+                'name': data['exercise__name'],
+                'volume': data['total_volume'],
+                'set_count': data['total_sets'],
             }
             for data in sorted_exercises
         ]
 
-    return [data['exercise'].name for data in sorted_exercises]
+    return [data['exercise__name'] for data in sorted_exercises]
+
+
+def get_weekly_volume(user, weeks: int = 12) -> List[Dict[str, Any]]:
+    """
+    Get total working volume and set count per week from the weekly rollups.
+    
+    Args:
+        user: User instance
+        weeks: Number of weeks to look back (including the current one)
+        
+    Returns:
+        List of dicts with week_start, volume and set_count, oldest first
+    """
+    today = timezone.localdate()
+    first_week = today - timedelta(days=today.weekday()) - timedelta(weeks=weeks - 1)
+    
+    return list(
+        WeeklyExerciseRollup.objects.filter(
+            user=user,
+            week_start__gte=first_week
+        ).values('week_start').annotate(
+            volume=Sum('volume'),
+            set_count=Sum('set_count'),
+        ).order_by('week_start')
+    )
 
 
 def calculate_consistency_score(user, period_days: int = 30) -> float:
@@ -461,7 +481,7 @@ def get_personal_records_summary(user, period_days: int = 90) -> Dict[str, Any]:
     records = PersonalRecord.objects.filter(
         user=user,
         date_achieved__range=[start_date, end_date]
-    ).order_by('-date_achieved')
+    ).select_related('exercise').order_by('-date_achieved')
     
     summary = {
         'total_records': records.count(),
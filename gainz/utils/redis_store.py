@@ -0,0 +1,25 @@
+"""
+Redis Connection
+
+The raw Redis client behind the default cache, for stores that need more
+than get/set (timelines' sorted sets, preference hashes). Redis is optional:
+callers get None when django-redis isn't installed or the server is down,
+and fall back to the database.
+"""
+
+
+def get_redis_connection(ping: bool = False):
+    """
+    The default cache's Redis client, or None when it's unavailable. With
+    `ping`, check the server answers before handing the client out.
+    """
+    try:
+        # django_redis respects the SSL configuration in settings.py
+        from django_redis import get_redis_connection as django_redis_conn
+        redis_conn = django_redis_conn("default")
+        if ping:
+            redis_conn.ping()
+        return redis_conn
+    except Exception as e:
+        print(f"Redis unavailable: {e}")
+        return None
@@ -0,0 +1,156 @@
+"""
+Set Upkeep
+
+Everything derived from logged sets (the progress rollups, cached charts and
+personal records) is brought up to date once per transaction instead of
+once per saved set. The ExerciseSet, WorkoutExercise and Workout signals and
+the bulk writers queue what changed:
+
+- the (user, day, exercise) rollup buckets whose sets changed; they are
+  refreshed per (user, day) with refresh_daily_rollups, and the charts of
+  those exercises are invalidated
+- sets to check against ExerciseBest (new sets, sets marked done, edits
+  that only raise values), or whole exercises to replay (deletes, sets
+  marked not done, other edits)
+
+The queue is one on-commit batch (see commit_batches.py), flushed in a
+single transaction after the writing one commits. A set save costs one
+lookup of its workout exercise (none when the caller's instance has it
+loaded) on top of its own write; deleting a workout or workout exercise
+queues its buckets once from the parent instead of once per cascaded set.
+"""
+
+import datetime
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from django.db import transaction
+
+from .chart_cache import invalidate_exercise_charts
+from .commit_batches import add_to_commit_batch
+from .personal_records import check_logged_sets, edit_only_raises, rebuild_exercise_records
+from .progress_rollups import refresh_daily_rollups, rollup_day
+from ..workouts.models import ExerciseSet, Workout, WorkoutExercise
+
+UPKEEP_BATCH = 'set_upkeep'
+ROLLUP = 'rollup'
+CHECK = 'check'
+REBUILD = 'rebuild'
+
+
+@dataclass(frozen=True)
+class SetContext:
+    """Where a set was logged: the owner, workout, exercise and rollup day."""
+    user_id: int
+    workout_id: int
+    exercise_id: int
+    day: datetime.date
+
+
+def set_context(exercise_set: ExerciseSet) -> Optional[SetContext]:
+    """
+    The set's context, from its loaded workout exercise and workout when the
+    instance carries them, else from one query. Kept on the instance, so the
+    signals of one save share it. None when the workout exercise is gone.
+    """
+    cached = getattr(exercise_set, '_set_context', None)
+    if cached is not None and cached[0] == exercise_set.workout_exercise_id:
+        return cached[1]
+
+    context = None
+    if ExerciseSet.workout_exercise.is_cached(exercise_set) and WorkoutExercise.workout.is_cached(exercise_set.workout_exercise):
+        workout_exercise = exercise_set.workout_exercise
+        workout = workout_exercise.workout
+        context = SetContext(workout.user_id, workout.id, workout_exercise.exercise_id, rollup_day(workout.date))
+    else:
+        row = WorkoutExercise.objects.filter(pk=exercise_set.workout_exercise_id).values_list(
+            'workout__user_id', 'workout_id', 'exercise_id', 'workout__date'
+        ).first()
+        if row is not None:
+            context = SetContext(row[0], row[1], row[2], rollup_day(row[3]))
+    exercise_set._set_context = (exercise_set.workout_exercise_id, context)
+    return context
+
+
+def _flush(items: Dict[Tuple, None]) -> None:
+    rollups: Dict[Tuple[int, datetime.date], Set[int]] = defaultdict(set)
+    rebuilds: Set[Tuple[int, int]] = set()
+    checks: Dict[Tuple[int, int], Set[int]] = defaultdict(set)
+    for key in items:
+        if key[0] == ROLLUP:
+            _, user_id, day, exercise_id = key
+            rollups[(user_id, day)].add(exercise_id)
+        elif key[0] == REBUILD:
+            rebuilds.add(key[1:])
+        else:
+            _, user_id, exercise_id, set_id = key
+            checks[(user_id, exercise_id)].add(set_id)
+
+    # A replay covers the exercise's checks
+    check_ids: Dict[int, Set[int]] = defaultdict(set)
+    for (user_id, exercise_id), set_ids in checks.items():
+        if (user_id, exercise_id) not in rebuilds:
+            check_ids[user_id].update(set_ids)
+
+    with transaction.atomic():
+        for (user_id, day), exercise_ids in rollups.items():
+            refresh_daily_rollups(user_id, day, exercise_ids)
+        for user_id, exercise_id in sorted(rebuilds):
+            rebuild_exercise_records(user_id, exercise_id)
+        for user_id, set_ids in check_ids.items():
+            check_logged_sets(user_id, set_ids)
+
+    charts: Dict[int, Set[int]] = defaultdict(set)
+    for (user_id, _), exercise_ids in rollups.items():
+        charts[user_id].update(exercise_ids)
+    for user_id, exercise_ids in charts.items():
+        invalidate_exercise_charts(user_id, exercise_ids)
+
+
+def _queue(user_id: int, day: datetime.date, exercise_id: int, check_set_id: Optional[int] = None,
+           rebuild_records: bool = False) -> None:
+    add_to_commit_batch(UPKEEP_BATCH, (ROLLUP, user_id, day, exercise_id), _flush)
+    if rebuild_records:
+        add_to_commit_batch(UPKEEP_BATCH, (REBUILD, user_id, exercise_id), _flush)
+    elif check_set_id is not None:
+        add_to_commit_batch(UPKEEP_BATCH, (CHECK, user_id, exercise_id, check_set_id), _flush)
+
+
+def queue_saved_set(exercise_set: ExerciseSet, created: bool, previous_values) -> None:
+    """Queue the upkeep of a created or edited set; edits leaving weight, reps, warm-up and completion alone need none."""
+    if not created and previous_values == (
+        exercise_set.weight, exercise_set.reps, exercise_set.is_warmup, exercise_set.is_completed
+    ):
+        return
+    context = set_context(exercise_set)
+    if context is None:
+        return
+    if created or edit_only_raises(exercise_set, previous_values, context.user_id, context.exercise_id):
+        _queue(context.user_id, context.day, context.exercise_id, check_set_id=exercise_set.id)
+    else:
+        _queue(context.user_id, context.day, context.exercise_id, rebuild_records=True)
+
+
+def queue_deleted_set(exercise_set: ExerciseSet) -> None:
+    """Queue the upkeep of a set deleted on its own (not with its workout or workout exercise)."""
+    context = set_context(exercise_set)
+    if context is not None:
+        _queue(context.user_id, context.day, context.exercise_id, rebuild_records=True)
+
+
+def queue_created_sets(workout: Workout, exercise_sets: Iterable[ExerciseSet]) -> None:
+    """Queue the upkeep of sets written with bulk_create, which skips the save signal."""
+    day = rollup_day(workout.date)
+    for exercise_set in exercise_sets:
+        _queue(workout.user_id, day, exercise_set.workout_exercise.exercise_id, check_set_id=exercise_set.id)
+
+
+def queue_exercises_upkeep(user_id: int, workout_date: datetime.datetime, exercise_ids: Iterable[int]) -> None:
+    """
+    Queue the rollups and a records replay of exercises of one workout: a
+    deleted workout or workout exercise, or sets changed in bulk.
+    """
+    day = rollup_day(workout_date)
+    for exercise_id in set(exercise_ids):
+        _queue(user_id, day, exercise_id, rebuild_records=True)
@@ -0,0 +1,182 @@
+"""
+Sparse Fieldsets and Query Planning
+
+Lets API clients ask for just the fields they render, and derives the
+select_related/prefetch_related a serializer needs from the fields it will
+actually output, so nested serializers cost one query per level instead of
+one per row.
+
+    ?fields=id,date,name                          workout headers only
+    ?fields=id,exercises(exercise_name,sets)      exercises with their sets, no notes
+    ?fields=id,name&expand=exercises.sets         headers plus full exercises and sets
+
+`fields` takes a comma-separated list; a nested serializer's fields go in
+parentheses after its name (a nested name on its own keeps all its fields).
+`expand` adds dotted paths of nested serializers, with all their fields, to
+`fields`. Without `fields` every field is returned, as before.
+
+Relations are found from dotted field sources (`exercise.name`) and nested
+serializers; anything else a field touches (e.g. a SerializerMethodField
+reading `obj.exercise`) is declared on the serializer's Meta:
+
+    field_select_related = {'exercise_type_display': ['exercise']}
+    field_prefetch_related = {'timers': ['exercises__exercise']}
+"""
+
+from typing import Dict, Optional
+
+from django.db.models import Prefetch, QuerySet
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FieldTree = Optional[Dict[str, 'FieldTree']]  # None means all fields
+
+
+def parse_fields(value: str) -> Dict[str, FieldTree]:
+    """Parse `a,b(c,d(e))` into {'a': None, 'b': {'c': None, 'd': {'e': None}}}."""
+    stack = [{}]
+    name = ''
+    last_name = None
+
+    def flush():
+        nonlocal name, last_name
+        name = name.strip()
+        if name:
+            stack[-1].setdefault(name, None)
+            last_name = name
+        name = ''
+
+    for char in value:
+        if char == ',':
+            flush()
+        elif char == '(':
+            flush()
+            if last_name is None:
+                raise ValidationError({'fields': ['Nested fields must follow a field name.']})
+            nested = stack[-1][last_name] or {}
+            stack[-1][last_name] = nested
+            stack.append(nested)
+            last_name = None
+        elif char == ')':
+            flush()
+            if len(stack) == 1:
+                raise ValidationError({'fields': ['Unbalanced parentheses.']})
+            stack.pop()
+        else:
+            name += char
+    flush()
+    if len(stack) != 1:
+        raise ValidationError({'fields': ['Unbalanced parentheses.']})
+    return stack[0]
+
+
+def field_tree_from_params(params) -> FieldTree:
+    """The field tree requested by `fields` and `expand` query params, or None for all fields."""
+    fields = params.get('fields')
+    if not fields:
+        return None
+    tree = parse_fields(fields)
+    for path in filter(None, (path.strip() for path in params.get('expand', '').split(','))):
+        node = tree
+        for part in path.split('.'):
+            if node is None:
+                break  # Already expanded to all fields
+            if part not in node:
+                node[part] = None
+            node = node[part]
+    return tree
+
+
+def _nested(field) -> Optional[serializers.BaseSerializer]:
+    nested = getattr(field, 'child', field)
+    return nested if isinstance(nested, serializers.BaseSerializer) else None
+
+
+def _prune(serializer_fields, tree: FieldTree, path: str = ''):
+    """Drop fields missing from the tree; unknown names in the tree are a 400."""
+    if tree is None:
+        return serializer_fields
+    unknown = [f"{path}{name}" for name in tree if name not in serializer_fields]
+    if unknown:
+        raise ValidationError({'fields': [f"Unknown field: {name}" for name in unknown]})
+    for name in list(serializer_fields):
+        if name not in tree:
+            serializer_fields.pop(name)
+    return serializer_fields
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin that outputs only the requested fields. The root
+    serializer reads the tree from context['field_tree']; nested serializers
+    get their part of it from their parent.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if hasattr(self, 'field_tree'):
+            tree = self.field_tree
+        else:
+            tree = self.context.get('field_tree')
+        fields = _prune(fields, tree)
+        for name, field in fields.items():
+            nested = _nested(field)
+            if isinstance(nested, SparseFieldsMixin):
+                nested.field_tree = tree.get(name) if tree else None
+        return fields
+
+
+def plan_queryset(queryset: QuerySet, serializer_class, tree: FieldTree = None, path: str = '') -> QuerySet:
+    """
+    Add the select_related/prefetch_related that `serializer_class`, limited
+    to `tree`, needs to serialize rows of `queryset` without per-row queries.
+    Nested many-serializers become Prefetch objects with their own plan.
+    """
+    serializer = serializer_class()
+    fields = _prune(dict(serializer.get_fields()), tree, path)
+    meta = getattr(serializer_class, 'Meta', None)
+    extra = getattr(meta, 'field_select_related', {})
+    extra_prefetch = getattr(meta, 'field_prefetch_related', {})
+
+    select = set()
+    prefetch = set()
+    for name, field in fields.items():
+        select.update(extra.get(name, []))
+        prefetch.update(extra_prefetch.get(name, []))
+        nested = _nested(field)
+        source = field.source or name
+        if nested is not None:
+            subtree = tree.get(name) if tree else None
+            if isinstance(field, serializers.ListSerializer):
+                model = queryset.model._meta.get_field(source).related_model
+                queryset = queryset.prefetch_related(Prefetch(
+                    source,
+                    queryset=plan_queryset(model._default_manager.all(), type(nested), subtree, f"{path}{name}."),
+                ))
+            else:
+                select.add(source.replace('.', '__'))
+        elif '.' in source:
+            select.add('__'.join(source.split('.')[:-1]))
+    if select:
+        queryset = queryset.select_related(*sorted(select))
+    if prefetch:
+        # After the nested Prefetch objects, so lookups through them reuse their rows
+        queryset = queryset.prefetch_related(*sorted(prefetch))
+    return queryset
+
+
+class SparseFieldsViewMixin:
+    """ViewSet mixin: passes the requested field tree to the serializer and plans the queryset for it."""
+
+    def get_field_tree(self) -> FieldTree:
+        if not hasattr(self, '_field_tree'):
+            self._field_tree = field_tree_from_params(self.request.query_params)
+        return self._field_tree
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_tree'] = self.get_field_tree()
+        return context
+
+    def plan_queryset(self, queryset: QuerySet) -> QuerySet:
+        return plan_queryset(queryset, self.get_serializer_class(), self.get_field_tree())
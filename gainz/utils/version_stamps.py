@@ -0,0 +1,49 @@
+"""
+Cache Version Stamps
+
+Counters in the cache (Redis) that cached data is keyed or checked by:
+bumping a stamp makes everything built under its previous value stale
+without scanning or deleting keys. Used by the chart cache, the exercise
+catalog, the exercise name index and the rest timer profiles.
+
+Stamps start from the current time in nanoseconds, so a stamp recreated
+after Redis lost it (restart, eviction) never repeats a value handed out
+before. Readers get None when the cache is unreachable and decide for
+themselves how long to trust local copies.
+"""
+
+import time
+from typing import List, Optional
+
+from django.core.cache import cache
+
+
+def current_versions(keys: List[str]) -> List[Optional[int]]:
+    """The stamps under `keys` in one cache read, creating missing ones; all None when the cache is down."""
+    try:
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                cache.add(key, time.time_ns(), None)
+                versions[key] = cache.get(key)
+        return [versions[key] for key in keys]
+    except Exception as e:
+        print(f"Cache version unavailable ({', '.join(keys)}): {e}")
+        return [None] * len(keys)
+
+
+def current_version(key: str) -> Optional[int]:
+    """The stamp under `key`, created if missing; None when the cache is down."""
+    return current_versions([key])[0]
+
+
+def bump_version(key: str) -> None:
+    """Move the stamp under `key` on, so data cached under the old value goes stale."""
+    try:
+        if not cache.add(key, time.time_ns(), None):
+            cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, time.time_ns(), None)
+    except Exception as e:
+        print(f"Could not bump cache version {key}: {e}")
@@ -5,22 +5,34 @@ from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from gainz.exercises.models import Exercise, ExerciseCategory
 from gainz.exercises.serializers import ExerciseSerializer, ExerciseCategorySerializer
-from gainz.workouts.models import Workout, WorkoutExercise, ExerciseSet, Program, Routine, RoutineExercise, RoutineExerciseSet, ProgramRoutine, UserTimerPreference, ExerciseTimerOverride, ProgramTimerPreference, RoutineTimerPreference
+from gainz.exercises.catalog import get_exercise_catalog
+from gainz.workouts.models import Workout, WorkoutExercise, ExerciseSet, Program, Routine, RoutineExercise, RoutineExerciseSet, ProgramRoutine, UserTimerPreference, ExerciseTimerOverride, ProgramTimerPreference, RoutineTimerPreference, WorkoutImportJob
 from gainz.workouts.serializers import WorkoutSerializer, WorkoutExerciseSerializer, ExerciseSetSerializer
-from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, Http404, FileResponse
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, Http404, FileResponse
 from django.template.loader import render_to_string
 from django.db.models import Q
 import datetime # Add datetime import
-from gainz.workouts.utils import get_prefill_data # Add get_prefill_data import
+from gainz.workouts.utils import instantiate_workout_from_routine, resolve_prefill
+from gainz.workouts.tasks import run_workout_import_job
+from gainz.workouts.ordering import insert_order_key, move_to_type_band, reorder_exercises as reorder_workout_exercises
+from gainz.workouts.set_batch import SetBatchError, apply_set_operations, lock_workout, next_set_numbers
+from gainz.workouts.sync import MAX_PUSH_OPERATIONS, changes_since, current_cursor, push_operations
+from gainz.workouts.timers import resolve_workout_timers
+from gainz.workouts.schedule import get_active_schedule, next_session
+from gainz.workouts.program_layout import Slot, converted_slots, reconcile_program_routines, sequential_slots, valid_routine_ids, weekly_slots
+from gainz.workouts.preferences import ROUTINE_FORM_PREFERENCES, encode_value, get_bool_preferences, set_user_preference
+from gainz.utils.background_jobs import enqueue_user_job, get_user_job, job_payload
+from gainz.utils.pagination import DateIdCursorPagination, keyset_page
+from gainz.utils.json_rendering import FastJsonResponse as JsonResponse
+from gainz.utils.sparse_fields import SparseFieldsViewMixin
 from django.utils import timezone # Added for timezone.now()
+from django.utils.dateparse import parse_date
 from django.urls import reverse # Add import for reverse
 from django.contrib import messages # Added for messages
 from django.core.cache import cache # Added for Redis cache
-import statistics
-from collections import defaultdict
 from django.contrib.staticfiles import finders
 from django.contrib.staticfiles.storage import staticfiles_storage
 import json # Moved import json here
@@ -31,38 +43,17 @@ from django.core.management import call_command
 from io import StringIO
 from gainz.workouts.utils import WorkoutParser
 from decimal import Decimal
-from django.db.models import F, Sum, Min, Max, Avg
+from django.db.models import F, Sum, Min, Max, Avg, FloatField
+from django.db.models.functions import Cast
 from .utils.progress_tracking import (
     get_progress_metrics, analyze_strength_trends,
     get_top_exercises_by_volume, get_exercise_progress,
-    get_personal_records_summary, get_personal_records
+    get_personal_records_summary, get_personal_records,
+    estimated_1rm_expression
+)
+from .utils.chart_cache import (
+    chart_cache_key, chart_etag, etag_matches, get_cached_chart, set_cached_chart
 )
-
-# Make Redis optional for deployments without Redis
-def get_redis_connection():
-    try:
-        # Use django_redis which respects our SSL configuration in settings.py
-        from django_redis import get_redis_connection as django_redis_conn
-        return django_redis_conn("default")
-    except:
-        return None
-
-def renumber_exercises_by_type(workout):
-    """Renumber exercises maintaining type hierarchy: Primary > Secondary > Accessory
-    Preserves relative order within each type group."""
-    PRIORITY = {'primary': 3, 'secondary': 2, 'accessory': 1}
-
-    # Get all exercises and sort by type priority (descending), then by current order
-    all_exercises = list(workout.exercises.all())
-    all_exercises.sort(key=lambda ex: (
-        -PRIORITY.get(ex.get_exercise_type(), 1),  # Higher priority first
-        ex.order  # Then by current order within type
-    ))
-
-    # Renumber sequentially
-    for index, exercise in enumerate(all_exercises):
-        exercise.order = index
-        exercise.save()
 
 # Exercise ViewSets
 class ExerciseCategoryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -83,6 +74,26 @@ class ExerciseViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user, is_custom=True)
 
+    @action(detail=False, methods=['get'])
+    def catalog(self, request):
+        """
+        The whole catalog the user can pick from, as one cached JSON document.
+        Clients keep it until the hash changes: requests with ?v=<hash> may be
+        cached for good, and If-None-Match revalidation gets a 304.
+        """
+        catalog = get_exercise_catalog(request.user)
+        etag = f'"{catalog.digest}"'
+        if etag_matches(request.META.get('HTTP_IF_NONE_MATCH', ''), etag):
+            response = HttpResponse(status=304)
+        else:
+            response = JsonResponse(catalog.as_dict())
+        response['ETag'] = etag
+        if request.query_params.get('v') == catalog.digest:
+            response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
     def perform_update(self, serializer):
         # Only allow updating custom exercises owned by the user
         exercise = self.get_object()
@@ -97,21 +108,32 @@ class ExerciseViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 # Workout ViewSets
-class WorkoutViewSet(viewsets.ModelViewSet):
+class WorkoutViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = WorkoutSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DateIdCursorPagination
 
     def get_queryset(self):
-        return Workout.objects.filter(user=self.request.user)
+        queryset = Workout.objects.filter(user=self.request.user)
+
+        # ?date=today or ?date=YYYY-MM-DD limits the list to one day's workouts
+        day = self.request.query_params.get('date')
+        if day:
+            try:
+                day = timezone.localdate() if day == 'today' else parse_date(day)
+            except ValueError:
+                day = None
+            if day is None:
+                raise ValidationError({'date': ['Use YYYY-MM-DD or "today".']})
+            start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+            queryset = queryset.filter(date__gte=start, date__lt=start + timedelta(days=1))
+
+        # Prefetch only what the requested fields need (?fields=/?expand=, see utils/sparse_fields.py)
+        return self.plan_queryset(queryset)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    def _renumber_exercises_by_type(self, workout):
-        """Renumber exercises maintaining type hierarchy: Primary > Secondary > Accessory
-        Preserves relative order within each type group."""
-        return renumber_exercises_by_type(workout)
-
     @action(detail=True, methods=['post'])
     def add_exercise(self, request, pk=None):
         workout = self.get_object()
@@ -122,132 +144,19 @@ class WorkoutViewSet(viewsets.ModelViewSet):
         # Get exercise type override if provided
         exercise_type_override = request.data.get('exercise_type')
 
-        # Calculate the appropriate order for the new exercise
-        new_order = self._calculate_exercise_order(workout, request.data.get('exercise'), current_exercise_id, exercise_type_override)
-
-        # Add the calculated order to the request data
-        mutable_data = request.data.copy()
-        mutable_data['order'] = new_order
-
-        serializer = WorkoutExerciseSerializer(data=mutable_data)
+        serializer = WorkoutExerciseSerializer(data=request.data)
 
         if serializer.is_valid():
-            workout_exercise = serializer.save(workout=workout)
-
-            # Renumber all exercises to be sequential after insertion, maintaining type hierarchy
-            self._renumber_exercises_by_type(workout)
-
-            # Refresh serializer data with updated order
-            serializer = WorkoutExerciseSerializer(workout_exercise)
-            return Response(serializer.data)
+            # Key the new exercise into place under the workout row lock (see workouts/ordering.py)
+            with transaction.atomic():
+                lock_workout(workout.id, request.user)
+                exercise_type = exercise_type_override or serializer.validated_data['exercise'].exercise_type
+                new_order = insert_order_key(workout, exercise_type, current_exercise_id)
+                workout_exercise = serializer.save(workout=workout, order=new_order)
+
+            return Response(WorkoutExerciseSerializer(workout_exercise).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def _calculate_exercise_order(self, workout, new_exercise_id, current_exercise_id, exercise_type_override=None):
-        """
-        Calculate the appropriate order for a new exercise based on:
-        - Exercise type hierarchy (primary > secondary > accessory)
-        - Current exercise position
-        - Priority-based insertion rules:
-          * Higher priority type -> insert as LAST of that type
-          * Same priority type -> insert AFTER current
-          * Lower priority type -> insert as FIRST of that type
-        """
-        # Priority mapping: primary (3) > secondary (2) > accessory (1)
-        PRIORITY = {'primary': 3, 'secondary': 2, 'accessory': 1}
-
-        # Get the new exercise type (use override if provided, otherwise from exercise)
-        if exercise_type_override:
-            new_exercise_type = exercise_type_override
-        else:
-            try:
-                new_exercise = Exercise.objects.get(id=new_exercise_id)
-                new_exercise_type = new_exercise.exercise_type
-            except Exercise.DoesNotExist:
-                return 0
-
-        new_priority = PRIORITY.get(new_exercise_type, 1)
-
-        # Get all existing exercises in this workout
-        existing_exercises = list(workout.exercises.prefetch_related('exercise').order_by('order'))
-
-        # If no current exercise specified or no exercises exist
-        if not current_exercise_id or not existing_exercises:
-            # Find exercises of the same type
-            same_type = [ex for ex in existing_exercises if ex.get_exercise_type() == new_exercise_type]
-            if same_type:
-                return max(ex.order for ex in same_type) + 1
-            else:
-                # No exercises of this type yet, find insertion point based on type hierarchy
-                if new_exercise_type == 'primary':
-                    return 0
-                elif new_exercise_type == 'secondary':
-                    primaries = [ex for ex in existing_exercises if ex.get_exercise_type() == 'primary']
-                    if primaries:
-                        return max(ex.order for ex in primaries) + 1
-                    else:
-                        return 0
-                else:  # accessory
-                    return max([ex.order for ex in existing_exercises], default=0) + 1
-
-        # Find the current exercise
-        current_exercise = None
-        for ex in existing_exercises:
-            if ex.id == int(current_exercise_id):
-                current_exercise = ex
-                break
-
-        if not current_exercise:
-            # Current exercise not found, place at end of same type
-            same_type = [ex for ex in existing_exercises if ex.get_exercise_type() == new_exercise_type]
-            if same_type:
-                return max(ex.order for ex in same_type) + 1
-            else:
-                return max([ex.order for ex in existing_exercises], default=0) + 1
-
-        current_type = current_exercise.get_exercise_type()
-        current_priority = PRIORITY.get(current_type, 1)
-
-        # Apply priority-based insertion rules
-        if new_priority > current_priority:
-            # Higher priority: insert as LAST of new type
-            same_type = [ex for ex in existing_exercises if ex.get_exercise_type() == new_exercise_type]
-            if same_type:
-                return max(ex.order for ex in same_type) + 1
-            else:
-                # No exercises of this type yet, insert at appropriate boundary
-                if new_exercise_type == 'primary':
-                    return 0
-                elif new_exercise_type == 'secondary':
-                    primaries = [ex for ex in existing_exercises if ex.get_exercise_type() == 'primary']
-                    if primaries:
-                        return max(ex.order for ex in primaries) + 1
-                    else:
-                        return 0
-                else:  # accessory
-                    return max([ex.order for ex in existing_exercises], default=0) + 1
-
-        elif new_priority == current_priority:
-            # Same priority: insert AFTER current
-            return current_exercise.order + 1
-
-        else:  # new_priority < current_priority
-            # Lower priority: insert as FIRST of new type
-            same_type = [ex for ex in existing_exercises if ex.get_exercise_type() == new_exercise_type]
-            if same_type:
-                return min(ex.order for ex in same_type)
-            else:
-                # No exercises of this type yet, insert at appropriate boundary
-                if new_exercise_type == 'accessory':
-                    return max([ex.order for ex in existing_exercises], default=0) + 1
-                elif new_exercise_type == 'secondary':
-                    primaries = [ex for ex in existing_exercises if ex.get_exercise_type() == 'primary']
-                    if primaries:
-                        return max(ex.order for ex in primaries) + 1
-                    else:
-                        return 0
-                else:  # primary (shouldn't happen if current is higher)
-                    return 0
-
     @action(detail=True, methods=['post'], url_path='reorder-exercises')
     def reorder_exercises(self, request, pk=None):
         workout = self.get_object()
@@ -256,40 +165,58 @@ class WorkoutViewSet(viewsets.ModelViewSet):
         if not exercises_data:
             return Response({'error': 'No exercises data provided'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Clients send every card of a category with its position; only the moved rows get new keys
         try:
-            for exercise_data in exercises_data:
-                exercise_id = exercise_data.get('id')
-                new_order = exercise_data.get('order')
+            ordered = sorted(exercises_data, key=lambda exercise_data: float(exercise_data.get('order', 0)))
+            exercise_ids = [int(exercise_data['id']) for exercise_data in ordered if exercise_data.get('id')]
+        except (TypeError, ValueError, KeyError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-                if exercise_id and new_order is not None:
-                    WorkoutExercise.objects.filter(
-                        id=exercise_id,
-                        workout=workout
-                    ).update(order=new_order)
+        with transaction.atomic():
+            lock_workout(workout.id, request.user)
+            reorder_workout_exercises(workout, exercise_ids)
 
-            return Response({'success': True, 'message': 'Exercise order updated successfully'})
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'success': True, 'message': 'Exercise order updated successfully'})
 
-class WorkoutExerciseViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'], url_path='sets/batch')
+    def batch_sets(self, request, pk=None):
+        """Apply many set creates/updates/deletes in one transaction (see workouts/set_batch.py)"""
+        workout = self.get_object()
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object with an operations list.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = apply_set_operations(request.user, workout.id, request.data.get('operations'))
+        except SetBatchError as e:
+            return Response({'error': e.args[0], 'index': e.index}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'success': True, 'results': results})
+
+class WorkoutExerciseViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = WorkoutExerciseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DateIdCursorPagination
+    cursor_date_field = 'workout_date'
 
     def get_queryset(self):
-        return WorkoutExercise.objects.filter(workout__user=self.request.user)
+        return self.plan_queryset(WorkoutExercise.objects.filter(workout__user=self.request.user).annotate(
+            workout_date=F('workout__date')
+        ))
 
-    def perform_destroy(self, instance):
-        """Override destroy to renumber exercises after deletion, maintaining type hierarchy."""
-        workout = instance.workout
-        instance.delete()
-        renumber_exercises_by_type(workout)
+    def perform_update(self, serializer):
+        """Move the exercise into its new type's place when its type changes."""
+        with transaction.atomic():
+            lock_workout(serializer.instance.workout_id, self.request.user)
+            move_to_type_band(serializer.save())
 
-class ExerciseSetViewSet(viewsets.ModelViewSet):
+class ExerciseSetViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = ExerciseSetSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DateIdCursorPagination
+    cursor_date_field = 'workout_date'
 
     def get_queryset(self):
-        return ExerciseSet.objects.filter(workout_exercise__workout__user=self.request.user)
+        return ExerciseSet.objects.filter(workout_exercise__workout__user=self.request.user).annotate(
+            workout_date=F('workout_exercise__workout__date')
+        )
 
     def perform_create(self, serializer):
         workout_exercise_id = self.kwargs.get('workout_exercise_id')
@@ -300,14 +227,14 @@ class ExerciseSetViewSet(viewsets.ModelViewSet):
                 workout__user=self.request.user
             )
 
-            # Get the next set number
-            last_set = ExerciseSet.objects.filter(workout_exercise=workout_exercise).order_by('-set_number').first()
-            next_set_number = 1 if not last_set else last_set.set_number + 1
-
-            serializer.save(
-                workout_exercise=workout_exercise,
-                set_number=next_set_number
-            )
+            # Allocate the next set number under the workout row lock so concurrent taps can't collide
+            with transaction.atomic():
+                lock_workout(workout_exercise.workout_id, self.request.user)
+                next_set_number = next_set_numbers(workout_exercise.workout).get(workout_exercise.id, 1)
+                serializer.save(
+                    workout_exercise=workout_exercise,
+                    set_number=next_set_number
+                )
         else:
             serializer.save()
 
@@ -318,7 +245,7 @@ def workout_detail(request, workout_id):
 
     # Fetch WorkoutExercises related to this workout, prefetching related Exercise and Sets
     # Order by the order field to respect user's custom ordering
-    workout_exercises = workout.exercises.prefetch_related('exercise', 'sets').order_by('order')
+    workout_exercises = list(workout.exercises.prefetch_related('exercise', 'sets').order_by('order'))
 
     # Group exercises by type using the get_exercise_type method
     primary_exercises = []
@@ -334,11 +261,8 @@ def workout_detail(request, workout_id):
         else: # Default or accessory
             accessory_exercises.append(workout_exercise)
 
-    # Get all exercises for the add exercise dropdown
-    all_exercises_for_form = Exercise.objects.filter(
-        models.Q(is_custom=False) |
-        models.Q(is_custom=True, user=request.user)
-    ).order_by('name')
+    # Get all exercises for the add exercise dropdown (cached catalog, sorted by name)
+    all_exercises_for_form = get_exercise_catalog(request.user).exercises
 
     # Get exercise type choices for the dropdown
     exercise_type_choices = Exercise.EXERCISE_TYPE_CHOICES
@@ -350,6 +274,8 @@ def workout_detail(request, workout_id):
         'accessory_exercises': accessory_exercises,
         'all_exercises_for_form': all_exercises_for_form,
         'exercise_type_choices': exercise_type_choices,
+        # Rest timer settings per workout exercise, all layers resolved (see workouts/timers.py)
+        'timer_settings': resolve_workout_timers(workout, workout_exercises),
         'title': f"Workout: {workout.name}" # Added a title for the page
     }
 
@@ -359,13 +285,19 @@ def workout_detail(request, workout_id):
 
     return render(request, template_name, context)
 
+HOME_UPCOMING_SESSIONS = 5
+
+
 def home(request):
     """Homepage view that redirects to the workout list or shows a welcome page"""
     if request.user.is_authenticated:
         # If user is logged in, you could show their recent workouts
         # or redirect to a workout list page when you create one
+        schedule = get_active_schedule(request.user)
         return render(request, 'home.html', {
-            'title': 'Gainz - Workout Tracker'
+            'title': 'Gainz - Workout Tracker',
+            'schedule': schedule,
+            'upcoming_sessions': schedule.sessions[:HOME_UPCOMING_SESSIONS] if schedule else [],
         })
     else:
         # For non-logged in users, show a welcome page
@@ -373,10 +305,18 @@ def home(request):
             'title': 'Welcome to Gainz'
         })
 
+WORKOUT_LIST_PAGE_SIZE = 20
+
+
 @login_required
 def workout_list(request):
     """Display a list of the user's workouts"""
-    workouts = Workout.objects.filter(user=request.user).order_by('-date')
+    # Keyset page on (date, id): older pages cost the same as the first one
+    workouts = keyset_page(
+        Workout.objects.filter(user=request.user).prefetch_related('exercises'),
+        request.GET.get('cursor'),
+        WORKOUT_LIST_PAGE_SIZE,
+    )
 
     # Build routine options for "Choose" modal
     active_program = Program.objects.filter(user=request.user, is_active=True).first()
@@ -411,44 +351,41 @@ def exercise_list(request):
     category_filter = request.GET.get('category', '')
     custom_filter = request.GET.get('custom_filter', '')
 
-    exercises = Exercise.objects.prefetch_related('categories').select_related('user').order_by('name')
+    # Filter the cached catalog (built-ins plus the user's custom exercises) instead of querying
+    catalog = get_exercise_catalog(request.user)
+    exercises = catalog.exercises
 
     if search_query:
-        exercises = exercises.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        needle = search_query.lower()
+        exercises = [ex for ex in exercises if needle in ex.name.lower() or needle in ex.description.lower()]
 
     if exercise_type_filter:
-        exercises = exercises.filter(exercise_type=exercise_type_filter)
+        exercises = [ex for ex in exercises if ex.exercise_type == exercise_type_filter]
 
     if category_filter:
-        exercises = exercises.filter(categories__id=category_filter)
+        exercises = [ex for ex in exercises if category_filter in {str(category_id) for category_id in ex.category_ids}]
 
-    # Apply custom filter
+    # Apply custom filter (default: show all exercises, non-custom and user's custom)
     if custom_filter == 'custom':
-        exercises = exercises.filter(is_custom=True, user=request.user)
+        exercises = [ex for ex in exercises if ex.is_custom]
     elif custom_filter == 'non_custom':
-        exercises = exercises.filter(is_custom=False)
-    else:
-        # Default: show all exercises (non-custom and user's custom)
-        exercises = exercises.filter(Q(is_custom=False) | Q(is_custom=True, user=request.user))
+        exercises = [ex for ex in exercises if not ex.is_custom]
 
+    categories = catalog.categories_by_id()
     exercises_by_category = {}
     uncategorized_exercises = []
     for exercise in exercises:
-        if exercise.categories.exists():
-            for category in exercise.categories.all():
-                if category.name not in exercises_by_category:
-                    exercises_by_category[category.name] = []
-                if exercise not in exercises_by_category[category.name]:
-                   exercises_by_category[category.name].append(exercise)
+        # Skip ids of categories deleted since a cached part was built
+        category_names = [categories[category_id]['name'] for category_id in exercise.category_ids if category_id in categories]
+        if category_names:
+            for category_name in category_names:
+                exercises_by_category.setdefault(category_name, []).append(exercise)
         else:
             uncategorized_exercises.append(exercise)
 
     sorted_categories_list = sorted(exercises_by_category.items())
 
-    all_categories_for_form = ExerciseCategory.objects.all().order_by('name')
+    all_categories_for_form = catalog.categories
     exercise_type_choices = Exercise.EXERCISE_TYPE_CHOICES
 
     context = {
@@ -563,30 +500,8 @@ def routine_create(request):
     ]
     exercise_type_choices = Exercise.EXERCISE_TYPE_CHOICES
 
-    user_id = request.user.id
-    redis_conn = get_redis_connection()
-    user_preferences = {}
-    preference_definitions = {
-        'show_rpe': {'key_suffix': 'routineForm.showRPE', 'default': False},
-        'show_rest_time': {'key_suffix': 'routineForm.showRestTime', 'default': False},
-        'show_notes': {'key_suffix': 'routineForm.showNotes', 'default': False},
-    }
-
-    for pref_name, pref_info in preference_definitions.items():
-        cache_key = f"user_prefs:{user_id}:{pref_info['key_suffix']}"
-        # REVERTED: No more hardcoded key for RPE loading
-        # if pref_name == 'show_rpe':
-        #     cache_key = f"test_rpe_preference_user_{user_id}"
-
-        if redis_conn:
-            retrieved_value_bytes = redis_conn.get(cache_key)
-            if retrieved_value_bytes is not None:
-                retrieved_value_str = retrieved_value_bytes.decode('utf-8')
-                user_preferences[pref_name] = retrieved_value_str.lower() == 'true'
-            else:
-                user_preferences[pref_name] = pref_info['default']
-        else:
-            user_preferences[pref_name] = pref_info['default']
+    # One read of the user's preference hash (see workouts/preferences.py)
+    user_preferences = get_bool_preferences(request, ROUTINE_FORM_PREFERENCES)
 
     if request.method == 'POST':
         try:
@@ -689,30 +604,8 @@ def routine_update(request, routine_id):
     ]
     exercise_type_choices = Exercise.EXERCISE_TYPE_CHOICES
 
-    user_id = request.user.id
-    redis_conn = get_redis_connection()
-    user_preferences = {}
-    preference_definitions = {
-        'show_rpe': {'key_suffix': 'routineForm.showRPE', 'default': False},
-        'show_rest_time': {'key_suffix': 'routineForm.showRestTime', 'default': False},
-        'show_notes': {'key_suffix': 'routineForm.showNotes', 'default': False},
-    }
-
-    for pref_name, pref_info in preference_definitions.items():
-        cache_key = f"user_prefs:{user_id}:{pref_info['key_suffix']}"
-        # REVERTED: No more hardcoded key for RPE loading
-        # if pref_name == 'show_rpe':
-        #     cache_key = f"test_rpe_preference_user_{user_id}"
-
-        if redis_conn:
-            retrieved_value_bytes = redis_conn.get(cache_key)
-            if retrieved_value_bytes is not None:
-                retrieved_value_str = retrieved_value_bytes.decode('utf-8')
-                user_preferences[pref_name] = retrieved_value_str.lower() == 'true'
-            else:
-                user_preferences[pref_name] = pref_info['default']
-        else:
-            user_preferences[pref_name] = pref_info['default']
+    # One read of the user's preference hash (see workouts/preferences.py)
+    user_preferences = get_bool_preferences(request, ROUTINE_FORM_PREFERENCES)
 
     print(f"[routine_update] User preferences: {user_preferences}") # Your existing debug print
     context = {
@@ -932,67 +825,30 @@ def program_update(request, program_id):
             program.scheduling_type = new_scheduling_type
             program.save()
 
-            # If scheduling type changed, preserve routines but adjust their structure
+            # Diff the desired layout against the program's rows (see workouts/program_layout.py)
             if old_scheduling_type != new_scheduling_type:
-                existing_routines = list(program.program_routines.select_related('routine').order_by('order', 'assigned_day').all())
-                program.program_routines.all().delete()
-
-                if new_scheduling_type == 'sequential':
-                    # Convert from weekly to sequential - preserve order
-                    for i, program_routine in enumerate(existing_routines):
-                        ProgramRoutine.objects.create(
-                            program=program,
-                            routine=program_routine.routine,
-                            order=i + 1,
-                            assigned_day=None
-                        )
-                else:  # Converting to weekly
-                    # Convert from sequential to weekly - distribute across days
-                    days = [0, 1, 2, 3, 4, 5, 6]  # Monday to Sunday
-                    for i, program_routine in enumerate(existing_routines):
-                        assigned_day = days[i % len(days)]  # Cycle through days
-                        # Check if there's already a routine on this day and adjust order
-                        existing_on_day = ProgramRoutine.objects.filter(
-                            program=program,
-                            assigned_day=assigned_day
-                        ).count()
-                        ProgramRoutine.objects.create(
-                            program=program,
-                            routine=program_routine.routine,
-                            order=existing_on_day + 1,  # Proper order within the day
-                            assigned_day=assigned_day
-                        )
-            else:
-                # Same scheduling type - process normal updates
-                program.program_routines.all().delete()
-
-                if program.scheduling_type == 'weekly':
-                    # Process weekly schedule
-                    for day_val, day_name in ProgramRoutine._meta.get_field('assigned_day').choices:
-                        routine_ids = request.POST.getlist(f'weekly_day_{day_val}_routines')
-                        for i, r_id in enumerate(routine_ids):
-                            routine = get_object_or_404(Routine, id=r_id, user=request.user)
-                            ProgramRoutine.objects.create(
-                                program=program,
-                                routine=routine,
-                                assigned_day=day_val,
-                                order=i + 1 # Order within the day
-                            )
-                else: # Sequential
-                    # Process sequential schedule
-                    i = 0
-                    while f'program_routine_{i}_routine_id' in request.POST:
-                        routine_id = request.POST.get(f'program_routine_{i}_routine_id')
-                        order = request.POST.get(f'program_routine_{i}_order')
-                        if routine_id and order:
-                            routine = get_object_or_404(Routine, id=routine_id, user=request.user)
-                            ProgramRoutine.objects.create(
-                                program=program,
-                                routine=routine,
-                                order=int(order),
-                                assigned_day=None
-                            )
-                        i += 1
+                # Scheduling type changed - preserve routines but adjust their structure
+                slots = converted_slots(program, new_scheduling_type)
+            elif program.scheduling_type == 'weekly':
+                slots = weekly_slots({
+                    day_val: [r_id for r_id in request.POST.getlist(f'weekly_day_{day_val}_routines') if r_id]
+                    for day_val, day_name in ProgramRoutine._meta.get_field('assigned_day').choices
+                })
+            else: # Sequential
+                slots = []
+                i = 0
+                while f'program_routine_{i}_routine_id' in request.POST:
+                    routine_id = request.POST.get(f'program_routine_{i}_routine_id')
+                    order = request.POST.get(f'program_routine_{i}_order')
+                    if routine_id and order:
+                        slots.append(Slot(int(routine_id), int(order)))
+                    i += 1
+
+            # All routine ids checked in one query
+            routine_ids = {slot.routine_id for slot in slots}
+            if routine_ids - valid_routine_ids(request.user, routine_ids):
+                raise Http404("Routine not found.")
+            reconcile_program_routines(program, slots)
 
             # If scheduling type changed, redirect back to edit page to show the converted routines
             if old_scheduling_type != new_scheduling_type:
@@ -1064,76 +920,8 @@ def start_workout_from_routine(request, routine_id):
     Skips the intermediate form page.
     """
     routine = get_object_or_404(Routine, id=routine_id, user=request.user)
-    today = datetime.date.today()
-
-    # Auto-generate workout name: "Routine Name #X"
-    completed_count = Workout.objects.filter(user=request.user, routine_source=routine).count()
-    workout_name = f"{routine.name} #{completed_count + 1}"
-
-    # Determine last workout for this routine (to clone if present)
-    last_workout = Workout.objects.filter(
-        user=request.user,
-        routine_source=routine
-    ).order_by('-date').first()
-
-    # Create the Workout instance
-    new_workout = Workout.objects.create(
-        user=request.user,
-        name=workout_name,
-        notes="",
-        date=datetime.datetime.now(),
-        routine_source=routine
-    )
-
-    if last_workout:
-        # Clone last session structure: exercises and sets, preserving order and links
-        for prev_we in last_workout.exercises.prefetch_related('sets', 'exercise').order_by('order'):
-            new_we = WorkoutExercise.objects.create(
-                workout=new_workout,
-                exercise=prev_we.exercise,
-                order=prev_we.order,
-                notes="",  # do not copy notes
-                routine_exercise_source=prev_we.routine_exercise_source,
-                exercise_type=prev_we.exercise_type,
-                performance_feedback=prev_we.performance_feedback
-            )
-            for prev_set in prev_we.sets.all().order_by('set_number'):
-                ExerciseSet.objects.create(
-                    workout_exercise=new_we,
-                    set_number=prev_set.set_number,
-                    reps=prev_set.reps,
-                    weight=prev_set.weight,
-                    is_warmup=prev_set.is_warmup
-                )
-        return redirect('workout-detail', workout_id=new_workout.id)
-    else:
-        # First time with this routine: use planned template + prefill
-        for routine_exercise in routine.exercises.prefetch_related('planned_sets', 'exercise').order_by('order'):
-            # Create WorkoutExercise based on routine exercise
-            workout_exercise = WorkoutExercise.objects.create(
-                workout=new_workout,
-                exercise=routine_exercise.exercise,
-                order=routine_exercise.order,
-                notes="",
-                routine_exercise_source=routine_exercise,
-                exercise_type=routine_exercise.routine_specific_exercise_type or routine_exercise.exercise.exercise_type
-            )
-
-            # Create sets based on planned sets with intelligent prefill
-            for set_template in routine_exercise.planned_sets.all().order_by('set_number'):
-                prefill = get_prefill_data(request.user, set_template, today)
-                reps = prefill.get('reps', 0) or 0
-                weight = prefill.get('weight', 0) or 0
-
-                ExerciseSet.objects.create(
-                    workout_exercise=workout_exercise,
-                    set_number=set_template.set_number,
-                    reps=reps,
-                    weight=weight,
-                    is_warmup=set_template.is_warmup if hasattr(set_template, 'is_warmup') else False
-                )
-
-        return redirect('workout-detail', workout_id=new_workout.id)
+    new_workout = instantiate_workout_from_routine(request.user, routine, datetime.date.today())
+    return redirect('workout-detail', workout_id=new_workout.id)
 
 @login_required
 def start_empty_workout(request):
@@ -1169,7 +957,8 @@ def clear_workout(request, workout_id):
 
         # Clear the routine source to make it a freestyle workout
         workout.routine_source = None
-        workout.save()
+        # Explicit fields so likes/comments counted meanwhile aren't written back stale
+        workout.save(update_fields=['routine_source'])
 
         # Redirect back to the workout detail page
         return redirect('workout-detail', workout_id=workout.id)
@@ -1209,7 +998,8 @@ def workout_update(request, workout_id):
             except (ValueError, TypeError):
                 pass # Keep original if parsing fails
 
-        workout.save()
+        # Explicit fields so likes/comments counted meanwhile aren't written back stale
+        workout.save(update_fields=['name', 'notes', 'date', 'duration'])
         # Add success message
         return redirect('workout-detail', workout_id=workout.id)
 
@@ -1268,60 +1058,26 @@ def ajax_update_program_scheduling(request, program_id):
 
             # If frontend provides current routines state, use that instead of auto-converting
             if current_routines:
-                # Clear existing program routines
-                program.program_routines.all().delete()
-
-                # Re-create based on frontend state
                 if new_scheduling_type == 'weekly':
                     # current_routines should be a dict with day numbers as keys
-                    for day_str, routines in current_routines.items():
-                        day_num = int(day_str)
-                        for idx, routine_data in enumerate(routines):
-                            routine_id = routine_data.get('routine_id')
-                            if routine_id:
-                                try:
-                                    routine = Routine.objects.get(id=routine_id, user=request.user)
-                                    ProgramRoutine.objects.create(
-                                        program=program,
-                                        routine=routine,
-                                        assigned_day=day_num,
-                                        order=idx + 1
-                                    )
-                                except Routine.DoesNotExist:
-                                    continue
+                    slots = weekly_slots({
+                        day_str: [routine_data.get('routine_id') for routine_data in routines if routine_data.get('routine_id')]
+                        for day_str, routines in current_routines.items()
+                    })
                 else:  # sequential
                     # current_routines should be a list
-                    for idx, routine_data in enumerate(current_routines):
-                        routine_id = routine_data.get('routine_id')
-                        if routine_id:
-                            try:
-                                routine = Routine.objects.get(id=routine_id, user=request.user)
-                                ProgramRoutine.objects.create(
-                                    program=program,
-                                    routine=routine,
-                                    order=idx + 1,
-                                    assigned_day=None
-                                )
-                            except Routine.DoesNotExist:
-                                continue
+                    slots = sequential_slots(
+                        routine_data.get('routine_id') for routine_data in current_routines if routine_data.get('routine_id')
+                    )
+                # Routines the user doesn't own are skipped
+                valid_ids = valid_routine_ids(request.user, (slot.routine_id for slot in slots))
+                slots = [slot for slot in slots if slot.routine_id in valid_ids]
             else:
                 # Fallback to auto-conversion if no state provided
-                existing_routines = list(program.program_routines.select_related('routine').order_by('order', 'assigned_day').all())
-
-                if new_scheduling_type == 'weekly' and old_scheduling_type == 'sequential':
-                    # Converting from sequential to weekly - distribute routines across days
-                    days = [0, 1, 2, 3, 4, 5, 6]  # Monday to Sunday
-                    for i, pr in enumerate(existing_routines):
-                        pr.assigned_day = days[i % 7]  # Distribute evenly across week
-                        pr.save()
-
-                elif new_scheduling_type == 'sequential' and old_scheduling_type == 'weekly':
-                    # Converting from weekly to sequential - set order based on day and preserve sequence
-                    ordered_prs = sorted(existing_routines, key=lambda x: (x.assigned_day or 0, x.order))
-                    for i, pr in enumerate(ordered_prs):
-                        pr.order = i + 1
-                        pr.assigned_day = None  # Clear day assignment
-                        pr.save()
+                slots = converted_slots(program, new_scheduling_type)
+
+            # Only the rows that differ are written (see workouts/program_layout.py)
+            reconcile_program_routines(program, slots)
 
         # Return the updated routine assignments
         updated_routines = []
@@ -1368,42 +1124,24 @@ def ajax_restore_program_state(request, program_id):
             program.scheduling_type = original_state.get('scheduling_type', 'sequential')
             program.save()
 
-            # Clear existing program routines
-            program.program_routines.all().delete()
-
             # Restore routines based on scheduling type
             if program.scheduling_type == 'weekly':
                 weekly_routines = original_state.get('weekly_routines', {})
-                for day, routines in weekly_routines.items():
-                    day_num = int(day)
-                    for routine_data in routines:
-                        routine_id = routine_data.get('routine_id')
-                        if routine_id:
-                            try:
-                                routine = Routine.objects.get(id=routine_id, user=request.user)
-                                ProgramRoutine.objects.create(
-                                    program=program,
-                                    routine=routine,
-                                    assigned_day=day_num,
-                                    order=routine_data.get('order', 0)
-                                )
-                            except Routine.DoesNotExist:
-                                continue
+                slots = [
+                    Slot(int(routine_data['routine_id']), int(routine_data.get('order', 0)), int(day))
+                    for day, routines in weekly_routines.items()
+                    for routine_data in routines if routine_data.get('routine_id')
+                ]
             else:  # sequential
                 sequential_routines = original_state.get('sequential_routines', [])
-                for routine_data in sequential_routines:
-                    routine_id = routine_data.get('routine_id')
-                    if routine_id:
-                        try:
-                            routine = Routine.objects.get(id=routine_id, user=request.user)
-                            ProgramRoutine.objects.create(
-                                program=program,
-                                routine=routine,
-                                order=routine_data.get('order', 0),
-                                assigned_day=None
-                            )
-                        except Routine.DoesNotExist:
-                            continue
+                slots = [
+                    Slot(int(routine_data['routine_id']), int(routine_data.get('order', 0)))
+                    for routine_data in sequential_routines if routine_data.get('routine_id')
+                ]
+
+            # Routines the user doesn't own are skipped; rows still in place are kept
+            valid_ids = valid_routine_ids(request.user, (slot.routine_id for slot in slots))
+            reconcile_program_routines(program, [slot for slot in slots if slot.routine_id in valid_ids])
 
         return JsonResponse({
             'success': True,
@@ -1516,93 +1254,12 @@ def ajax_update_workout_exercise_feedback(request):
 @login_required
 def start_next_workout(request):
     user = request.user
-    next_routine = None
-    active_program = Program.objects.filter(user=user, is_active=True).first()
 
-    if active_program:
-        if active_program.scheduling_type == 'weekly':
-            # Weekly schedule logic
-            today_weekday = timezone.now().weekday()
-            program_routine_today = ProgramRoutine.objects.filter(
-                program=active_program,
-                assigned_day=today_weekday
-            ).select_related('routine').order_by('order').first()
-            if program_routine_today:
-                next_routine = program_routine_today.routine
-
-        else: # Sequential schedule logic - Smart scheduling for Mon/Wed/Fri/Sun pattern
-            # Get the last few workouts to understand the pattern
-            recent_workouts = Workout.objects.filter(
-                user=user,
-                routine_source__program_associations__program=active_program
-            ).order_by('-date')[:10]  # Look at last 10 workouts
-
-            # Count how many times each routine has been done this week
-            from datetime import timedelta
-            week_start = timezone.now().date() - timedelta(days=timezone.now().weekday())
-            this_week_workouts = Workout.objects.filter(
-                user=user,
-                routine_source__program_associations__program=active_program,
-                date__gte=week_start
-            ).select_related('routine_source')
-
-            # Get all program routines ordered
-            all_program_routines = list(ProgramRoutine.objects.filter(
-                program=active_program
-            ).order_by('order').select_related('routine'))
-
-            if not all_program_routines:
-                next_routine = None
-            else:
-                # Determine expected workout based on day of week pattern (Mon=0, Wed=2, Fri=4, Sun=6)
-                today_weekday = timezone.now().weekday()
-                days_since_week_start = (timezone.now().date() - week_start).days
-
-                # Map your workout pattern: Mon(0)->A, Wed(2)->B, Fri(4)->C, Sun(6)->D
-                expected_workout_map = {
-                    0: 0,  # Monday -> routine A (index 0)
-                    1: 0,  # Tuesday -> still routine A (in case shifted)
-                    2: 1,  # Wednesday -> routine B (index 1)
-                    3: 2,  # Thursday -> routine C (in case Friday shifted)
-                    4: 2,  # Friday -> routine C (index 2)
-                    5: 2,  # Saturday -> routine C (in case Friday shifted)
-                    6: 3,  # Sunday -> routine D (index 3)
-                }
-
-                # Get expected routine index for today
-                expected_index = expected_workout_map.get(today_weekday, 0)
-
-                # But also check what was actually done this week
-                completed_this_week = set()
-                for workout in this_week_workouts:
-                    for i, pr in enumerate(all_program_routines):
-                        if pr.routine == workout.routine_source:
-                            completed_this_week.add(i)
-                            break
+    # The active program's schedule already knows the next session (see workouts/schedule.py)
+    session = next_session(get_active_schedule(user))
 
-                # Find the next routine that hasn't been done this week
-                next_routine = None
-                for i in range(expected_index, len(all_program_routines)):
-                    if i not in completed_this_week and i < len(all_program_routines):
-                        next_routine = all_program_routines[i].routine
-                        break
-
-                # If nothing found from expected index onwards, or if we're past Sunday,
-                # just follow the sequential pattern
-                if not next_routine:
-                    last_workout = recent_workouts.first() if recent_workouts else None
-                    if last_workout and last_workout.routine_source:
-                        for i, pr in enumerate(all_program_routines):
-                            if pr.routine == last_workout.routine_source:
-                                next_index = (i + 1) % len(all_program_routines)
-                                next_routine = all_program_routines[next_index].routine
-                                break
-                    else:
-                        # First workout ever
-                        next_routine = all_program_routines[0].routine
-
-    if next_routine:
-        redirect_url = reverse('start-workout-from-routine', args=[next_routine.id])
+    if session:
+        redirect_url = reverse('start-workout-from-routine', args=[session['routine_id']])
         return redirect(f'{redirect_url}?source=smart-start')
     else:
         # Fallback: No routine found, create an ad-hoc workout
@@ -1627,25 +1284,17 @@ def update_user_preferences(request):
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
 
         if preference_key_suffix and preference_value is not None:
-            cache_key = f"user_prefs:{user_id}:{preference_key_suffix}"
-            # REVERTED: No more hardcoded key for RPE saving
-            # if preference_key_suffix == 'routineForm.showRPE':
-            #     cache_key = f"test_rpe_preference_user_{user_id}"
-
-            redis_conn = get_redis_connection()
-            if isinstance(preference_value, bool):
-                value_to_store = "true" if preference_value else "false"
-            else:
-                value_to_store = str(preference_value)
+            if not isinstance(preference_key_suffix, str) or len(preference_key_suffix) > 100:
+                return JsonResponse({'status': 'error', 'message': 'Invalid preference key.'}, status=400)
+            if len(encode_value(preference_value)) > 255:
+                return JsonResponse({'status': 'error', 'message': 'Preference value too long.'}, status=400)
 
+            # Saved to the database and written through to the user's Redis hash
             try:
-                if redis_conn:
-                    redis_conn.set(cache_key, value_to_store)
-                    return JsonResponse({'status': 'success', 'message': 'Preference saved via django-rq.'})
-                else:
-                    return JsonResponse({'status': 'warning', 'message': 'Redis not available, preference not saved.'})
+                set_user_preference(user_id, preference_key_suffix, preference_value, request=request)
+                return JsonResponse({'status': 'success', 'message': 'Preference saved.'})
             except Exception as e:
-                return JsonResponse({'status': 'error', 'message': f'Failed to save to Redis: {e}'}, status=500)
+                return JsonResponse({'status': 'error', 'message': f'Failed to save preference: {e}'}, status=500)
         else:
             return JsonResponse({'status': 'error', 'message': 'Missing key or value.'}, status=400)
 
@@ -2522,6 +2171,224 @@ def api_program_timer_preferences(request, program_id):
 
     return JsonResponse({'error': 'Method not allowed.'}, status=405)
 
+@login_required
+def api_routine_prefill_preview(request, routine_id):
+    """API endpoint returning the suggested reps/weight for every planned set of a routine"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET allowed'}, status=405)
+
+    routine = get_object_or_404(Routine, id=routine_id, user=request.user)
+
+    try:
+        routine_exercises = list(
+            routine.exercises.select_related('exercise').prefetch_related('planned_sets').order_by('order')
+        )
+        prefill = resolve_prefill(
+            request.user,
+            [set_template for routine_exercise in routine_exercises for set_template in routine_exercise.planned_sets.all()],
+            datetime.date.today(),
+        )
+
+        exercises = []
+        for routine_exercise in routine_exercises:
+            sets = []
+            for set_template in routine_exercise.planned_sets.all():
+                suggestion = prefill.get(set_template.id, {})
+                sets.append({
+                    'routine_exercise_set_id': set_template.id,
+                    'set_number': set_template.set_number,
+                    'target_reps': set_template.target_reps,
+                    'target_weight': float(set_template.target_weight) if set_template.target_weight is not None else None,
+                    'reps': suggestion.get('reps'),
+                    'weight': float(suggestion['weight']) if suggestion.get('weight') is not None else None,
+                })
+            exercises.append({
+                'routine_exercise_id': routine_exercise.id,
+                'exercise_id': routine_exercise.exercise_id,
+                'exercise_name': routine_exercise.exercise.name,
+                'order': routine_exercise.order,
+                'sets': sets,
+            })
+
+        return JsonResponse({
+            'success': True,
+            'routine_id': routine.id,
+            'routine_name': routine.name,
+            'exercises': exercises,
+        })
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+def _import_job_payload(job):
+    return {
+        'id': job.id,
+        'source_format': job.source_format,
+        'status': job.status,
+        'rows_processed': job.rows_processed,
+        'rows_skipped': job.rows_skipped,
+        'workouts_created': job.workouts_created,
+        'sets_created': job.sets_created,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+    }
+
+def _start_import_job(request, job, status):
+    """Queue an import job; without a queue it runs inline and the final state is returned."""
+    background_job = enqueue_user_job(
+        request.user.id,
+        run_workout_import_job,
+        job.id,
+        dedup_key=f"workout_import:{request.user.id}:{job.id}",
+        timeout=60 * 30,
+    )
+    job.refresh_from_db()
+
+    if background_job['job_id'] is None:
+        return JsonResponse(
+            {'success': job.status == 'completed', 'import': _import_job_payload(job)},
+            status=status if job.status == 'completed' else 400,
+        )
+
+    return JsonResponse({
+        'success': True,
+        'import': _import_job_payload(job),
+        'job': background_job,
+    }, status=202)
+
+@login_required
+def api_job_status(request, job_id):
+    """API endpoint to poll the status of a background job started by the user"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET allowed'}, status=405)
+
+    job = get_user_job(request.user.id, job_id)
+    if job is None:
+        return JsonResponse({'job_id': job_id, 'status': 'not_found'}, status=404)
+
+    response = JsonResponse(job_payload(job))
+    response['Cache-Control'] = 'no-store'
+    return response
+
+@login_required
+def api_upcoming_sessions(request):
+    """API endpoint returning the active program's upcoming sessions (see gainz/workouts/schedule.py)"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET allowed'}, status=405)
+
+    schedule = get_active_schedule(request.user)
+    if schedule is None:
+        return JsonResponse({'program': None, 'next': None, 'sessions': []})
+
+    try:
+        limit = min(max(1, int(request.GET.get('limit', 14))), 100)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+
+    return JsonResponse({
+        'program': {
+            'id': schedule.program.id,
+            'name': schedule.program.name,
+            'scheduling_type': schedule.program.scheduling_type,
+        },
+        'next': next_session(schedule),
+        'sessions': schedule.sessions[:limit],
+    })
+
+@login_required
+def api_sync_changes(request):
+    """API endpoint returning the user's workout changes since a sync cursor (offline clients)"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET allowed'}, status=405)
+
+    cursor = request.GET.get('cursor')
+    if cursor is None:
+        # No cursor yet: the client starts following changes from here
+        payload = {'changes': [], 'cursor': current_cursor(request.user), 'has_more': False}
+    else:
+        try:
+            cursor = max(0, int(cursor))
+        except ValueError:
+            return JsonResponse({'error': 'cursor must be an integer'}, status=400)
+        payload = changes_since(request.user, cursor)
+
+    response = JsonResponse(payload)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+@login_required
+def api_sync_push(request):
+    """API endpoint applying a batch of queued offline edits (see gainz/workouts/sync.py)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return JsonResponse({'error': 'operations must be a non-empty list'}, status=400)
+    if len(operations) > MAX_PUSH_OPERATIONS:
+        return JsonResponse({'error': f'At most {MAX_PUSH_OPERATIONS} operations per request'}, status=400)
+
+    results = push_operations(request.user, operations)
+    return JsonResponse({'results': results, 'cursor': current_cursor(request.user)})
+
+@login_required
+def api_workout_imports(request):
+    """API endpoint to upload a workout history CSV export (POST) or list recent imports (GET)"""
+    if request.method == 'GET':
+        jobs = WorkoutImportJob.objects.filter(user=request.user)[:20]
+        return JsonResponse({'imports': [_import_job_payload(job) for job in jobs]})
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed.'}, status=405)
+
+    upload = request.FILES.get('file')
+    if not upload:
+        return JsonResponse({'error': 'A CSV file is required.'}, status=400)
+
+    source_format = request.POST.get('format', 'csv')
+    if source_format not in dict(WorkoutImportJob.FORMAT_CHOICES):
+        return JsonResponse({'error': f'Unknown format: {source_format}'}, status=400)
+    weight_unit = request.POST.get('weight_unit', 'kg')
+    if weight_unit not in dict(WorkoutImportJob.WEIGHT_UNIT_CHOICES):
+        return JsonResponse({'error': f'Unknown weight unit: {weight_unit}'}, status=400)
+
+    job = WorkoutImportJob.objects.create(
+        user=request.user,
+        source_format=source_format,
+        file=upload,
+        weight_unit=weight_unit,
+        create_missing=request.POST.get('create_missing', 'on') == 'on',
+        visibility='public' if request.POST.get('visibility') == 'public' else 'private',
+    )
+    return _start_import_job(request, job, status=201)
+
+@login_required
+def api_workout_import_detail(request, import_id):
+    """API endpoint returning the progress of a workout history import"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Only GET allowed'}, status=405)
+
+    job = get_object_or_404(WorkoutImportJob, id=import_id, user=request.user)
+    return JsonResponse({'import': _import_job_payload(job)})
+
+@login_required
+def api_workout_import_resume(request, import_id):
+    """API endpoint to resume a failed workout history import from its last checkpoint"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST allowed'}, status=405)
+
+    job = get_object_or_404(WorkoutImportJob, id=import_id, user=request.user)
+    if job.status != 'failed':
+        return JsonResponse({'error': f'Import is {job.status}, only failed imports can be resumed.'}, status=400)
+
+    return _start_import_job(request, job, status=200)
+
 @login_required
 def api_routine_timer_preferences(request, routine_id):
     """API endpoint to manage routine timer preferences (GET/POST)"""
@@ -2614,58 +2481,43 @@ def normalize_rep_range(rep_range, min_reps=None, max_reps=None):
     return normalized, min_value, max_value
 
 
-def aggregate_exercise_sets_for_chart(sets, chart_type='1rm', comparison_type='average'):
-    """Aggregate exercise sets to a single data point per workout."""
+def aggregate_exercise_sets_for_chart(sets_query, chart_type='1rm', comparison_type='average'):
+    """Aggregate exercise sets to a single data point per workout.
+
+    The grouping and 1RM math run in the database, so only one row per
+    workout is loaded regardless of how many sets were logged.
+    """
     chart_type = (chart_type or '1rm').lower()
     comparison_type = (comparison_type or 'average').lower()
 
-    workouts = defaultdict(lambda: {
-        'date': None,
-        'estimates': [],
-        'weights': [],
-        'volumes': [],
-    })
-
-    for set_obj in sets:
-        if getattr(set_obj, 'is_warmup', False):
-            continue
-
-        if set_obj.weight is None or set_obj.reps is None:
-            continue
-
-        workout = set_obj.workout_exercise.workout
-        entry = workouts[workout.id]
-        if entry['date'] is None:
-            entry['date'] = workout.date
-
-        volume_value = float(set_obj.get_volume())
-        entry['volumes'].append(volume_value)
-        entry['weights'].append(float(set_obj.weight))
-
-        if set_obj.is_valid_for_1rm():
-            estimate = set_obj.get_best_1rm_estimate()
-            if estimate is not None:
-                entry['estimates'].append(float(estimate))
+    estimated_1rm = estimated_1rm_expression()
+    weight = Cast('weight', FloatField())
+
+    rows = (
+        sets_query.filter(is_warmup=False)
+        .values('workout_exercise__workout_id', 'workout_exercise__workout__date')
+        .annotate(
+            avg_estimate=Avg(estimated_1rm),
+            max_estimate=Max(estimated_1rm),
+            avg_weight=Avg(weight),
+            max_weight=Max(weight),
+            volume_total=Sum(Cast(F('reps') * F('weight'), FloatField())),
+        )
+        .order_by('workout_exercise__workout__date', 'workout_exercise__workout_id')
+    )
 
     points = []
-    for workout_id, entry in sorted(
-        workouts.items(),
-        key=lambda item: item[1]['date'] or timezone.now(),
-    ):
-        estimates = entry['estimates']
-        weights = entry['weights']
-        volumes = entry['volumes']
-
+    for row in rows:
         if comparison_type in ('peak', 'heaviest'):
-            estimate_value = max(estimates) if estimates else None
-            weight_value = max(weights) if weights else None
+            estimate_value = row['max_estimate']
+            weight_value = row['max_weight']
         else:
-            estimate_value = statistics.mean(estimates) if estimates else None
-            weight_value = statistics.mean(weights) if weights else None
+            estimate_value = row['avg_estimate']
+            weight_value = row['avg_weight']
 
-        volume_total = sum(volumes) if volumes else 0
+        volume_total = row['volume_total'] or 0
         y_value = volume_total if chart_type == 'volume' else estimate_value
-        iso_date = (entry['date'] or timezone.now()).isoformat()
+        iso_date = (row['workout_exercise__workout__date'] or timezone.now()).isoformat()
         points.append({
             'x': iso_date,
             'date': iso_date,
@@ -2673,7 +2525,7 @@ def aggregate_exercise_sets_for_chart(sets, chart_type='1rm', comparison_type='a
             'estimated_1rm': float(estimate_value) if estimate_value is not None else None,
             'weight': float(weight_value) if weight_value is not None else None,
             'volume': float(volume_total),
-            'workout_id': workout_id,
+            'workout_id': row['workout_exercise__workout_id'],
         })
 
     return points
@@ -2778,25 +2630,15 @@ def exercise_progress_detail(request, exercise_id):
     elif rep_range == 'custom' and min_reps_value is not None and max_reps_value is not None:
         sets_query = sets_query.filter(reps__range=(min_reps_value, max_reps_value))
 
-    ordered_sets = list(sets_query.order_by('workout_exercise__workout__date', 'set_number'))
-
     # Build chart data
     progress_data = get_exercise_progress(request.user, exercise, period_days)
-    chart_data = aggregate_exercise_sets_for_chart(ordered_sets, chart_type, comparison_type)
+    chart_data = aggregate_exercise_sets_for_chart(sets_query, chart_type, comparison_type)
 
-    non_warmup_sets = [
-        s for s in ordered_sets
-        if not getattr(s, 'is_warmup', False)
-    ]
     recent_sets = []
-    for set_obj in sorted(
-        non_warmup_sets,
-        key=lambda s: (
-            s.workout_exercise.workout.date,
-            s.workout_exercise.workout.id,
-            getattr(s, 'set_number', 0),
-        ),
-        reverse=True,
+    for set_obj in sets_query.filter(is_warmup=False).order_by(
+        '-workout_exercise__workout__date',
+        '-workout_exercise__workout_id',
+        '-set_number',
     )[:10]:
         estimated_1rm = set_obj.get_best_1rm_estimate() if set_obj.is_valid_for_1rm() else None
         recent_sets.append({
@@ -2859,36 +2701,61 @@ def api_exercise_chart_data(request, exercise_id):
         if chart_type not in ('1rm', 'volume'):
             chart_type = '1rm'
 
-        # Query sets with filtering
-        sets_query = ExerciseSet.objects.filter(
-            workout_exercise__workout__user=request.user,
-            workout_exercise__exercise=exercise,
-            workout_exercise__workout__date__gte=timezone.now() - timedelta(days=period_days)
-        ).select_related('workout_exercise__workout')
-
-        # Apply rep range filter
-        if rep_range == 'low':
-            sets_query = sets_query.filter(reps__range=(1, 3))
-        elif rep_range == 'mid':
-            sets_query = sets_query.filter(reps__range=(4, 6))
-        elif rep_range == 'high':
-            sets_query = sets_query.filter(reps__gte=7)
-        elif rep_range == 'custom':
-            if min_reps_value is not None and max_reps_value is not None:
-                sets_query = sets_query.filter(reps__range=(min_reps_value, max_reps_value))
-
-        ordered_sets = list(sets_query.order_by('workout_exercise__workout__date', 'set_number'))
-        chart_data = aggregate_exercise_sets_for_chart(ordered_sets, chart_type, comparison_type)
-
-        return JsonResponse({
-            'success': True,
-            'data': chart_data,
-            'exercise_name': exercise.name,
-            'chart_type': chart_type,
-            'period_days': period_days,
+        # Serve from cache (or a bare 304) when nothing changed for this exercise
+        cache_key = chart_cache_key(request.user.id, exercise.id, {
+            'period': period_days,
             'rep_range': rep_range,
-            'comparison_type': comparison_type,
+            'min_reps': min_reps_value,
+            'max_reps': max_reps_value,
+            'comparison': comparison_type,
+            'chart_type': chart_type,
         })
+        etag = chart_etag(cache_key) if cache_key else None
+
+        if etag and etag_matches(request.META.get('HTTP_IF_NONE_MATCH', ''), etag):
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        payload = get_cached_chart(cache_key)
+        if payload is None:
+            # Query sets with filtering
+            sets_query = ExerciseSet.objects.filter(
+                workout_exercise__workout__user=request.user,
+                workout_exercise__exercise=exercise,
+                workout_exercise__workout__date__gte=timezone.now() - timedelta(days=period_days)
+            ).select_related('workout_exercise__workout')
+
+            # Apply rep range filter
+            if rep_range == 'low':
+                sets_query = sets_query.filter(reps__range=(1, 3))
+            elif rep_range == 'mid':
+                sets_query = sets_query.filter(reps__range=(4, 6))
+            elif rep_range == 'high':
+                sets_query = sets_query.filter(reps__gte=7)
+            elif rep_range == 'custom':
+                if min_reps_value is not None and max_reps_value is not None:
+                    sets_query = sets_query.filter(reps__range=(min_reps_value, max_reps_value))
+
+            chart_data = aggregate_exercise_sets_for_chart(sets_query, chart_type, comparison_type)
+
+            payload = {
+                'success': True,
+                'data': chart_data,
+                'exercise_name': exercise.name,
+                'chart_type': chart_type,
+                'period_days': period_days,
+                'rep_range': rep_range,
+                'comparison_type': comparison_type,
+            }
+            set_cached_chart(cache_key, payload)
+
+        response = JsonResponse(payload)
+        if etag:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
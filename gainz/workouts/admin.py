@@ -145,12 +145,13 @@ class ExerciseTimerOverrideAdmin(admin.ModelAdmin):
 
 @admin.register(PersonalRecord)
 class PersonalRecordAdmin(admin.ModelAdmin):
-    list_display = ('user', 'exercise', 'record_type', 'weight', 'reps', 'date_achieved')
+    list_display = ('user', 'exercise', 'record_type', 'weight', 'reps', 'value', 'date_achieved')
     list_filter = ('record_type', 'exercise', 'date_achieved')
     search_fields = ('user__username', 'exercise__name')
     ordering = ('-date_achieved',)
     readonly_fields = ('date_achieved', 'get_estimated_1rm')
     autocomplete_fields = ['user', 'exercise']
+    raw_id_fields = ['workout_exercise_source', 'exercise_set_source']
 
 # Remove the old simple registrations
 # admin.site.register(Workout, WorkoutAdmin)
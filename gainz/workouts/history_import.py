@@ -0,0 +1,472 @@
+"""
+Workout History Import
+
+Streams workout-history CSV exports (Strong, Hevy or a generic CSV layout)
+into Workout / WorkoutExercise / ExerciseSet rows. The file is read row by row
+and written in chunks of whole workouts with bulk_create, each chunk in its own
+transaction together with the job's checkpoint, so memory stays bounded and a
+failed import resumes from the last committed chunk.
+
+bulk_create skips the model signals, so rollups, personal records and
+chart caches are rebuilt once for the user when the import finishes, and
+each chunk's workouts are pushed to the social timelines once it commits.
+"""
+
+import csv
+import datetime
+import io
+import itertools
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from gainz.exercises.models import Exercise
+from gainz.exercises.name_index import build_exercise_name_index, normalize_exercise_name
+from gainz.utils.unit_conversion import lbs_to_kg
+from .models import Workout, WorkoutExercise, ExerciseSet, WorkoutImportJob
+from .sync import record_workout_tree
+
+DEFAULT_CHUNK_SIZE = 200  # Workouts per transaction
+FUZZY_MATCH_THRESHOLD = 0.7
+MAX_WEIGHT = Decimal('9999.99')  # ExerciseSet.weight is max_digits=6, decimal_places=2
+
+HEVY_DATE_FORMAT = '%d %b %Y, %H:%M'
+TRUE_VALUES = {'true', 'yes', 'y', '1', 'x'}
+
+
+class ImportFormatError(ValueError):
+    """The uploaded file doesn't look like the selected export format."""
+
+
+# -- Reading --
+
+def _header_key(name: str) -> str:
+    """Normalize a CSV header: 'Workout Name' -> 'workout_name'."""
+    return re.sub(r'[^a-z0-9]+', '_', (name or '').strip().lower()).strip('_')
+
+
+def _open_rows(stream) -> Iterator[Dict[str, str]]:
+    """
+    Yield each CSV row as a dict keyed by normalized header names.
+
+    Detects ';' delimited files (Strong uses them in some locales).
+    """
+    header = stream.readline()
+    if not header:
+        return
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.reader(itertools.chain([header], stream), delimiter=delimiter)
+    fields = [_header_key(name) for name in next(reader)]
+    for values in reader:
+        yield dict(zip(fields, values))
+
+
+def _parse_decimal(value: str) -> Optional[Decimal]:
+    value = (value or '').strip().replace(',', '.')
+    if not value:
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
+
+
+def _parse_reps(value: str) -> Optional[int]:
+    number = _parse_decimal(value)
+    if number is None or number <= 0:
+        return None
+    return int(number)
+
+
+def _parse_duration(value: str) -> Optional[datetime.timedelta]:
+    """Parse '1h 5m', '45m', '1:05:00' or a plain number of minutes."""
+    value = (value or '').strip().lower()
+    if not value:
+        return None
+    if ':' in value:
+        parts = [int(part) for part in value.split(':') if part.isdigit()]
+        if len(parts) == 3:
+            return datetime.timedelta(hours=parts[0], minutes=parts[1], seconds=parts[2])
+        if len(parts) == 2:
+            return datetime.timedelta(hours=parts[0], minutes=parts[1])
+        return None
+    units = dict((unit, int(amount)) for amount, unit in re.findall(r'(\d+)\s*([hms])', value))
+    if units:
+        return datetime.timedelta(hours=units.get('h', 0), minutes=units.get('m', 0), seconds=units.get('s', 0))
+    minutes = _parse_decimal(value)
+    return datetime.timedelta(minutes=float(minutes)) if minutes is not None else None
+
+
+def _make_aware(value: datetime.datetime) -> datetime.datetime:
+    if timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def _parse_date(value: str) -> Optional[datetime.datetime]:
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        try:
+            parsed = datetime.datetime.strptime(value, HEVY_DATE_FORMAT)
+        except ValueError:
+            day = parse_date(value)
+            if day is None:
+                return None
+            parsed = datetime.datetime.combine(day, datetime.time(12, 0))
+    return _make_aware(parsed)
+
+
+def _to_kg(weight: Optional[Decimal], weight_unit: str) -> Decimal:
+    if weight is None:
+        return Decimal('0')  # Bodyweight sets
+    if weight_unit == 'lbs':
+        return lbs_to_kg(weight)
+    return weight.quantize(Decimal('0.01'))
+
+
+def _normalize_strong(row: Dict[str, str], weight_unit: str) -> Dict:
+    if row.get('duration_sec'):
+        # Newer Strong exports give the duration in seconds
+        duration = _parse_duration(f"{row['duration_sec']}s")
+    else:
+        duration = _parse_duration(row.get('duration'))
+    return {
+        'date': _parse_date(row.get('date')),
+        'workout_name': row.get('workout_name', ''),
+        'workout_notes': row.get('workout_notes', ''),
+        'duration': duration,
+        'exercise_name': row.get('exercise_name', ''),
+        'weight': _to_kg(_parse_decimal(row.get('weight')), weight_unit),
+        'reps': _parse_reps(row.get('reps')),
+        'is_warmup': (row.get('set_order') or '').strip().upper() == 'W',
+    }
+
+
+def _normalize_hevy(row: Dict[str, str], weight_unit: str) -> Dict:
+    start = _parse_date(row.get('start_time'))
+    end = _parse_date(row.get('end_time'))
+    if 'weight_kg' in row:
+        weight = _to_kg(_parse_decimal(row.get('weight_kg')), 'kg')
+    else:
+        weight = _to_kg(_parse_decimal(row.get('weight_lbs')), 'lbs')
+    return {
+        'date': start,
+        'workout_name': row.get('title', ''),
+        'workout_notes': row.get('description', ''),
+        'duration': end - start if start and end and end > start else None,
+        'exercise_name': row.get('exercise_title', ''),
+        'weight': weight,
+        'reps': _parse_reps(row.get('reps')),
+        'is_warmup': (row.get('set_type') or '').strip().lower() == 'warmup',
+    }
+
+
+def _normalize_generic(row: Dict[str, str], weight_unit: str) -> Dict:
+    return {
+        'date': _parse_date(row.get('date')),
+        'workout_name': row.get('workout') or row.get('workout_name', ''),
+        'workout_notes': row.get('notes', ''),
+        'duration': _parse_duration(row.get('duration')),
+        'exercise_name': row.get('exercise') or row.get('exercise_name', ''),
+        'weight': _to_kg(_parse_decimal(row.get('weight')), weight_unit),
+        'reps': _parse_reps(row.get('reps')),
+        'is_warmup': (row.get('warmup') or '').strip().lower() in TRUE_VALUES,
+    }
+
+
+NORMALIZERS = {
+    'strong': (_normalize_strong, {'date', 'exercise_name', 'reps'}),
+    'hevy': (_normalize_hevy, {'start_time', 'exercise_title', 'reps'}),
+    'csv': (_normalize_generic, {'date', 'exercise', 'reps'}),
+}
+
+
+def iter_import_rows(stream, source_format: str, weight_unit: str = 'kg') -> Iterator[Optional[Dict]]:
+    """
+    Yield one normalized set dict per CSV row, or None for rows that can't be
+    imported (no reps, e.g. cardio entries, or an unreadable date).
+
+    Every CSV row yields exactly one item so row counts line up with the
+    job's resume checkpoint.
+    """
+    normalize, required_columns = NORMALIZERS[source_format]
+    checked = False
+    for row in _open_rows(stream):
+        if not checked:
+            missing = required_columns - set(row)
+            if missing:
+                raise ImportFormatError(
+                    f"Missing column(s) for {source_format} export: {', '.join(sorted(missing))}"
+                )
+            checked = True
+
+        normalized = normalize(row, weight_unit)
+        if (
+            normalized['date'] is None
+            or normalized['reps'] is None
+            or not normalized['exercise_name'].strip()
+            or normalized['weight'] > MAX_WEIGHT
+        ):
+            yield None
+            continue
+        normalized['workout_name'] = normalized['workout_name'].strip()[:200] or 'Imported Workout'
+        normalized['exercise_name'] = normalized['exercise_name'].strip()[:200]
+        yield normalized
+
+
+def iter_import_workouts(rows: Iterable[Optional[Dict]]) -> Iterator[Tuple[Dict, int]]:
+    """
+    Group consecutive rows of the same workout (same start time and name).
+
+    Yields (workout, rows_consumed) where `rows_consumed` includes skipped
+    rows, and each workout holds consecutive runs of the same exercise as one
+    entry with its sets in file order.
+    """
+    current = None
+    consumed = 0
+    skipped = 0
+    for row in rows:
+        consumed += 1
+        if row is None:
+            if current is not None:
+                current['skipped'] += 1
+            else:
+                skipped += 1
+            continue
+
+        key = (row['date'], row['workout_name'])
+        if current is not None and current['key'] != key:
+            # The skipped rows just counted belong to the workout being emitted
+            yield current, consumed - 1
+            consumed = 1
+            current = None
+
+        if current is None:
+            current = {
+                'key': key,
+                'date': row['date'],
+                'name': row['workout_name'],
+                'notes': row['workout_notes'].strip(),
+                'duration': row['duration'],
+                'exercises': [],
+                'skipped': skipped,
+            }
+            skipped = 0
+
+        exercises = current['exercises']
+        if not exercises or exercises[-1]['name'] != row['exercise_name']:
+            exercises.append({'name': row['exercise_name'], 'sets': []})
+        exercises[-1]['sets'].append(row)
+
+    if current is not None:
+        yield current, consumed
+    elif consumed:
+        # Only unusable rows left at the end of the file
+        yield None, consumed
+
+
+# -- Writing --
+
+class ExerciseResolver:
+    """
+    Resolves exported exercise names to the user's exercises with a per-import
+    cache: exact name, then fuzzy match, then (optionally) a new custom exercise.
+    """
+
+    def __init__(self, user, create_missing: bool = True):
+        self.user = user
+        self.create_missing = create_missing
+        self.index = build_exercise_name_index(
+            Exercise.objects.filter(Q(is_custom=False) | Q(is_custom=True, user=user))
+        )
+        self.resolved: Dict[str, Optional[int]] = {}
+        self.created: List[str] = []
+
+    def resolve(self, name: str) -> Optional[int]:
+        key = normalize_exercise_name(name)
+        if key in self.resolved:
+            return self.resolved[key]
+
+        exercise_id = self.index.exact(name)
+        if exercise_id is None:
+            exercise_id, _ = self.index.best_match(name, FUZZY_MATCH_THRESHOLD)
+        if exercise_id is None and self.create_missing:
+            exercise = Exercise.objects.create(
+                name=name,
+                description='Auto-created from workout history import',
+                is_custom=True,
+                user=self.user,
+                exercise_type='accessory',
+            )
+            exercise_id = exercise.id
+            self.created.append(name)
+
+        self.resolved[key] = exercise_id
+        return exercise_id
+
+
+def _existing_workout_keys(user, workouts: List[Dict]) -> set:
+    """(date, name) of workouts in this chunk the user already has, so re-imports don't duplicate them."""
+    dates = [workout['date'] for workout in workouts]
+    return set(
+        Workout.objects.filter(user=user, date__in=dates).values_list('date', 'name')
+    )
+
+
+def _write_chunk(job: WorkoutImportJob, workouts: List[Dict], rows_consumed: int, resolver: ExerciseResolver) -> None:
+    """Write one chunk of workouts and advance the job checkpoint in the same transaction."""
+    from gainz.social.timeline import fan_out_workouts
+
+    existing = _existing_workout_keys(job.user, workouts)
+    skipped_rows = 0
+
+    planned = []
+    for workout in workouts:
+        skipped_rows += workout['skipped']
+        if workout['key'] in existing:
+            skipped_rows += sum(len(exercise['sets']) for exercise in workout['exercises'])
+            continue
+
+        exercises = []
+        for exercise in workout['exercises']:
+            exercise_id = resolver.resolve(exercise['name'])
+            if exercise_id is None:
+                skipped_rows += len(exercise['sets'])
+                continue
+            exercises.append((exercise_id, exercise['sets']))
+        if exercises:
+            planned.append((workout, exercises))
+
+    with transaction.atomic():
+        workout_objects = Workout.objects.bulk_create([
+            Workout(
+                user=job.user,
+                date=workout['date'],
+                name=workout['name'],
+                notes=workout['notes'],
+                duration=workout['duration'],
+                visibility=job.visibility,
+            )
+            for workout, _ in planned
+        ])
+
+        workout_exercises = []
+        for workout_object, (_, exercises) in zip(workout_objects, planned):
+            for order, (exercise_id, _) in enumerate(exercises, start=1):
+                workout_exercises.append(WorkoutExercise(workout=workout_object, exercise_id=exercise_id, order=order))
+        WorkoutExercise.objects.bulk_create(workout_exercises, batch_size=1000)
+
+        all_sets = (sets for _, exercises in planned for _, sets in exercises)
+        exercise_sets = []
+        for workout_exercise, sets in zip(workout_exercises, all_sets):
+            for set_number, row in enumerate(sets, start=1):
+                exercise_sets.append(ExerciseSet(
+                    workout_exercise=workout_exercise,
+                    set_number=set_number,
+                    reps=row['reps'],
+                    weight=row['weight'],
+                    is_warmup=row['is_warmup'],
+                    is_completed=True,
+                ))
+        ExerciseSet.objects.bulk_create(exercise_sets, batch_size=1000)
+        record_workout_tree(job.user_id, workout_objects, workout_exercises, exercise_sets)
+        workout_ids = [workout_object.id for workout_object in workout_objects]
+        transaction.on_commit(lambda: fan_out_workouts(workout_ids))
+
+        job.rows_processed += rows_consumed
+        job.rows_skipped += skipped_rows
+        job.workouts_created += len(workout_objects)
+        job.sets_created += len(exercise_sets)
+        job.save(update_fields=['rows_processed', 'rows_skipped', 'workouts_created', 'sets_created', 'updated_at'])
+
+
+def _finalize(job: WorkoutImportJob) -> None:
+    """Rebuild the derived data bulk_create skipped, once for the whole import."""
+    from gainz.utils.chart_cache import invalidate_exercise_charts
+    from gainz.utils.personal_records import backfill_records_for_user
+    from gainz.utils.progress_rollups import rebuild_rollups_for_user
+
+    rebuild_rollups_for_user(job.user)
+    backfill_records_for_user(job.user)
+    invalidate_exercise_charts(
+        job.user_id,
+        WorkoutExercise.objects.filter(workout__user=job.user).values_list('exercise_id', flat=True).distinct(),
+    )
+
+
+def _open_job_file(job: WorkoutImportJob):
+    if job.file:
+        job.file.open('rb')
+        return io.TextIOWrapper(job.file.file, encoding='utf-8-sig', newline='')
+    return open(job.file_path, encoding='utf-8-sig', newline='')
+
+
+def run_import(
+    job: WorkoutImportJob,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[WorkoutImportJob], None]] = None,
+    raise_errors: bool = False,
+) -> WorkoutImportJob:
+    """
+    Run (or resume) an import job.
+
+    Rows up to `job.rows_processed` were committed by an earlier run and are
+    skipped. `progress` is called with the job after every committed chunk.
+    With `raise_errors`, failures other than a malformed file are re-raised
+    once the job is marked failed, so a job queue can retry them.
+    """
+    chunk_size = max(1, chunk_size)
+    job.status = 'running'
+    job.error = ''
+    job.save(update_fields=['status', 'error', 'updated_at'])
+
+    try:
+        resolver = ExerciseResolver(job.user, create_missing=job.create_missing)
+        with _open_job_file(job) as stream:
+            rows = iter_import_rows(stream, job.source_format, job.weight_unit)
+            rows = itertools.islice(rows, job.rows_processed, None)
+
+            chunk: List[Dict] = []
+            chunk_rows = 0
+            for workout, rows_consumed in iter_import_workouts(rows):
+                chunk_rows += rows_consumed
+                if workout is None:
+                    job.rows_skipped += rows_consumed
+                    continue
+                chunk.append(workout)
+                if len(chunk) >= chunk_size:
+                    _write_chunk(job, chunk, chunk_rows, resolver)
+                    chunk, chunk_rows = [], 0
+                    if progress:
+                        progress(job)
+
+            if chunk or chunk_rows:
+                _write_chunk(job, chunk, chunk_rows, resolver)
+                if progress:
+                    progress(job)
+
+        _finalize(job)
+    except Exception as e:
+        print(f"Workout import {job.id} failed after {job.rows_processed} rows: {e}")
+        job.status = 'failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        if raise_errors and not isinstance(e, ImportFormatError):
+            raise
+        return job
+
+    job.status = 'completed'
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'completed_at', 'updated_at'])
+    return job
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from gainz.utils.personal_records import backfill_records_for_user
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Detect personal records in existing workout history and rebuild the per-exercise best index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Only backfill records for this username',
+            required=False
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of users loaded per batch (default: 100)'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f'User "{options["user"]}" not found'))
+                return
+
+        batch_size = max(1, options['batch_size'])
+        total_records = 0
+        last_id = 0
+        while True:
+            batch = list(users.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            for user in batch:
+                created = backfill_records_for_user(user)
+                total_records += created
+                if created:
+                    self.stdout.write(f'Detected {created} new personal records for {user.username}')
+
+            last_id = batch[-1].id
+            self.stdout.write(f'Processed users up to id {last_id}')
+
+        self.stdout.write(self.style.SUCCESS(f'Done. {total_records} personal records created.'))
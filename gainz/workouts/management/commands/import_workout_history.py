@@ -0,0 +1,112 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from gainz.workouts.history_import import DEFAULT_CHUNK_SIZE, run_import
+from gainz.workouts.models import WorkoutImportJob
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import workout history from a CSV export (generic CSV, Strong or Hevy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Username to import the workouts for',
+            required=False
+        )
+        parser.add_argument(
+            '--file',
+            type=str,
+            help='Path to the CSV export',
+            required=False
+        )
+        parser.add_argument(
+            '--format',
+            choices=[choice for choice, _ in WorkoutImportJob.FORMAT_CHOICES],
+            default='csv',
+            help='Export format (default: csv)'
+        )
+        parser.add_argument(
+            '--weight-unit',
+            choices=[choice for choice, _ in WorkoutImportJob.WEIGHT_UNIT_CHOICES],
+            default='kg',
+            help='Unit of the weights in the file; Hevy exports name it in the header (default: kg)'
+        )
+        parser.add_argument(
+            '--skip-missing',
+            action='store_true',
+            help="Skip exercises that can't be matched instead of creating custom exercises"
+        )
+        parser.add_argument(
+            '--public',
+            action='store_true',
+            help='Make imported workouts public (default: private)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Workouts written per transaction (default: {DEFAULT_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            help='Resume a failed or interrupted import job by id',
+            required=False
+        )
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            job = WorkoutImportJob.objects.select_related('user').filter(id=options['resume']).first()
+            if job is None:
+                self.stdout.write(self.style.ERROR(f'Import job {options["resume"]} not found'))
+                return
+            if job.status == 'completed':
+                self.stdout.write(self.style.WARNING(f'Import job {job.id} already completed'))
+                return
+            self.stdout.write(f'Resuming import job {job.id} after {job.rows_processed} rows')
+        else:
+            if not options['user'] or not options['file']:
+                self.stdout.write(self.style.ERROR('--user and --file are required unless --resume is given'))
+                return
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                self.stdout.write(self.style.ERROR(f'User "{options["user"]}" not found'))
+                return
+            if not os.path.exists(options['file']):
+                self.stdout.write(self.style.ERROR(f'File "{options["file"]}" not found'))
+                return
+
+            job = WorkoutImportJob.objects.create(
+                user=user,
+                source_format=options['format'],
+                file_path=os.path.abspath(options['file']),
+                weight_unit=options['weight_unit'],
+                create_missing=not options['skip_missing'],
+                visibility='public' if options['public'] else 'private',
+            )
+            self.stdout.write(f'Created import job {job.id}')
+
+        def report(job):
+            self.stdout.write(
+                f'  {job.rows_processed} rows: {job.workouts_created} workouts, '
+                f'{job.sets_created} sets, {job.rows_skipped} rows skipped'
+            )
+
+        job = run_import(job, chunk_size=options['chunk_size'], progress=report)
+
+        if job.status == 'failed':
+            self.stdout.write(self.style.ERROR(
+                f'Import failed: {job.error}. Resume with --resume {job.id}'
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. Imported {job.workouts_created} workouts and {job.sets_created} sets '
+            f'({job.rows_skipped} rows skipped).'
+        ))
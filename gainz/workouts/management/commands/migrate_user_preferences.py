@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gainz.workouts.preferences import migrate_legacy_preferences
+
+
+class Command(BaseCommand):
+    help = 'Copy legacy user_prefs:<user id>:<key> Redis keys into the durable preference store'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of keys read and inserted per batch (default: 1000)'
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Delete the legacy keys once they are copied'
+        )
+
+    def handle(self, *args, **options):
+        total = migrate_legacy_preferences(batch_size=max(1, options['batch_size']), delete=options['delete'])
+        if total is None:
+            raise CommandError('Redis is not available; nothing was migrated.')
+        self.stdout.write(self.style.SUCCESS(f'Migrated {total} legacy preference keys.'))
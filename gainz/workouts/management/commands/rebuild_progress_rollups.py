@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from gainz.utils.background_jobs import enqueue_user_job
+from gainz.utils.progress_rollups import rebuild_rollups_for_user
+from gainz.workouts.tasks import rebuild_user_rollups
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily/weekly progress rollup tables from logged sets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Only rebuild rollups for this username',
+            required=False
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Queue one rebuild job per user on the RQ worker instead of rebuilding here'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.ERROR(f'User "{options["user"]}" not found'))
+                return
+
+        if options['enqueue']:
+            queued = inline = 0
+            for user_id in users.values_list('id', flat=True).iterator():
+                job = enqueue_user_job(user_id, rebuild_user_rollups, user_id, dedup_key=f"rebuild_rollups:{user_id}")
+                if job['job_id'] is None:
+                    inline += 1  # No queue available, rebuilt right away
+                elif not job['deduplicated']:
+                    queued += 1
+            self.stdout.write(self.style.SUCCESS(f'Done. {queued} rollup rebuild jobs queued, {inline} users rebuilt inline.'))
+            return
+
+        total_rows = 0
+        for user in users.iterator():
+            rows = rebuild_rollups_for_user(user)
+            total_rows += rows
+            if rows:
+                self.stdout.write(f'Rebuilt {rows} daily rollups for {user.username}')
+
+        self.stdout.write(self.style.SUCCESS(f'Done. {total_rows} daily rollup rows written.'))
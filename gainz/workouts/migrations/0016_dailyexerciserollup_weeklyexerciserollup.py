@@ -0,0 +1,61 @@
+# Generated by Django 4.2.16 on 2026-10-18 04:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('exercises', '0005_auto_20250909_2346'),
+        ('workouts', '0015_exerciseset_is_completed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyExerciseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField()),
+                ('volume', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('warmup_volume', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('set_count', models.PositiveIntegerField(default=0)),
+                ('warmup_set_count', models.PositiveIntegerField(default=0)),
+                ('max_weight', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('top_set_weight', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('top_set_reps', models.PositiveIntegerField(blank=True, null=True)),
+                ('best_e1rm', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_rollups', to='exercises.exercise')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_exercise_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['week_start'],
+                'indexes': [models.Index(fields=['user', 'week_start'], name='workouts_we_user_id_83b576_idx')],
+                'unique_together': {('user', 'exercise', 'week_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyExerciseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('volume', models.DecimalField(decimal_places=2, default=0, help_text='Volume of working (non-warmup) sets', max_digits=14)),
+                ('warmup_volume', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('set_count', models.PositiveIntegerField(default=0, help_text='Number of working sets')),
+                ('warmup_set_count', models.PositiveIntegerField(default=0)),
+                ('max_weight', models.DecimalField(blank=True, decimal_places=2, help_text='Heaviest weight of any set, warmups included', max_digits=6, null=True)),
+                ('top_set_weight', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('top_set_reps', models.PositiveIntegerField(blank=True, null=True)),
+                ('best_e1rm', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='exercises.exercise')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_exercise_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['user', 'date'], name='workouts_da_user_id_b45bab_idx')],
+                'unique_together': {('user', 'exercise', 'date')},
+            },
+        ),
+    ]
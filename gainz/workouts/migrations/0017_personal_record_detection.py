@@ -0,0 +1,76 @@
+# Generated by Django 4.2.16 on 2026-10-18 04:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0005_auto_20250909_2346'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0016_dailyexerciserollup_weeklyexerciserollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseBest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_1rm', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('rep_maxes', models.JSONField(blank=True, default=dict, help_text='Heaviest weight per rep count, e.g. {"5": "100.00"}')),
+                ('best_volume', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('previous_best_volume', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='personalrecord',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='personalrecord',
+            name='exercise_set_source',
+            field=models.ForeignKey(blank=True, help_text='The set that achieved this record; detected records go away with their set', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to='workouts.exerciseset'),
+        ),
+        migrations.AddField(
+            model_name='personalrecord',
+            name='value',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Record value: estimated 1RM, rep-max weight or session volume depending on type', max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='personalrecord',
+            name='date_achieved',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='personalrecord',
+            name='record_type',
+            field=models.CharField(choices=[('1rm', '1 Rep Max'), ('rep_max', 'Rep Max'), ('volume', 'Volume Record'), ('endurance', 'Endurance Record')], default='1rm', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='personalrecord',
+            index=models.Index(fields=['user', 'exercise', 'record_type'], name='workouts_pe_user_id_2b19c0_idx'),
+        ),
+        migrations.AddField(
+            model_name='exercisebest',
+            name='best_volume_source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='workouts.workoutexercise'),
+        ),
+        migrations.AddField(
+            model_name='exercisebest',
+            name='exercise',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_bests', to='exercises.exercise'),
+        ),
+        migrations.AddField(
+            model_name='exercisebest',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_bests', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='exercisebest',
+            unique_together={('user', 'exercise')},
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-18 04:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0017_personal_record_detection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_format', models.CharField(choices=[('csv', 'Generic CSV'), ('strong', 'Strong'), ('hevy', 'Hevy')], default='csv', max_length=10)),
+                ('file', models.FileField(blank=True, null=True, upload_to='imports/%Y/%m/')),
+                ('file_path', models.CharField(blank=True, help_text='Local path for imports started from the command line', max_length=500)),
+                ('weight_unit', models.CharField(choices=[('kg', 'Kilograms'), ('lbs', 'Pounds')], default='kg', max_length=3)),
+                ('create_missing', models.BooleanField(default=True, help_text="Create custom exercises for names that can't be matched")),
+                ('visibility', models.CharField(choices=[('public', 'Public'), ('private', 'Private')], default='private', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('workouts_created', models.PositiveIntegerField(default=0)),
+                ('sets_created', models.PositiveIntegerField(default=0)),
+                ('rows_skipped', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workout_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0018_workoutimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workout',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workout',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0019_workout_social_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', '-date', '-id'], name='workouts_wo_user_id_1a8fa2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['visibility', '-date', '-id'], name='workouts_wo_visibil_9474ae_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0020_workout_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SetOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Client-generated idempotency key', max_length=64)),
+                ('operation', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=10)),
+                ('exercise_set_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('result', models.JSONField(default=dict, help_text='Response returned for the operation, replayed on retries')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='set_operations', to=settings.AUTH_USER_MODEL)),
+                ('workout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='set_operations', to='workouts.workout')),
+            ],
+            options={
+                'unique_together': {('user', 'key')},
+            },
+        ),
+    ]
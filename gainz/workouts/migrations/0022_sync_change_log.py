@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('workouts', '0021_set_operations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seq', models.PositiveBigIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveBigIntegerField()),
+                ('model', models.CharField(choices=[('workout', 'Workout'), ('workout_exercise', 'Workout Exercise'), ('exercise_set', 'Exercise Set')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('workout_id', models.PositiveBigIntegerField(help_text='Workout the object belongs to')),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'seq'], name='workouts_sy_user_id_16317a_idx')],
+                'unique_together': {('user', 'model', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.16 on 2026-10-18 05:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0023_user_preference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgramSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0, help_text='Sequential programs: index of the next routine in program order')),
+                ('last_workout_date', models.DateField(blank=True, null=True)),
+                ('sessions', models.JSONField(blank=True, default=list, help_text='Upcoming sessions, next first')),
+                ('materialized_on', models.DateField(blank=True, help_text='Day the sessions were built for; null when stale', null=True)),
+                ('last_program_routine', models.ForeignKey(blank=True, help_text='Session of the program the user did last', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='workouts.programroutine')),
+                ('program', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='workouts.program')),
+            ],
+        ),
+    ]
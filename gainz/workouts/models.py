@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 from gainz.exercises.models import Exercise
 from decimal import Decimal
 import math
@@ -59,6 +60,29 @@ class ProgramRoutine(models.Model):
         day_str = f" (Day: {self.get_assigned_day_display()})" if self.assigned_day is not None else ""
         return f"{self.program.name} - {self.routine.name} (Order: {self.order}){day_str}"
 
+class ProgramSchedule(models.Model):
+    """
+    A program's upcoming sessions, materialized, and the cursor of where the
+    user is in it (see workouts/schedule.py). Rebuilt when the program's
+    layout changes or the day rolls over.
+    """
+    program = models.OneToOneField(Program, on_delete=models.CASCADE, related_name='schedule')
+    position = models.PositiveIntegerField(default=0, help_text="Sequential programs: index of the next routine in program order")
+    last_program_routine = models.ForeignKey(
+        ProgramRoutine,
+        related_name='+',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        help_text="Session of the program the user did last"
+    )
+    last_workout_date = models.DateField(null=True, blank=True)
+    sessions = models.JSONField(default=list, blank=True, help_text="Upcoming sessions, next first")
+    materialized_on = models.DateField(null=True, blank=True, help_text="Day the sessions were built for; null when stale")
+
+    def __str__(self):
+        return f"Schedule for program: {self.program.name}"
+
 class Routine(models.Model):
     """ Represents a specific reusable workout structure (template). """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -136,6 +160,18 @@ class Workout(models.Model):
         default='public',
         help_text="Who can see this workout"
     )
+    # Denormalized counters, updated with F() expressions by the social API
+    # views; `manage.py reconcile_social_counters` repairs any drift
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Keyset pagination walks (date, id) newest first: per user for the
+        # workout list and API, per visibility for the database feed fallback
+        indexes = [
+            models.Index(fields=['user', '-date', '-id']),
+            models.Index(fields=['visibility', '-date', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.date.strftime('%Y-%m-%d')}"
@@ -152,11 +188,11 @@ class Workout(models.Model):
     
     def get_like_count(self):
         """Get total number of likes for this workout"""
-        return self.likes.count() if hasattr(self, 'likes') else 0
+        return self.like_count
     
     def get_comment_count(self):
         """Get total number of comments for this workout"""
-        return self.comments.count() if hasattr(self, 'comments') else 0
+        return self.comment_count
     
     def is_liked_by(self, user):
         """Check if user has liked this workout"""
@@ -309,6 +345,160 @@ class ExerciseSet(models.Model):
         """Calculate volume (sets × reps × weight) for this set"""
         return self.reps * self.weight
 
+# -- Progress Rollup Models --
+
+class DailyExerciseRollup(models.Model):
+    """ Per-day training totals for one user and exercise, kept in sync with ExerciseSet changes. """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_exercise_rollups')
+    exercise = models.ForeignKey('exercises.Exercise', on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+
+    volume = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Volume of working (non-warmup) sets")
+    warmup_volume = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    set_count = models.PositiveIntegerField(default=0, help_text="Number of working sets")
+    warmup_set_count = models.PositiveIntegerField(default=0)
+    max_weight = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, help_text="Heaviest weight of any set, warmups included")
+    top_set_weight = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    top_set_reps = models.PositiveIntegerField(null=True, blank=True)
+    best_e1rm = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        unique_together = ('user', 'exercise', 'date')
+        indexes = [models.Index(fields=['user', 'date'])]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.user} - {self.exercise.name} ({self.date})"
+
+class WeeklyExerciseRollup(models.Model):
+    """ Per-week (Monday-based) totals for one user and exercise, derived from the daily rollups. """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='weekly_exercise_rollups')
+    exercise = models.ForeignKey('exercises.Exercise', on_delete=models.CASCADE, related_name='weekly_rollups')
+    week_start = models.DateField()
+
+    volume = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    warmup_volume = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    set_count = models.PositiveIntegerField(default=0)
+    warmup_set_count = models.PositiveIntegerField(default=0)
+    max_weight = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    top_set_weight = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    top_set_reps = models.PositiveIntegerField(null=True, blank=True)
+    best_e1rm = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        unique_together = ('user', 'exercise', 'week_start')
+        indexes = [models.Index(fields=['user', 'week_start'])]
+        ordering = ['week_start']
+
+    def __str__(self):
+        return f"{self.user} - {self.exercise.name} (week of {self.week_start})"
+
+# -- Import Models --
+
+class WorkoutImportJob(models.Model):
+    """ A bulk import of workout history from a CSV export, checkpointed so it can resume after a failure. """
+    FORMAT_CHOICES = [
+        ('csv', 'Generic CSV'),
+        ('strong', 'Strong'),
+        ('hevy', 'Hevy'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    WEIGHT_UNIT_CHOICES = [
+        ('kg', 'Kilograms'),
+        ('lbs', 'Pounds'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='workout_imports')
+    source_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    file = models.FileField(upload_to='imports/%Y/%m/', null=True, blank=True)
+    file_path = models.CharField(max_length=500, blank=True, help_text="Local path for imports started from the command line")
+    weight_unit = models.CharField(max_length=3, choices=WEIGHT_UNIT_CHOICES, default='kg')
+    create_missing = models.BooleanField(default=True, help_text="Create custom exercises for names that can't be matched")
+    visibility = models.CharField(max_length=10, choices=Workout.VISIBILITY_CHOICES, default='private')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Checkpoint: CSV rows whose workouts are committed; a resumed import skips them
+    rows_processed = models.PositiveIntegerField(default=0)
+    workouts_created = models.PositiveIntegerField(default=0)
+    sets_created = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user} - {self.get_source_format_display()} import ({self.status})"
+
+# -- Set Sync Models --
+
+class SetOperation(models.Model):
+    """ An applied set create/update/delete from the batch endpoint, keyed by the client's idempotency key. """
+    OPERATION_CHOICES = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='set_operations')
+    key = models.CharField(max_length=64, help_text="Client-generated idempotency key")
+    workout = models.ForeignKey(Workout, on_delete=models.CASCADE, related_name='set_operations')
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    # Plain id rather than a foreign key: the set may since have been deleted
+    exercise_set_id = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(default=dict, help_text="Response returned for the operation, replayed on retries")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user} - {self.operation} {self.key}"
+
+class SyncState(models.Model):
+    """ Per-user change sequence for offline sync; the row lock orders a user's changes. """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sync_state')
+    last_seq = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - seq {self.last_seq}"
+
+class SyncChange(models.Model):
+    """
+    Latest change to one workout, workout exercise or set of a user. There is one
+    row per object (older changes are replaced), so `seq` is also the object's
+    version and reading changes since a cursor returns each object once.
+    """
+    MODEL_CHOICES = [
+        ('workout', 'Workout'),
+        ('workout_exercise', 'Workout Exercise'),
+        ('exercise_set', 'Exercise Set'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sync_changes')
+    seq = models.PositiveBigIntegerField()
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    workout_id = models.PositiveBigIntegerField(help_text="Workout the object belongs to")
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'model', 'object_id')
+        indexes = [models.Index(fields=['user', 'seq'])]
+
+    def __str__(self):
+        return f"{self.user} - {self.model} {self.object_id} @{self.seq}"
+
 # -- Timer Preference Models --
 
 class UserTimerPreference(models.Model):
@@ -351,6 +541,21 @@ class UserTimerPreference(models.Model):
     def __str__(self):
         return f"Timer preferences for {self.user.username}"
 
+class UserPreference(models.Model):
+    """ A UI preference of a user (e.g. routineForm.showRPE); the durable copy of their Redis preference hash """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='preferences')
+    key = models.CharField(max_length=100)
+    value = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "User Preference"
+        verbose_name_plural = "User Preferences"
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.key}={self.value}"
+
 class ExerciseTimerOverride(models.Model):
     """ User-specific timer overrides for individual exercises """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='exercise_timer_overrides')
@@ -369,6 +574,7 @@ class PersonalRecord(models.Model):
     """ Tracks personal records for exercises with optional video proof """
     RECORD_TYPE_CHOICES = [
         ('1rm', '1 Rep Max'),
+        ('rep_max', 'Rep Max'),
         ('volume', 'Volume Record'),
         ('endurance', 'Endurance Record'),
     ]
@@ -380,9 +586,16 @@ class PersonalRecord(models.Model):
     # Core record data
     weight = models.DecimalField(max_digits=6, decimal_places=2, help_text="Weight used for the record")
     reps = models.PositiveIntegerField(help_text="Reps achieved for the record")
+    value = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Record value: estimated 1RM, rep-max weight or session volume depending on type"
+    )
     
     # Metadata
-    date_achieved = models.DateTimeField(auto_now_add=True)
+    date_achieved = models.DateTimeField(default=timezone.now)
     workout_exercise_source = models.ForeignKey(
         WorkoutExercise,
         on_delete=models.SET_NULL,
@@ -391,6 +604,14 @@ class PersonalRecord(models.Model):
         related_name='personal_records_achieved',
         help_text="The workout exercise that achieved this record"
     )
+    exercise_set_source = models.ForeignKey(
+        ExerciseSet,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='personal_records',
+        help_text="The set that achieved this record; detected records go away with their set"
+    )
     
     # Optional video upload
     video = models.FileField(
@@ -405,7 +626,7 @@ class PersonalRecord(models.Model):
     class Meta:
         verbose_name = "Personal Record"
         verbose_name_plural = "Personal Records"
-        unique_together = ('user', 'exercise', 'record_type')
+        indexes = [models.Index(fields=['user', 'exercise', 'record_type'])]
         ordering = ['-date_achieved']
         
     def __str__(self):
@@ -418,6 +639,35 @@ class PersonalRecord(models.Model):
         # Brzycki formula: 1RM = weight / (1.0278 - 0.0278 × reps)
         return self.weight / (1.0278 - 0.0278 * self.reps)
 
+class ExerciseBest(models.Model):
+    """ Current all-time bests per user and exercise, used to check new sets for PRs without rescanning history. """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='exercise_bests')
+    exercise = models.ForeignKey('exercises.Exercise', on_delete=models.CASCADE, related_name='user_bests')
+
+    best_1rm = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    rep_maxes = models.JSONField(default=dict, blank=True, help_text="Heaviest weight per rep count, e.g. {\"5\": \"100.00\"}")
+
+    # Volume is compared per session, so the index remembers which session holds
+    # the best and what the best was before it, to keep sets of the same
+    # session from beating each other.
+    best_volume = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    best_volume_source = models.ForeignKey(
+        WorkoutExercise,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    previous_best_volume = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'exercise')
+
+    def __str__(self):
+        return f"{self.user} - {self.exercise.name} bests"
+
 class ProgramTimerPreference(models.Model):
     """ Program-specific timer preferences for the highest level of timer customization """
     program = models.OneToOneField(Program, on_delete=models.CASCADE, related_name='timer_preferences')
@@ -447,3 +697,178 @@ class RoutineTimerPreference(models.Model):
 
     def __str__(self):
         return f"Timer preferences for routine: {self.routine.name}"
+
+
+# Signals keeping the rollups, charts and personal records derived from logged
+# sets current; the work is queued and done once per transaction (see
+# utils/set_upkeep.py)
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+def _cascaded_from(kwargs, *models):
+    """True when a delete signal was caused by deleting a user or one of `models` (instance or queryset)."""
+    from django.contrib.auth import get_user_model
+    origin = kwargs.get('origin')
+    models = models + (get_user_model(),)
+    return any(isinstance(origin, model) or getattr(origin, 'model', None) is model for model in models)
+
+@receiver(pre_save, sender=ExerciseSet)
+def remember_previous_set_values(sender, instance, **kwargs):
+    """Keep the stored weight/reps/completion so edits that don't touch them skip the upkeep"""
+    instance._previous_values = None
+    if instance.pk:
+        instance._previous_values = ExerciseSet.objects.filter(pk=instance.pk).values_list(
+            'weight', 'reps', 'is_warmup', 'is_completed'
+        ).first()
+
+@receiver(post_save, sender=ExerciseSet)
+def queue_upkeep_for_saved_set(sender, instance, created, **kwargs):
+    """Refresh the set's rollup and charts; check new and newly completed sets for PRs, re-check the exercise when a logged set changes"""
+    from gainz.utils.set_upkeep import queue_saved_set
+    queue_saved_set(instance, created, getattr(instance, '_previous_values', None))
+
+@receiver(post_delete, sender=ExerciseSet)
+def queue_upkeep_for_deleted_set(sender, instance, **kwargs):
+    """Re-evaluate the exercise once the deleted set is gone; deleting its exercise or workout covers it"""
+    if _cascaded_from(kwargs, Workout, WorkoutExercise):
+        return
+    from gainz.utils.set_upkeep import queue_deleted_set
+    queue_deleted_set(instance)
+
+@receiver(post_delete, sender=WorkoutExercise)
+def queue_upkeep_for_deleted_workout_exercise(sender, instance, **kwargs):
+    """Refresh the exercise's rollup and records once for all of its sets"""
+    if _cascaded_from(kwargs, Workout):
+        return
+    row = Workout.objects.filter(pk=instance.workout_id).values_list('user_id', 'date').first()
+    if row is None:
+        return
+    from gainz.utils.set_upkeep import queue_exercises_upkeep
+    queue_exercises_upkeep(row[0], row[1], [instance.exercise_id])
+
+@receiver(pre_delete, sender=Workout)
+def queue_upkeep_for_deleted_workout(sender, instance, **kwargs):
+    """Refresh the rollups and records of the workout's exercises once for all of its sets"""
+    if _cascaded_from(kwargs):
+        return
+    from gainz.utils.set_upkeep import queue_exercises_upkeep
+    queue_exercises_upkeep(instance.user_id, instance.date, instance.exercises.values_list('exercise_id', flat=True))
+
+@receiver(pre_save, sender=Workout)
+def remember_previous_workout_date(sender, instance, **kwargs):
+    """Keep the stored date around so a moved workout can refresh both days"""
+    instance._previous_date = None
+    if instance.pk:
+        instance._previous_date = Workout.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+
+@receiver(post_save, sender=Workout)
+def refresh_rollups_for_moved_workout(sender, instance, created, **kwargs):
+    """Move a workout's sets to their new day in the rollups when its date changes (on the job queue)"""
+    previous_date = getattr(instance, '_previous_date', None)
+    if created or previous_date is None or previous_date == instance.date:
+        return
+    from gainz.utils.background_jobs import enqueue_user_job
+    from gainz.workouts.tasks import refresh_moved_workout_rollups
+    transaction.on_commit(lambda: enqueue_user_job(
+        instance.user_id, refresh_moved_workout_rollups, instance.id, previous_date.isoformat(),
+    ))
+
+# Signals logging changes for offline sync clients (see workouts/sync.py)
+@receiver(post_save, sender=Workout)
+@receiver(post_delete, sender=Workout)
+def record_workout_sync_change(sender, instance, signal, **kwargs):
+    """Log a saved or deleted workout"""
+    if _cascaded_from(kwargs):
+        return
+    from gainz.workouts.sync import WORKOUT, record_changes
+    record_changes(instance.user_id, WORKOUT, [(instance.id, instance.id)], deleted=signal is post_delete)
+
+@receiver(post_save, sender=WorkoutExercise)
+@receiver(post_delete, sender=WorkoutExercise)
+def record_workout_exercise_sync_change(sender, instance, signal, **kwargs):
+    """Log a saved or deleted workout exercise; deleting its workout logs only the workout"""
+    if _cascaded_from(kwargs, Workout):
+        return
+    user_id = Workout.objects.filter(pk=instance.workout_id).values_list('user_id', flat=True).first()
+    if user_id is None:
+        return
+    from gainz.workouts.sync import WORKOUT_EXERCISE, record_changes
+    record_changes(user_id, WORKOUT_EXERCISE, [(instance.id, instance.workout_id)], deleted=signal is post_delete)
+
+@receiver(post_save, sender=ExerciseSet)
+@receiver(post_delete, sender=ExerciseSet)
+def record_exercise_set_sync_change(sender, instance, signal, **kwargs):
+    """Log a saved or deleted set; deleting its exercise or workout logs only that parent"""
+    if _cascaded_from(kwargs, Workout, WorkoutExercise):
+        return
+    from gainz.utils.set_upkeep import set_context
+    context = set_context(instance)
+    if context is None:
+        return
+    from gainz.workouts.sync import EXERCISE_SET, record_changes
+    record_changes(context.user_id, EXERCISE_SET, [(instance.id, context.workout_id)], deleted=signal is post_delete)
+
+# Signals expiring cached rest timer settings (see workouts/timers.py)
+@receiver(post_save, sender=UserTimerPreference)
+@receiver(post_delete, sender=UserTimerPreference)
+@receiver(post_save, sender=ExerciseTimerOverride)
+@receiver(post_delete, sender=ExerciseTimerOverride)
+def invalidate_timer_settings_for_user_prefs(sender, instance, **kwargs):
+    """Expire the user's timer profiles when their defaults or an override change"""
+    from gainz.workouts.timers import invalidate_timer_settings
+    invalidate_timer_settings(instance.user_id)
+
+@receiver(post_save, sender=ProgramTimerPreference)
+@receiver(post_delete, sender=ProgramTimerPreference)
+@receiver(post_save, sender=RoutineTimerPreference)
+@receiver(post_delete, sender=RoutineTimerPreference)
+def invalidate_timer_settings_for_plan_prefs(sender, instance, **kwargs):
+    """Expire the owner's timer profiles when a program or routine timer setting changes"""
+    if sender is ProgramTimerPreference:
+        user_id = Program.objects.filter(pk=instance.program_id).values_list('user_id', flat=True).first()
+    else:
+        user_id = Routine.objects.filter(pk=instance.routine_id).values_list('user_id', flat=True).first()
+    if user_id is None:
+        return
+    from gainz.workouts.timers import invalidate_timer_settings
+    invalidate_timer_settings(user_id)
+
+# Signals keeping program schedules current (see workouts/schedule.py)
+@receiver(post_save, sender=Workout)
+def advance_program_schedule(sender, instance, created, **kwargs):
+    """A new workout from a routine of the active program moves its schedule on"""
+    if not created or not instance.routine_source_id:
+        return
+    from gainz.workouts.schedule import advance_for_workout
+    transaction.on_commit(lambda: advance_for_workout(instance.user_id, instance.routine_source_id, instance.date))
+
+@receiver(post_save, sender=Program)
+def mark_schedule_stale_for_program(sender, instance, **kwargs):
+    """The scheduling type may have changed"""
+    from gainz.workouts.schedule import mark_stale
+    mark_stale([instance.id])
+
+@receiver(pre_delete, sender=ProgramRoutine)
+def release_schedule_cursor_for_program_routine(sender, instance, **kwargs):
+    """The cursor follows the last program routine done; keep its place when that row goes"""
+    if _cascaded_from(kwargs, Program):
+        return
+    from gainz.workouts.schedule import release_program_routine
+    release_program_routine(instance)
+
+@receiver(post_save, sender=ProgramRoutine)
+@receiver(post_delete, sender=ProgramRoutine)
+def mark_schedule_stale_for_program_routine(sender, instance, **kwargs):
+    """Rebuild the program's sessions after its routines or their days change"""
+    if _cascaded_from(kwargs, Program):
+        return
+    from gainz.workouts.schedule import mark_stale
+    mark_stale([instance.program_id])
+
+@receiver(post_save, sender=Routine)
+def mark_schedule_stale_for_routine(sender, instance, created, **kwargs):
+    """Sessions carry the routine name"""
+    if created:
+        return
+    from gainz.workouts.schedule import mark_stale
+    mark_stale(ProgramRoutine.objects.filter(routine=instance).values('program_id'))
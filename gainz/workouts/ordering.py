@@ -0,0 +1,248 @@
+"""
+Workout Exercise Ordering
+
+Sparse order keys for the exercises of a workout. Each exercise type owns a
+band of keys (primary first, then secondary, then accessory), so ordering by
+`order` keeps the type hierarchy, and exercises within a band are spaced
+ORDER_GAP apart:
+
+    primary      1024, 2048, 3072, ...
+    secondary    BAND_SIZE + 1024, ...
+    accessory    2 * BAND_SIZE + 1024, ...
+
+Inserting or moving an exercise gives it a key between its new neighbours,
+so only that row is written. When two neighbours run out of room the
+workout is rebalanced (keys spread out again in the current order, one bulk
+update); a background rebalance is scheduled as soon as a gap gets tight, so
+the inline one is rare. Workouts with keys outside their bands (created by
+importers as 0, 1, 2, ... or whose exercise type changed) are rebalanced the
+first time they are edited.
+
+Deleting an exercise just leaves a wider gap.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+from django.db import transaction
+
+from gainz.workouts.models import Workout, WorkoutExercise
+from gainz.workouts.set_batch import lock_workout
+
+TYPE_BANDS = {'primary': 0, 'secondary': 1, 'accessory': 2}
+DEFAULT_BAND = TYPE_BANDS['accessory']  # Untyped exercises sort with accessories
+BAND_SIZE = 1 << 24
+ORDER_GAP = 1 << 10
+MIN_GAP = 4  # Schedule a rebalance once an insert leaves a gap this small
+
+
+def band_for(exercise_type: Optional[str]) -> int:
+    return TYPE_BANDS.get(exercise_type, DEFAULT_BAND)
+
+
+def band_range(band: int) -> range:
+    """Keys usable by a band; its first and last keys are left free as sentinels."""
+    return range(band * BAND_SIZE + 1, (band + 1) * BAND_SIZE)
+
+
+def _in_band(workout_exercise: WorkoutExercise) -> bool:
+    return workout_exercise.order in band_range(band_for(workout_exercise.get_exercise_type()))
+
+
+def _key_between(low: int, high: int) -> Optional[int]:
+    """A key strictly between two keys, preferring ORDER_GAP after `low`; None if there is no room."""
+    if high - low < 2:
+        return None
+    return low + ORDER_GAP if high - low > 2 * ORDER_GAP else (low + high) // 2
+
+
+def _load(workout_id: int) -> List[WorkoutExercise]:
+    return list(WorkoutExercise.objects.filter(workout_id=workout_id).select_related('exercise').order_by('order', 'id'))
+
+
+def _by_band(workout_exercises: Sequence[WorkoutExercise]) -> Dict[int, List[WorkoutExercise]]:
+    bands: Dict[int, List[WorkoutExercise]] = {band: [] for band in sorted(set(TYPE_BANDS.values()))}
+    for workout_exercise in workout_exercises:
+        bands[band_for(workout_exercise.get_exercise_type())].append(workout_exercise)
+    return bands
+
+
+def rebalance(workout_exercises: Sequence[WorkoutExercise]) -> int:
+    """
+    Respace keys of a workout's exercises (given in the desired order within
+    each type) and save the rows whose key changed. Returns that row count.
+    """
+    changed = []
+    for band, members in _by_band(workout_exercises).items():
+        start = band_range(band).start - 1
+        for index, workout_exercise in enumerate(members, start=1):
+            key = start + index * ORDER_GAP
+            if workout_exercise.order != key:
+                workout_exercise.order = key
+                changed.append(workout_exercise)
+    WorkoutExercise.objects.bulk_update(changed, ['order'], batch_size=500)
+    return len(changed)
+
+
+def rebalance_workout(workout_id: int, user_id: int) -> Dict[str, int]:
+    """Respace one workout's order keys, keeping the current order (background job)."""
+    with transaction.atomic():
+        # Under the workout row lock, like every other key writer, so no insert or move interleaves
+        try:
+            lock_workout(workout_id, user_id)
+        except Workout.DoesNotExist:
+            return {'workout_id': workout_id, 'rows': 0}
+        rows = rebalance(_load(workout_id))
+    return {'workout_id': workout_id, 'rows': rows}
+
+
+def _schedule_rebalance(workout_id: int, user_id: int) -> None:
+    from gainz.utils.background_jobs import enqueue_user_job
+
+    transaction.on_commit(lambda: enqueue_user_job(
+        user_id, rebalance_workout, workout_id, user_id, dedup_key=f"rebalance_order:{workout_id}", retries=1
+    ))
+
+
+class _Ordering:
+    """The exercises of one workout grouped by band, in key order."""
+
+    def __init__(self, workout, exclude_id: Optional[int] = None):
+        self.workout = workout
+        workout_exercises = [ex for ex in _load(workout.id) if ex.id != exclude_id]
+        if not all(_in_band(workout_exercise) for workout_exercise in workout_exercises):
+            rebalance(workout_exercises)
+        self.bands = _by_band(workout_exercises)
+        self.tight = False
+
+    def key_at(self, band: int, position: int) -> int:
+        """A key for a new item at `position` of a band, rebalancing inline if it has no room."""
+        members = self.bands[band]
+        keys = band_range(band)
+        low = members[position - 1].order if position > 0 else keys.start - 1
+        high = members[position].order if position < len(members) else keys.stop
+        key = _key_between(low, high)
+        if key is None:
+            rebalance([workout_exercise for members in self.bands.values() for workout_exercise in members])
+            return self.key_at(band, position)
+        self.tight = self.tight or min(key - low, high - key) < MIN_GAP
+        return key
+
+    def finish(self) -> None:
+        if self.tight:
+            _schedule_rebalance(self.workout.id, self.workout.user_id)
+
+
+def insert_order_key(workout, exercise_type: Optional[str], current_exercise_id=None) -> int:
+    """
+    Order key for a new exercise of `exercise_type`, placed relative to the
+    exercise the user is looking at:
+
+    - same type as the current exercise: right after it
+    - higher priority type: last of its type
+    - lower priority type: first of its type
+    - no (known) current exercise: last of its type
+
+    Call inside a transaction holding the workout row lock.
+    """
+    ordering = _Ordering(workout)
+    band = band_for(exercise_type)
+    members = ordering.bands[band]
+
+    position = len(members)
+    current = None
+    if current_exercise_id:
+        current = next((ex for members_ in ordering.bands.values() for ex in members_
+                        if str(ex.id) == str(current_exercise_id)), None)
+    if current is not None:
+        current_band = band_for(current.get_exercise_type())
+        if current_band == band:
+            position = members.index(current) + 1
+        elif current_band < band:
+            position = 0
+
+    key = ordering.key_at(band, position)
+    ordering.finish()
+    return key
+
+
+def _longest_increasing_run(keys: Sequence[int]) -> set:
+    """Indexes of a longest strictly increasing subsequence of keys (the rows that can stay put)."""
+    tails: List[int] = []  # Index of the smallest tail of each subsequence length
+    previous: List[Optional[int]] = []
+    for index, key in enumerate(keys):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if keys[tails[middle]] < key:
+                low = middle + 1
+            else:
+                high = middle
+        previous.append(tails[low - 1] if low else None)
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+
+    kept = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        kept.add(index)
+        index = previous[index]
+    return kept
+
+
+def reorder_exercises(workout, exercise_ids: Sequence[int]) -> int:
+    """
+    Put the given exercises of a workout in the given order (within their
+    type), rekeying as few rows as possible: a drag and drop rewrites one row.
+    Exercises not listed keep their place. Returns the number of rows written.
+
+    Call inside a transaction holding the workout row lock.
+    """
+    ordering = _Ordering(workout)
+    by_id = {ex.id: ex for members in ordering.bands.values() for ex in members}
+    listed = [by_id[exercise_id] for exercise_id in dict.fromkeys(exercise_ids) if exercise_id in by_id]
+
+    written = []
+    for band, members in ordering.bands.items():
+        moving = [ex for ex in listed if band_for(ex.get_exercise_type()) == band]
+        if len(moving) < 2:
+            continue
+        # The listed exercises take over the band positions they occupied, in their new order
+        slots = sorted(members.index(ex) for ex in moving)
+        for slot, workout_exercise in zip(slots, moving):
+            members[slot] = workout_exercise
+
+        kept = _longest_increasing_run([ex.order for ex in members])
+        for position, workout_exercise in enumerate(members):
+            if position in kept:
+                continue
+            # Key it between the previous row (already final) and the next row that stays put
+            following = next((members[i].order for i in range(position + 1, len(members)) if i in kept),
+                             band_range(band).stop)
+            low = members[position - 1].order if position else band_range(band).start - 1
+            key = _key_between(low, following)
+            if key is None:
+                # Out of room: respace the whole workout in the new order instead
+                rows = rebalance([ex for members_ in ordering.bands.values() for ex in members_])
+                WorkoutExercise.objects.bulk_update(written, ['order'])
+                return rows + len(written)
+            ordering.tight = ordering.tight or min(key - low, following - key) < MIN_GAP
+            workout_exercise.order = key
+            written.append(workout_exercise)
+
+    WorkoutExercise.objects.bulk_update(written, ['order'])
+    ordering.finish()
+    return len(written)
+
+
+def move_to_type_band(workout_exercise: WorkoutExercise) -> bool:
+    """After an exercise's type changed, move it to the end of its new type. Returns whether it moved."""
+    if _in_band(workout_exercise):
+        return False
+    ordering = _Ordering(workout_exercise.workout, exclude_id=workout_exercise.id)
+    band = band_for(workout_exercise.get_exercise_type())
+    workout_exercise.order = ordering.key_at(band, len(ordering.bands[band]))
+    workout_exercise.save(update_fields=['order'])
+    ordering.finish()
+    return True
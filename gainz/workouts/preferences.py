@@ -0,0 +1,185 @@
+"""
+User Preference Store
+
+UI preferences (routine form column toggles and the like) are small string
+values keyed by a dotted name such as `routineForm.showRPE`. Each user's
+preferences live in one Redis hash, `user_prefs:{user_id}`, so reading all
+of them is a single HGETALL, and the result is memoized on the request.
+UserPreference rows are the durable copy: writes go to the database first
+and then to the hash.
+
+A sentinel field marks a hash as loaded; a hash without it (new user,
+evicted or lost in a Redis restart, or only partly written) is reloaded
+from the database on the next read. Reloads use HSETNX so they never undo a
+write that landed in between. When Redis is unavailable reads go to the
+database and writes still succeed.
+
+Preferences stored as plain `user_prefs:{user_id}:{key}` strings before
+this store existed are copied over by `manage.py migrate_user_preferences`.
+"""
+
+from typing import Dict, Optional
+
+from django.contrib.auth import get_user_model
+
+from gainz.utils.redis_store import get_redis_connection
+
+from .models import UserPreference
+
+PREFERENCES_TTL_SECONDS = 60 * 60 * 24 * 30  # Idle hashes expire; the database keeps the values
+SENTINEL = '__loaded__'
+REQUEST_CACHE_ATTR = '_user_preferences'
+
+# Preferences the routine form reads: context name -> (preference key, default)
+ROUTINE_FORM_PREFERENCES = {
+    'show_rpe': ('routineForm.showRPE', False),
+    'show_rest_time': ('routineForm.showRestTime', False),
+    'show_notes': ('routineForm.showNotes', False),
+}
+
+
+def preferences_key(user_id: int) -> str:
+    return f"user_prefs:{user_id}"
+
+
+def _decode(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def encode_value(value) -> str:
+    """Store booleans as "true"/"false" (as the routine form reads them) and everything else as str."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _load_from_database(user_id: int) -> Dict[str, str]:
+    return dict(UserPreference.objects.filter(user_id=user_id).values_list('key', 'value'))
+
+
+def _fill_hash(redis_conn, user_id: int, preferences: Dict[str, str]) -> None:
+    """Copy database values into the hash without overwriting fields written since."""
+    key = preferences_key(user_id)
+    pipe = redis_conn.pipeline()
+    for name, value in preferences.items():
+        pipe.hsetnx(key, name, value)
+    pipe.hset(key, SENTINEL, '1')
+    pipe.expire(key, PREFERENCES_TTL_SECONDS)
+    pipe.execute()
+
+
+def load_user_preferences(user_id: int) -> Dict[str, str]:
+    """All of a user's preferences: one HGETALL, or the database when the hash isn't loaded."""
+    redis_conn = get_redis_connection()
+    if redis_conn is not None:
+        try:
+            stored = redis_conn.hgetall(preferences_key(user_id))
+            preferences = {_decode(name): _decode(value) for name, value in stored.items()}
+            if preferences.pop(SENTINEL, None) is not None:
+                return preferences
+        except Exception as e:
+            print(f"Could not read preferences from Redis: {e}")
+            redis_conn = None
+
+    preferences = _load_from_database(user_id)
+    if redis_conn is not None:
+        try:
+            _fill_hash(redis_conn, user_id, preferences)
+        except Exception as e:
+            print(f"Could not cache preferences in Redis: {e}")
+    return preferences
+
+
+def get_user_preferences(request) -> Dict[str, str]:
+    """The requesting user's preferences, read once per request."""
+    preferences = getattr(request, REQUEST_CACHE_ATTR, None)
+    if preferences is None:
+        preferences = load_user_preferences(request.user.id)
+        setattr(request, REQUEST_CACHE_ATTR, preferences)
+    return preferences
+
+
+def get_bool_preferences(request, definitions: Dict) -> Dict[str, bool]:
+    """Boolean preferences by context name, from {name: (preference key, default)} definitions."""
+    preferences = get_user_preferences(request)
+    flags = {}
+    for name, (key, default) in definitions.items():
+        value = preferences.get(key)
+        flags[name] = default if value is None else value.lower() == 'true'
+    return flags
+
+
+def set_user_preference(user_id: int, key: str, value, request=None) -> str:
+    """
+    Save a preference to the database, then to the user's hash if Redis is
+    reachable. Returns the stored string. Pass the request to keep its
+    memoized preferences current.
+    """
+    value = encode_value(value)
+    UserPreference.objects.update_or_create(user_id=user_id, key=key, defaults={'value': value})
+
+    redis_conn = get_redis_connection()
+    if redis_conn is not None:
+        try:
+            pipe = redis_conn.pipeline()
+            pipe.hset(preferences_key(user_id), key, value)
+            pipe.expire(preferences_key(user_id), PREFERENCES_TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            print(f"Could not write preference to Redis: {e}")
+
+    cached = getattr(request, REQUEST_CACHE_ATTR, None) if request is not None else None
+    if cached is not None:
+        cached[key] = value
+    return value
+
+
+def migrate_legacy_preferences(batch_size: int = 1000, delete: bool = False, redis_conn=None) -> Optional[int]:
+    """
+    Copy `user_prefs:{user_id}:{key}` string keys into UserPreference rows in
+    batches (SCAN, then one MGET and one bulk insert per batch). Values already
+    in the database win. The hashes of migrated users are dropped so they
+    reload with the copied values. Returns the number of keys read, or None
+    when Redis is unavailable.
+    """
+    redis_conn = redis_conn or get_redis_connection()
+    if redis_conn is None:
+        return None
+
+    total = 0
+    batch = []
+
+    def flush():
+        nonlocal total
+        values = redis_conn.mget(batch)
+        rows = []
+        user_ids = set()
+        for raw_key, value in zip(batch, values):
+            if value is None:
+                continue  # Expired or deleted since the scan
+            _, user_id, key = _decode(raw_key).split(':', 2)
+            if not user_id.isdigit():
+                continue
+            rows.append(UserPreference(user_id=int(user_id), key=key[:100], value=_decode(value)[:255]))
+            user_ids.add(int(user_id))
+        # Keys of deleted users would fail the foreign key
+        existing = set(get_user_model().objects.filter(id__in=user_ids).values_list('id', flat=True))
+        UserPreference.objects.bulk_create(
+            [row for row in rows if row.user_id in existing], ignore_conflicts=True, batch_size=batch_size,
+        )
+        pipe = redis_conn.pipeline(transaction=False)
+        for user_id in existing:
+            pipe.delete(preferences_key(user_id))
+        if delete:
+            pipe.delete(*batch)
+        pipe.execute()
+        total += len(batch)
+        batch.clear()
+
+    for raw_key in redis_conn.scan_iter(match='user_prefs:*:*', count=batch_size):
+        batch.append(raw_key)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return total
@@ -0,0 +1,134 @@
+"""
+Program Layout Reconciler
+
+Program edits (the program form, the scheduling type switch and its undo)
+send the whole desired layout of a program: a weekly day -> routines map or
+a sequential list of routines. Instead of deleting every ProgramRoutine and
+recreating them one by one, the layout is diffed against the rows that
+exist:
+
+1. rows already matching a slot (routine, order, day) are left alone
+2. remaining rows of the same routine are moved into the remaining slots
+3. slots left over are bulk-created, rows left over are deleted
+
+so an edit costs a handful of queries however large the program is, and
+rows that survive keep their primary keys (which the schedule cursor in
+workouts/schedule.py points at). Routine ids are validated in one query.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from .models import ProgramRoutine, Routine
+
+DAY_VALUES = range(7)
+
+
+@dataclass(frozen=True)
+class Slot:
+    """One desired ProgramRoutine."""
+    routine_id: int
+    order: int
+    assigned_day: Optional[int] = None
+
+
+def weekly_slots(day_routines: Dict) -> List[Slot]:
+    """Slots for a {day: [routine id, ...]} map, ordered within each day (days 0-6 from Monday)."""
+    slots = []
+    for day, routine_ids in day_routines.items():
+        day = int(day)
+        if day not in DAY_VALUES:
+            raise ValueError(f"Invalid day: {day}")
+        slots.extend(Slot(int(routine_id), index + 1, day) for index, routine_id in enumerate(routine_ids))
+    return slots
+
+
+def sequential_slots(routine_ids: Iterable) -> List[Slot]:
+    """Slots for routines in program order."""
+    return [Slot(int(routine_id), index + 1) for index, routine_id in enumerate(routine_ids)]
+
+
+def converted_slots(program, scheduling_type: str) -> List[Slot]:
+    """
+    The program's current routines laid out for the other scheduling type:
+    sequential keeps the order (by day, then order within the day), weekly
+    spreads the routines over the days of the week.
+    """
+    rows = list(program.program_routines.order_by('order', 'assigned_day', 'id').values_list(
+        'routine_id', 'order', 'assigned_day'
+    ))
+    if scheduling_type == 'sequential':
+        rows.sort(key=lambda row: (row[2] or 0, row[1]))
+        return sequential_slots(routine_id for routine_id, _, _ in rows)
+
+    per_day: Dict[int, List[int]] = {}
+    for index, (routine_id, _, _) in enumerate(rows):
+        per_day.setdefault(index % len(DAY_VALUES), []).append(routine_id)
+    return weekly_slots(per_day)
+
+
+def valid_routine_ids(user, routine_ids: Iterable[int]) -> Set[int]:
+    """The ids among `routine_ids` of routines the user owns."""
+    return set(Routine.objects.filter(user=user, id__in=set(routine_ids)).values_list('id', flat=True))
+
+
+def reconcile_program_routines(program, slots: List[Slot]) -> Dict[str, int]:
+    """
+    Make the program's ProgramRoutines match `slots` with the fewest writes.
+    Routine ids must already be validated. Call inside a transaction.
+    Returns counts of created, updated, deleted and unchanged rows.
+    """
+    existing = list(program.program_routines.all())
+
+    # 1. Rows already in place
+    by_slot: Dict[Slot, List[ProgramRoutine]] = {}
+    for row in existing:
+        by_slot.setdefault(Slot(row.routine_id, row.order, row.assigned_day), []).append(row)
+    unplaced = []
+    unchanged = 0
+    for slot in slots:
+        if by_slot.get(slot):
+            by_slot[slot].pop()
+            unchanged += 1
+        else:
+            unplaced.append(slot)
+
+    # 2. Move leftover rows of the same routine into the remaining slots
+    leftover_by_routine: Dict[int, List[ProgramRoutine]] = {}
+    for rows in by_slot.values():
+        for row in rows:
+            leftover_by_routine.setdefault(row.routine_id, []).append(row)
+    to_update = []
+    to_create = []
+    for slot in unplaced:
+        candidates = leftover_by_routine.get(slot.routine_id)
+        if candidates:
+            row = candidates.pop()
+            row.order, row.assigned_day = slot.order, slot.assigned_day
+            to_update.append(row)
+        else:
+            to_create.append(ProgramRoutine(
+                program=program, routine_id=slot.routine_id, order=slot.order, assigned_day=slot.assigned_day,
+            ))
+
+    # 3. Whatever is left goes
+    to_delete = [row.id for rows in leftover_by_routine.values() for row in rows]
+
+    if to_update:
+        ProgramRoutine.objects.bulk_update(to_update, ['order', 'assigned_day'])
+    if to_create:
+        ProgramRoutine.objects.bulk_create(to_create)
+    if to_delete:
+        ProgramRoutine.objects.filter(id__in=to_delete).delete()
+
+    if to_update or to_create or to_delete:
+        # Bulk writes skip the model signals that keep the schedule current
+        from gainz.workouts.schedule import mark_stale
+        mark_stale([program.id])
+
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(to_delete),
+        'unchanged': unchanged,
+    }
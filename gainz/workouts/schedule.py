@@ -0,0 +1,201 @@
+"""
+Program Schedule Engine
+
+Materializes a program's upcoming sessions into its ProgramSchedule row so
+"start next workout", the upcoming sessions API and the home page read them
+instead of recomputing from workout history:
+
+- weekly programs: the routines assigned to each day for the next
+  WEEKLY_HORIZON_DAYS days, in order within the day; today's sessions up to
+  the one the user already did today are skipped
+- sequential programs: one cycle through the routines in program order,
+  starting after the last program routine done (or at the stored position
+  once that routine is removed)
+
+Creating a workout from a routine of the active program advances the cursor
+(signals in workouts/models.py). Sessions are rebuilt lazily: when the day
+rolls over, or after the program or its routines change, which clears
+`materialized_on`.
+"""
+
+import datetime
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DAYS_OF_WEEK_CHOICES, Program, ProgramRoutine, ProgramSchedule, Workout
+
+WEEKLY_HORIZON_DAYS = 14
+MAX_SEQUENTIAL_SESSIONS = 14
+CURSOR_FIELDS = ['position', 'last_program_routine', 'last_workout_date']
+DAY_NAMES = dict(DAYS_OF_WEEK_CHOICES)
+
+
+def _program_routines(program_id: int) -> List[Dict]:
+    return list(ProgramRoutine.objects.filter(program_id=program_id).order_by('order', 'id').values(
+        'id', 'routine_id', 'routine__name', 'order', 'assigned_day'
+    ))
+
+
+def _session(program_routine: Dict, day: Optional[datetime.date]) -> Dict:
+    return {
+        'program_routine_id': program_routine['id'],
+        'routine_id': program_routine['routine_id'],
+        'routine_name': program_routine['routine__name'],
+        'assigned_day': program_routine['assigned_day'],
+        'date': day.isoformat() if day else None,
+        'day_name': DAY_NAMES[day.weekday()] if day else None,
+    }
+
+
+def _weekly_sessions(schedule: ProgramSchedule, rows: List[Dict], today: datetime.date) -> List[Dict]:
+    by_day: Dict[int, List[Dict]] = {}
+    for row in rows:
+        if row['assigned_day'] is not None:
+            by_day.setdefault(row['assigned_day'], []).append(row)
+
+    # Sessions of today up to (and including) the one already done today are behind the user
+    done_today = None
+    if schedule.last_workout_date == today:
+        done_today = next((row for row in by_day.get(today.weekday(), []) if row['id'] == schedule.last_program_routine_id), None)
+
+    sessions = []
+    for offset in range(WEEKLY_HORIZON_DAYS):
+        day = today + datetime.timedelta(days=offset)
+        for row in by_day.get(day.weekday(), []):
+            if offset == 0 and done_today is not None and (row['order'], row['id']) <= (done_today['order'], done_today['id']):
+                continue
+            sessions.append(_session(row, day))
+    return sessions
+
+
+def _sequential_position(schedule: ProgramSchedule, rows: List[Dict]) -> int:
+    """
+    The cursor's index in `rows`: just after the last program routine done,
+    so reorders, inserts and deletes don't shift it onto another routine.
+    The stored position is only used once that row is gone.
+    """
+    for index, row in enumerate(rows):
+        if row['id'] == schedule.last_program_routine_id:
+            return (index + 1) % len(rows)
+    return schedule.position % len(rows)
+
+
+def _sequential_sessions(schedule: ProgramSchedule, rows: List[Dict]) -> List[Dict]:
+    if not rows:
+        return []
+    start = _sequential_position(schedule, rows)
+    return [_session(rows[(start + i) % len(rows)], None) for i in range(min(len(rows), MAX_SEQUENTIAL_SESSIONS))]
+
+
+def materialize(schedule: ProgramSchedule, today: Optional[datetime.date] = None, extra_fields=()) -> ProgramSchedule:
+    """Rebuild the schedule's upcoming sessions from the program's routines and save them (and `extra_fields`)."""
+    today = today or timezone.localdate()
+    rows = _program_routines(schedule.program_id)
+    if schedule.program.scheduling_type == 'weekly':
+        schedule.sessions = _weekly_sessions(schedule, rows, today)
+    else:
+        schedule.sessions = _sequential_sessions(schedule, rows)
+        position = _sequential_position(schedule, rows) if rows else schedule.position
+        if position != schedule.position:
+            schedule.position = position
+            extra_fields = {*extra_fields, 'position'}
+    schedule.materialized_on = today
+    schedule.save(update_fields=['sessions', 'materialized_on', *extra_fields])
+    return schedule
+
+
+def _advance(schedule: ProgramSchedule, rows: List[Dict], routine_id: int, day: datetime.date) -> bool:
+    """Move the cursor past the session a workout of `routine_id` on `day` was; False if not in the program."""
+    matches = [index for index, row in enumerate(rows) if row['routine_id'] == routine_id]
+    if not matches:
+        return False
+    if schedule.program.scheduling_type == 'weekly':
+        # The session assigned to that weekday, else the routine's first one
+        index = next((index for index in matches if rows[index]['assigned_day'] == day.weekday()), matches[0])
+    else:
+        # The routine's next occurrence from the cursor on, so A, B, A, C sequences advance correctly
+        position = _sequential_position(schedule, rows)
+        index = min(matches, key=lambda index: (index - position) % len(rows))
+    schedule.position = (index + 1) % len(rows)
+    schedule.last_program_routine_id = rows[index]['id']
+    schedule.last_workout_date = day
+    return True
+
+
+def _local_date(value: datetime.datetime) -> datetime.date:
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+def _create_schedule(program: Program) -> ProgramSchedule:
+    """A new schedule, its cursor placed after the program's most recent workout."""
+    schedule, created = ProgramSchedule.objects.get_or_create(program=program)
+    if created:
+        last_workout = Workout.objects.filter(
+            user_id=program.user_id, routine_source__program_associations__program=program,
+        ).order_by('-date', '-id').values('routine_source_id', 'date').first()
+        if last_workout:
+            _advance(schedule, _program_routines(program.id), last_workout['routine_source_id'], _local_date(last_workout['date']))
+            schedule.save(update_fields=CURSOR_FIELDS)
+    return schedule
+
+
+def get_active_schedule(user) -> Optional[ProgramSchedule]:
+    """The schedule of the user's active program with current sessions, or None without one."""
+    schedule = ProgramSchedule.objects.select_related('program').filter(
+        program__user=user, program__is_active=True,
+    ).first()
+    if schedule is None:
+        program = Program.objects.filter(user=user, is_active=True).first()
+        if program is None:
+            return None
+        schedule = _create_schedule(program)
+    if schedule.materialized_on != timezone.localdate():
+        materialize(schedule)
+    return schedule
+
+
+def next_session(schedule: Optional[ProgramSchedule]) -> Optional[Dict]:
+    """The session to start next: today's next one for weekly programs, the cursor's for sequential ones."""
+    if schedule is None or not schedule.sessions:
+        return None
+    session = schedule.sessions[0]
+    if session['date'] is not None and session['date'] != timezone.localdate().isoformat():
+        return None  # Nothing left today; the next session is on a later day
+    return session
+
+
+def advance_for_workout(user_id: int, routine_id: int, workout_date: datetime.datetime) -> None:
+    """Advance the active program's cursor past a workout just created from `routine_id`."""
+    with transaction.atomic():
+        schedule = ProgramSchedule.objects.select_for_update().select_related('program').filter(
+            program__user_id=user_id, program__is_active=True,
+        ).first()
+        if schedule is None:
+            program = Program.objects.filter(user_id=user_id, is_active=True).first()
+            if program is None:
+                return
+            # A new schedule starts after the most recent workout, which includes this one
+            schedule = _create_schedule(program)
+            materialize(schedule)
+            return
+        if _advance(schedule, _program_routines(schedule.program_id), routine_id, _local_date(workout_date)):
+            materialize(schedule, extra_fields=CURSOR_FIELDS)
+
+
+def release_program_routine(program_routine: ProgramRoutine) -> None:
+    """
+    Before a program routine the cursor sits after is deleted, store the
+    position the routine following it will have, for `_sequential_position`
+    to fall back on.
+    """
+    rows = _program_routines(program_routine.program_id)
+    index = next((index for index, row in enumerate(rows) if row['id'] == program_routine.id), None)
+    if index is not None:
+        ProgramSchedule.objects.filter(last_program_routine_id=program_routine.id).update(position=index)
+
+
+def mark_stale(program_ids) -> None:
+    """Have the schedules of these programs rebuilt on their next read."""
+    ProgramSchedule.objects.filter(program_id__in=program_ids).update(materialized_on=None)
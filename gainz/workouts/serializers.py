@@ -1,12 +1,21 @@
 from rest_framework import serializers
+from gainz.utils.sparse_fields import SparseFieldsMixin
 from gainz.workouts.models import Workout, WorkoutExercise, ExerciseSet
+from gainz.workouts.timers import resolve_workout_timers
 
-class ExerciseSetSerializer(serializers.ModelSerializer):
+class ExerciseSetSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ExerciseSet
         fields = ['id', 'set_number', 'reps', 'weight', 'is_warmup', 'is_completed']
 
-class WorkoutExerciseSerializer(serializers.ModelSerializer):
+class BatchSetSerializer(ExerciseSetSerializer):
+    """Set fields accepted by the batch endpoint; set numbers are allocated by the server."""
+    class Meta(ExerciseSetSerializer.Meta):
+        read_only_fields = ['set_number']
+        # Bulk writes bypass model validation, so reject negative reps before the database does
+        extra_kwargs = {'reps': {'min_value': 0}}
+
+class WorkoutExerciseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sets = ExerciseSetSerializer(many=True, read_only=True)
     exercise_name = serializers.CharField(source='exercise.name', read_only=True)
     exercise_type_display = serializers.SerializerMethodField()
@@ -14,14 +23,30 @@ class WorkoutExerciseSerializer(serializers.ModelSerializer):
     class Meta:
         model = WorkoutExercise
         fields = ['id', 'exercise', 'exercise_name', 'order', 'notes', 'sets', 'performance_feedback', 'exercise_type', 'exercise_type_display']
+        field_select_related = {'exercise_type_display': ['exercise']}  # Used by plan_queryset
 
     def get_exercise_type_display(self, obj):
         """Return the exercise type using get_exercise_type() method"""
         return obj.get_exercise_type()
 
-class WorkoutSerializer(serializers.ModelSerializer):
+class WorkoutSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     exercises = WorkoutExerciseSerializer(many=True, read_only=True)
+    timers = serializers.SerializerMethodField()
 
     class Meta:
         model = Workout
-        fields = ['id', 'date', 'name', 'notes', 'duration', 'exercises']
+        fields = ['id', 'date', 'name', 'notes', 'duration', 'exercises', 'timers']
+        field_prefetch_related = {'timers': ['exercises__exercise']}  # Used by plan_queryset
+
+    def update(self, instance, validated_data):
+        # Save only the edited columns; a full save would write back stale like/comment counters
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+    def get_timers(self, obj):
+        """Rest timer settings per workout exercise id, with every layer resolved (see workouts/timers.py)"""
+        # Workouts of one response share their timer profiles
+        profiles = self.context.setdefault('timer_profiles', {})
+        return resolve_workout_timers(obj, obj.exercises.all(), profiles)
@@ -0,0 +1,239 @@
+"""
+Batched Set Operations
+
+Applies a list of set creates, updates and deletes for one workout in a
+single transaction, so a client can flush a whole exercise (or an offline
+backlog) in one request:
+
+    {"operations": [
+        {"op": "create", "key": "c1", "workout_exercise": 12, "reps": 5, "weight": "100"},
+        {"op": "update", "key": "u1", "create_key": "c1", "is_completed": true},
+        {"op": "delete", "key": "d1", "id": 345}
+    ]}
+
+Every operation carries a client-generated idempotency key; an operation
+whose key was already applied is not applied again and its original result
+is returned. Keys are unique per user: reusing one on another workout is
+rejected. Updates and deletes target a set by `id` or by the `create_key`
+of an earlier create, which lets offline clients edit sets they haven't
+received ids for yet.
+
+Set numbers are allocated while holding a lock on the workout row, so
+concurrent requests can't hand out the same number twice. Rows are written
+with bulk operations; the rollup, chart cache, personal record and sync
+change log upkeep runs once for the batch.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Max
+
+from gainz.workouts.models import ExerciseSet, SetOperation, Workout, WorkoutExercise
+from gainz.workouts.serializers import BatchSetSerializer
+
+MAX_BATCH_OPERATIONS = 500
+SET_FIELDS = ['reps', 'weight', 'is_warmup', 'is_completed']
+
+
+class SetBatchError(Exception):
+    """An operation in the batch is invalid; nothing in the batch was applied."""
+
+    def __init__(self, message: str, index: Optional[int] = None):
+        super().__init__(message)
+        self.index = index
+
+
+def invalid_set_reference(op: Dict[str, Any]) -> Optional[str]:
+    """Why an operation's set ids can't be used in a lookup, or None when they can."""
+    for field in ('id', 'workout_exercise'):
+        value = op.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            return f"{field} must be an integer."
+    if op.get('create_key') is not None and not isinstance(op['create_key'], str):
+        return 'create_key must be a string.'
+    return None
+
+
+def next_set_numbers(workout: Workout) -> Dict[int, int]:
+    """
+    Next free set number per workout exercise of a workout.
+
+    Call inside a transaction holding the workout row lock (see lock_workout).
+    """
+    rows = ExerciseSet.objects.filter(workout_exercise__workout=workout).values('workout_exercise').annotate(
+        last_number=Max('set_number')
+    ).values_list('workout_exercise', 'last_number')
+    return {workout_exercise_id: last_number + 1 for workout_exercise_id, last_number in rows}
+
+
+def lock_workout(workout_id: int, user) -> Workout:
+    """Lock a user's workout row for the rest of the transaction; serializes set numbering."""
+    return Workout.objects.select_for_update().get(pk=workout_id, user=user)
+
+
+class _Batch:
+    """Working state of one batch: the sets it touches and the operations it records."""
+
+    def __init__(self, user, workout: Workout, operations: List[Dict[str, Any]]):
+        self.user = user
+        self.workout = workout
+        self.workout_exercises = {
+            workout_exercise.id: workout_exercise
+            for workout_exercise in WorkoutExercise.objects.filter(workout=workout)
+        }
+        self.set_numbers = next_set_numbers(workout)
+
+        ops = [op for op in operations if isinstance(op, dict)]
+        self.applied = {
+            operation.key: operation
+            for operation in SetOperation.objects.filter(
+                user=user, key__in=[op['key'] for op in ops if isinstance(op.get('key'), str)]
+            )
+        }
+        # Creates from earlier requests that this batch refers to by create_key
+        self.earlier_creates = {
+            operation.key: operation.exercise_set_id
+            for operation in SetOperation.objects.filter(
+                user=user, workout=workout, operation='create',
+                key__in=[op['create_key'] for op in ops if isinstance(op.get('create_key'), str)],
+            )
+        }
+        set_ids = {op['id'] for op in ops if isinstance(op.get('id'), int)}
+        set_ids.update(set_id for set_id in self.earlier_creates.values() if set_id)
+        self.existing = {
+            exercise_set.id: exercise_set
+            for exercise_set in ExerciseSet.objects.filter(
+                id__in=set_ids, workout_exercise__workout=workout
+            ).select_related('workout_exercise')
+        }
+
+        self.created: Dict[str, ExerciseSet] = {}  # Pending creates by key, in order
+        self.updated: Dict[int, ExerciseSet] = {}
+        self.deleted: Dict[int, ExerciseSet] = {}
+        self.targets: Dict[str, ExerciseSet] = {}  # Set each new operation applied to, by key
+        self.entries: List[Tuple[SetOperation, bool]] = []  # (operation, replayed) per request item
+
+    def _validated(self, op: Dict[str, Any], index: int, partial: bool) -> Dict[str, Any]:
+        data = {field: op[field] for field in SET_FIELDS if field in op}
+        serializer = BatchSetSerializer(data=data, partial=partial)
+        if not serializer.is_valid():
+            raise SetBatchError(serializer.errors, index)
+        return serializer.validated_data
+
+    def _target(self, op: Dict[str, Any], index: int) -> ExerciseSet:
+        create_key = op.get('create_key')
+        if create_key in self.created:
+            return self.created[create_key]
+        set_id = self.earlier_creates.get(create_key) if create_key else op.get('id')
+        exercise_set = self.existing.get(set_id)
+        if exercise_set is None or set_id in self.deleted:
+            raise SetBatchError('Set not found in this workout.', index)
+        return exercise_set
+
+    def _create(self, op: Dict[str, Any], index: int) -> ExerciseSet:
+        workout_exercise = self.workout_exercises.get(op.get('workout_exercise'))
+        if workout_exercise is None:
+            raise SetBatchError('Workout exercise not found in this workout.', index)
+        data = self._validated(op, index, partial=False)
+        set_number = self.set_numbers.get(workout_exercise.id, 1)
+        self.set_numbers[workout_exercise.id] = set_number + 1
+        return ExerciseSet(workout_exercise=workout_exercise, set_number=set_number, **data)
+
+    def apply(self, index: int, op: Dict[str, Any]) -> None:
+        if not isinstance(op, dict):
+            raise SetBatchError('Each operation must be an object.', index)
+        key = op.get('key')
+        if not isinstance(key, str) or not key or len(key) > 64:
+            raise SetBatchError('Each operation needs a key of at most 64 characters.', index)
+        if key in self.applied:
+            # Keys are unique per user; replaying another workout's result would report a set never made here
+            if self.applied[key].workout_id != self.workout.id:
+                raise SetBatchError('Key was already used for another workout.', index)
+            self.entries.append((self.applied[key], True))
+            return
+
+        error = invalid_set_reference(op)
+        if error:
+            raise SetBatchError(error, index)
+
+        kind = op.get('op')
+        if kind == 'create':
+            exercise_set = self._create(op, index)
+            self.created[key] = exercise_set
+        elif kind == 'update':
+            exercise_set = self._target(op, index)
+            for field, value in self._validated(op, index, partial=True).items():
+                setattr(exercise_set, field, value)
+            if exercise_set.pk:
+                self.updated[exercise_set.pk] = exercise_set
+        elif kind == 'delete':
+            exercise_set = self._target(op, index)
+            if exercise_set.pk:
+                self.deleted[exercise_set.pk] = exercise_set
+                self.updated.pop(exercise_set.pk, None)
+            else:
+                self.created = {k: v for k, v in self.created.items() if v is not exercise_set}
+        else:
+            raise SetBatchError("Operation must be 'create', 'update' or 'delete'.", index)
+
+        operation = SetOperation(user=self.user, key=key, workout=self.workout, operation=kind)
+        self.targets[key] = exercise_set
+        self.applied[key] = operation
+        self.entries.append((operation, False))
+
+    def commit(self) -> List[Dict[str, Any]]:
+        from gainz.utils.set_upkeep import queue_created_sets, queue_exercises_upkeep
+        from gainz.workouts.sync import EXERCISE_SET, record_changes
+
+        created_sets = ExerciseSet.objects.bulk_create(list(self.created.values()))
+        if self.updated:
+            ExerciseSet.objects.bulk_update(list(self.updated.values()), SET_FIELDS)
+        if self.deleted:
+            # Deletes go through the ORM so their per-set signals keep rollups and records right
+            ExerciseSet.objects.filter(id__in=list(self.deleted)).delete()
+
+        new_operations = [operation for operation, replayed in self.entries if not replayed]
+        for operation in new_operations:
+            exercise_set = self.targets[operation.key]
+            # A set created and deleted within the batch never got a row
+            operation.exercise_set_id = exercise_set.pk
+            keep_set = operation.operation != 'delete' and exercise_set.pk is not None
+            operation.result = {
+                'key': operation.key,
+                'op': operation.operation,
+                'id': exercise_set.pk,
+                'workout_exercise': exercise_set.workout_exercise_id,
+                'set': BatchSetSerializer(exercise_set).data if keep_set else None,
+            }
+        SetOperation.objects.bulk_create(new_operations)
+
+        record_changes(self.user.id, EXERCISE_SET, [
+            (exercise_set.id, self.workout.id) for exercise_set in created_sets + list(self.updated.values())
+        ])
+        queue_created_sets(self.workout, created_sets)
+        queue_exercises_upkeep(self.user.id, self.workout.date, {
+            exercise_set.workout_exercise.exercise_id for exercise_set in self.updated.values()
+        })
+
+        return [{**operation.result, 'replayed': replayed} for operation, replayed in self.entries]
+
+
+def apply_set_operations(user, workout_id: int, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Apply a batch of set operations to one of the user's workouts, all or nothing.
+
+    Returns one result per operation, in order. Raises SetBatchError (with the
+    failing operation's index) when any operation is invalid and
+    Workout.DoesNotExist when the workout isn't the user's.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise SetBatchError('operations must be a non-empty list.')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise SetBatchError(f'At most {MAX_BATCH_OPERATIONS} operations per batch.')
+
+    with transaction.atomic():
+        batch = _Batch(user, lock_workout(workout_id, user), operations)
+        for index, op in enumerate(operations):
+            batch.apply(index, op)
+        return batch.commit()
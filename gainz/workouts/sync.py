@@ -0,0 +1,349 @@
+"""
+Offline Workout Sync
+
+Change log and delta-sync protocol for clients that keep logging while
+offline (the service worker queues set edits and flushes them here).
+
+Change log: every save or delete of a user's Workout, WorkoutExercise or
+ExerciseSet is recorded in SyncChange with the next number of the user's
+sequence (SyncState). Changes are queued and logged once the writing
+transaction commits (see utils/commit_batches.py), in one short transaction
+that row-locks SyncState, so a user's changes commit in sequence order
+without holding the lock while the write runs, and an object changed
+several times in one transaction is logged once. Each object keeps only
+its latest change, so an object's `seq` is its version and "changes since
+cursor" returns every changed object once.
+Deleting a workout or exercise logs a tombstone for it but not for the rows
+cascading with it; clients drop those along with their parent.
+
+Reading: a client bootstraps from the REST API, then follows
+`changes_since(cursor)`; without a cursor it gets the current cursor to
+start from.
+
+Writing: `push_operations` takes the operations of set_batch.py (creates,
+updates and deletes with idempotency keys) for any of the user's workouts,
+plus `update` operations for workouts and workout exercises. Conflicts:
+
+- an operation carrying `base_version` older than the object's current
+  version is not applied; the result is a conflict with the server's row
+- without `base_version`, updates are last-writer-wins per field
+- updating a deleted object is a conflict, deleting one is a no-op
+- an invalid operation (including ids that aren't integers) is rejected on
+  its own; the rest are still applied
+
+Bulk writers that skip signals (set batches, routine instantiation,
+history imports) call record_changes themselves.
+"""
+
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from gainz.utils.commit_batches import add_to_commit_batch
+from gainz.workouts.models import ExerciseSet, SetOperation, SyncChange, SyncState, Workout, WorkoutExercise
+from gainz.workouts.set_batch import MAX_BATCH_OPERATIONS, SetBatchError, apply_set_operations, invalid_set_reference
+
+WORKOUT = 'workout'
+WORKOUT_EXERCISE = 'workout_exercise'
+EXERCISE_SET = 'exercise_set'
+CHANGES_PAGE_SIZE = 500
+MAX_PUSH_OPERATIONS = MAX_BATCH_OPERATIONS
+ID_CHUNK_SIZE = 900  # Stay below SQLite's bound parameter limit
+CHANGES_BATCH = 'sync_changes'
+
+# Fields a client may change offline, per model (sets use the set_batch fields)
+UPDATABLE_FIELDS = {
+    WORKOUT: {'name', 'notes'},
+    WORKOUT_EXERCISE: {'notes', 'performance_feedback'},
+}
+MODELS = {WORKOUT: Workout, WORKOUT_EXERCISE: WorkoutExercise}
+
+
+def _log_changes(items: Dict[Tuple[int, str, int], Tuple[int, bool]]) -> None:
+    """Write a transaction's queued changes: one sequence allocation per user."""
+    # A delete rolled back with its savepoint may still be queued; log the row as changed
+    deleted_ids: Dict[str, List[int]] = defaultdict(list)
+    for (_, model, object_id), (_, deleted) in items.items():
+        if deleted:
+            deleted_ids[model].append(object_id)
+    surviving = set()
+    for model, object_ids in deleted_ids.items():
+        model_class = MODELS.get(model, ExerciseSet)
+        for start in range(0, len(object_ids), ID_CHUNK_SIZE):
+            surviving.update(
+                (model, object_id) for object_id in model_class.objects.filter(
+                    id__in=object_ids[start:start + ID_CHUNK_SIZE]
+                ).values_list('id', flat=True)
+            )
+
+    by_user: Dict[int, List[Tuple[str, int, int, bool]]] = defaultdict(list)
+    for (user_id, model, object_id), (workout_id, deleted) in items.items():
+        deleted = deleted and (model, object_id) not in surviving
+        by_user[user_id].append((model, object_id, workout_id, deleted))
+
+    with transaction.atomic():
+        for user_id in sorted(by_user):
+            changes = by_user[user_id]
+            state, _ = SyncState.objects.select_for_update().get_or_create(user_id=user_id)
+            first_seq = state.last_seq + 1
+            state.last_seq += len(changes)
+            state.save(update_fields=['last_seq'])
+
+            ids_by_model: Dict[str, List[int]] = defaultdict(list)
+            for model, object_id, _, _ in changes:
+                ids_by_model[model].append(object_id)
+            for model, object_ids in ids_by_model.items():
+                for start in range(0, len(object_ids), ID_CHUNK_SIZE):
+                    SyncChange.objects.filter(
+                        user_id=user_id, model=model, object_id__in=object_ids[start:start + ID_CHUNK_SIZE]
+                    ).delete()
+            SyncChange.objects.bulk_create([
+                SyncChange(
+                    user_id=user_id,
+                    seq=first_seq + offset,
+                    model=model,
+                    object_id=object_id,
+                    workout_id=workout_id,
+                    deleted=deleted,
+                )
+                for offset, (model, object_id, workout_id, deleted) in enumerate(changes)
+            ], batch_size=1000)
+
+
+def record_changes(user_id: int, model: str, rows: Iterable[Tuple[int, int]], deleted: bool = False) -> None:
+    """
+    Log (object_id, workout_id) rows of one model as changed (or deleted) for
+    a user when the current transaction commits.
+    """
+    for object_id, workout_id in rows:
+        add_to_commit_batch(CHANGES_BATCH, (user_id, model, object_id), _log_changes, (workout_id, deleted))
+
+
+def record_workout_tree(user_id: int, workouts: List[Workout], workout_exercises: List[WorkoutExercise],
+                        exercise_sets: List[ExerciseSet]) -> None:
+    """Log bulk-created workouts, exercises and sets (callers of bulk_create)."""
+    record_changes(user_id, WORKOUT, [(workout.id, workout.id) for workout in workouts])
+    record_changes(user_id, WORKOUT_EXERCISE, [
+        (workout_exercise.id, workout_exercise.workout_id) for workout_exercise in workout_exercises
+    ])
+    record_changes(user_id, EXERCISE_SET, [
+        (exercise_set.id, exercise_set.workout_exercise.workout_id) for exercise_set in exercise_sets
+    ])
+
+
+def current_cursor(user) -> int:
+    return SyncState.objects.filter(user=user).values_list('last_seq', flat=True).first() or 0
+
+
+def _current_rows(user, model: str, object_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Current field values of the given objects, keyed by id."""
+    if not object_ids:
+        return {}
+    if model == WORKOUT:
+        rows = Workout.objects.filter(user=user, id__in=object_ids).values(
+            'id', 'name', 'date', 'notes', 'duration', 'visibility', 'routine_source_id'
+        )
+    elif model == WORKOUT_EXERCISE:
+        rows = WorkoutExercise.objects.filter(workout__user=user, id__in=object_ids).values(
+            'id', 'workout_id', 'exercise_id', 'order', 'notes', 'exercise_type', 'performance_feedback'
+        )
+    else:
+        rows = ExerciseSet.objects.filter(workout_exercise__workout__user=user, id__in=object_ids).values(
+            'id', 'workout_exercise_id', 'set_number', 'reps', 'weight', 'is_warmup', 'is_completed'
+        )
+    return {row['id']: row for row in rows}
+
+
+def changes_since(user, cursor: int, limit: int = CHANGES_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Objects changed after `cursor`, oldest change first, with their current
+    values (`data` is None for deletions) and the cursor to ask from next.
+    """
+    changes = list(SyncChange.objects.filter(user=user, seq__gt=cursor).order_by('seq')[:limit + 1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    ids_by_model: Dict[str, List[int]] = {}
+    for change in changes:
+        if not change.deleted:
+            ids_by_model.setdefault(change.model, []).append(change.object_id)
+    current = {model: _current_rows(user, model, object_ids) for model, object_ids in ids_by_model.items()}
+
+    payload = []
+    for change in changes:
+        data = None if change.deleted else current[change.model].get(change.object_id)
+        payload.append({
+            'model': change.model,
+            'id': change.object_id,
+            'workout': change.workout_id,
+            'version': change.seq,
+            'deleted': data is None,
+            'data': data,
+        })
+    return {
+        'changes': payload,
+        'cursor': changes[-1].seq if changes else cursor,
+        'has_more': has_more,
+    }
+
+
+def _versions(user, model: str, object_ids: Iterable[int]) -> Dict[int, int]:
+    return dict(SyncChange.objects.filter(user=user, model=model, object_id__in=list(object_ids)).values_list(
+        'object_id', 'seq'
+    ))
+
+
+def _result(op: Dict[str, Any], status: str, **extra) -> Dict[str, Any]:
+    return {'key': op.get('key'), 'op': op.get('op'), 'status': status, **extra}
+
+
+def _invalid_reference(op: Dict[str, Any]) -> Optional[str]:
+    """Why an operation's ids can't be used in a lookup, or None when they can."""
+    if not isinstance(op.get('model', EXERCISE_SET), str):
+        return 'model must be a string.'
+    base_version = op.get('base_version')
+    if base_version is not None and (isinstance(base_version, bool) or not isinstance(base_version, int)):
+        return 'base_version must be an integer.'
+    return invalid_set_reference(op)
+
+
+def _push_field_update(user, op: Dict[str, Any], versions: Dict[Tuple[str, int], int]) -> Dict[str, Any]:
+    """Apply an update of a workout or workout exercise."""
+    model = op['model']
+    if op.get('op') != 'update':
+        return _result(op, 'rejected', error=f"Only updates are supported for {model}.")
+    lookup = {'user': user} if model == WORKOUT else {'workout__user': user}
+    instance = MODELS[model].objects.filter(id=op.get('id'), **lookup).first()
+    if instance is None:
+        return _result(op, 'conflict', reason='deleted', id=op.get('id'), current=None)
+
+    version = versions.get((model, instance.id), 0)
+    if op.get('base_version') is not None and version > op['base_version']:
+        current = _current_rows(user, model, [instance.id]).get(instance.id)
+        return _result(op, 'conflict', reason='changed', id=instance.id, version=version, current=current)
+
+    fields = [field for field in UPDATABLE_FIELDS[model] if field in op]
+    for field in fields:
+        setattr(instance, field, op[field])
+    try:
+        instance.full_clean(validate_unique=False)
+    except Exception as e:
+        return _result(op, 'rejected', error=str(e))
+    if fields:
+        instance.save(update_fields=fields)
+    return _result(op, 'applied', id=instance.id)
+
+
+def _apply_set_group(user, workout_id: int, group: List[Tuple[int, Dict[str, Any]]],
+                     results: Dict[int, Dict[str, Any]]) -> None:
+    """Apply one workout's set operations, dropping rejected ones and retrying the rest."""
+    while group:
+        try:
+            applied = apply_set_operations(user, workout_id, [op for _, op in group])
+        except Workout.DoesNotExist:
+            for index, op in group:
+                results[index] = _result(op, 'conflict', reason='deleted', current=None)
+            return
+        except SetBatchError as e:
+            bad = e.index if e.index is not None else 0
+            index, op = group.pop(bad)
+            results[index] = _result(op, 'rejected', error=e.args[0])
+            continue
+
+        for (index, op), result in zip(group, applied):
+            status = 'replayed' if result.pop('replayed') else 'applied'
+            results[index] = {**result, 'status': status}
+        return
+
+
+def push_operations(user, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Apply a client's queued operations across its workouts. Returns one result
+    per operation, in order, with status applied, replayed, conflict or rejected.
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    set_ops: List[Tuple[int, Dict[str, Any]]] = []
+    field_ops: List[Tuple[int, Dict[str, Any]]] = []
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict) or not isinstance(op.get('key'), str):
+            results[index] = _result(op if isinstance(op, dict) else {}, 'rejected', error='Each operation needs a key.')
+            continue
+        error = _invalid_reference(op)
+        if error:
+            results[index] = _result(op, 'rejected', error=error)
+            continue
+        model = op.get('model', EXERCISE_SET)
+        if model == EXERCISE_SET:
+            set_ops.append((index, op))
+        elif model in UPDATABLE_FIELDS:
+            field_ops.append((index, op))
+        else:
+            results[index] = _result(op, 'rejected', error=f"Unknown model: {model}")
+
+    # Current versions of the workouts and exercises updated by id
+    versions: Dict[Tuple[str, int], int] = {}
+    for model in (WORKOUT, WORKOUT_EXERCISE):
+        ids = {op.get('id') for _, op in field_ops if op.get('model') == model and isinstance(op.get('id'), int)}
+        if ids:
+            versions.update({(model, object_id): seq for object_id, seq in _versions(user, model, ids).items()})
+
+    for index, op in field_ops:
+        results[index] = _push_field_update(user, op, versions)
+
+    # Route set operations to their workout: by workout exercise, by set id, or by create key
+    keys = {op['key'] for _, op in set_ops} | {op['create_key'] for _, op in set_ops if op.get('create_key')}
+    key_workouts = {}
+    key_sets = {}
+    for key, workout_id, set_id in SetOperation.objects.filter(user=user, key__in=keys).values_list(
+        'key', 'workout_id', 'exercise_set_id'
+    ):
+        key_workouts[key] = workout_id
+        key_sets[key] = set_id
+    exercise_workouts = dict(WorkoutExercise.objects.filter(
+        workout__user=user, id__in=[op.get('workout_exercise') for _, op in set_ops if op.get('op') == 'create']
+    ).values_list('id', 'workout_id'))
+    target_ids = {op['id'] for _, op in set_ops if isinstance(op.get('id'), int)}
+    target_ids.update(set_id for set_id in key_sets.values() if set_id)
+    set_workouts = dict(ExerciseSet.objects.filter(
+        workout_exercise__workout__user=user, id__in=target_ids
+    ).values_list('id', 'workout_exercise__workout_id'))
+    set_versions = _versions(user, EXERCISE_SET, set_workouts)
+
+    groups: Dict[int, List[Tuple[int, Dict[str, Any]]]] = OrderedDict()
+    for index, op in set_ops:
+        kind = op.get('op')
+        create_key = op.get('create_key')
+        if op['key'] in key_workouts:
+            workout_id = key_workouts[op['key']]  # Already applied: replayed by its workout
+        elif kind == 'create':
+            workout_id = exercise_workouts.get(op.get('workout_exercise'))
+            if workout_id is None:
+                results[index] = _result(op, 'rejected', error='Workout exercise not found.')
+                continue
+            key_workouts[op['key']] = workout_id
+        else:
+            if create_key in key_sets:
+                set_id = key_sets[create_key]
+                workout_id = set_workouts.get(set_id)
+            elif create_key:
+                set_id = None  # Created earlier in this push
+                workout_id = key_workouts.get(create_key)
+            else:
+                set_id = op.get('id')
+                workout_id = set_workouts.get(set_id)
+            if workout_id is None:
+                results[index] = (_result(op, 'applied', id=set_id) if kind == 'delete'
+                                  else _result(op, 'conflict', reason='deleted', id=set_id, current=None))
+                continue
+            version = set_versions.get(set_id, 0)
+            if op.get('base_version') is not None and version > op['base_version']:
+                current = _current_rows(user, EXERCISE_SET, [set_id]).get(set_id)
+                results[index] = _result(op, 'conflict', reason='changed', id=set_id, version=version, current=current)
+                continue
+        groups.setdefault(workout_id, []).append((index, op))
+
+    for workout_id, group in groups.items():
+        _apply_set_group(user, workout_id, group, results)
+
+    return [results[index] for index in range(len(operations))]
@@ -0,0 +1,53 @@
+"""Background jobs for workouts (run by the RQ worker)."""
+
+from django.contrib.auth import get_user_model
+from django.utils.dateparse import parse_datetime
+
+from .models import Workout, WorkoutImportJob
+
+User = get_user_model()
+
+
+def run_workout_import_job(import_job_id):
+    """
+    Run or resume a workout history import.
+
+    Failures are re-raised after the checkpoint is saved so the queue retries
+    the job, which then resumes where it stopped.
+    """
+    from .history_import import run_import
+
+    job = WorkoutImportJob.objects.select_related('user').get(id=import_job_id)
+    if job.status == 'completed':
+        return {'import_id': job.id, 'status': job.status}
+
+    job = run_import(job, raise_errors=True)
+    return {
+        'import_id': job.id,
+        'status': job.status,
+        'workouts_created': job.workouts_created,
+        'sets_created': job.sets_created,
+    }
+
+
+def rebuild_user_rollups(user_id):
+    """Rebuild all progress rollups of one user."""
+    from gainz.utils.progress_rollups import rebuild_rollups_for_user
+
+    user = User.objects.filter(id=user_id).first()
+    if user is None:
+        return {'rows': 0}
+    return {'rows': rebuild_rollups_for_user(user)}
+
+
+def refresh_moved_workout_rollups(workout_id, previous_date):
+    """Move a workout's sets from their previous day to the workout's current day in the rollups."""
+    from gainz.utils.chart_cache import invalidate_exercise_charts
+    from gainz.utils.progress_rollups import refresh_rollups_for_workout
+
+    workout = Workout.objects.filter(id=workout_id).first()
+    if workout is None:
+        return None
+    refresh_rollups_for_workout(workout, extra_dates=[parse_datetime(previous_date)])
+    invalidate_exercise_charts(workout.user_id, workout.exercises.values_list('exercise_id', flat=True))
+    return {'workout_id': workout.id}
@@ -0,0 +1,184 @@
+"""
+Rest Timer Resolution
+
+Works out the rest timer, auto-start and sound settings for every exercise
+of a workout in one pass, from these layers (first one set wins):
+
+- timer seconds: the user's override for the exercise, the routine's
+  setting for the exercise type, the program's, the user's default for the
+  type, then the system default (180/120/90s for primary/secondary/accessory)
+- auto-start: the routine's setting, the program's, the user's, then off
+- sound: the user's setting, then on
+
+The routine is the one the workout was started from; the program is the
+user's program containing that routine (the active one first). Everything
+but the exercise types is collected into a TimerProfile, cached per
+(user, routine, program) under the user's timer version stamp, so resolving
+a workout costs two cache reads. Saving or deleting any timer preference or
+override bumps the stamp (signals in workouts/models.py).
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, Optional
+
+from django.core.cache import cache
+
+from gainz.utils.version_stamps import bump_version, current_version
+
+from .models import ExerciseTimerOverride, Program, ProgramTimerPreference, RoutineTimerPreference, UserTimerPreference
+
+SYSTEM_TIMER_SECONDS = {'primary': 180, 'secondary': 120, 'accessory': 90}
+DEFAULT_AUTO_START = False
+DEFAULT_SOUND_ENABLED = True
+TIMER_PROFILE_CACHE_TIMEOUT = 60 * 60 * 24  # Profiles are keyed by version, so this only bounds memory
+
+EXERCISE_TYPES = tuple(SYSTEM_TIMER_SECONDS)
+
+
+def user_version_key(user_id: int) -> str:
+    return f"timer_settings_version:user:{user_id}"
+
+
+def _profile_key(user_id: int, routine_id: Optional[int], program_id: Optional[int], version) -> str:
+    return f"timer_profile:{user_id}:r{routine_id or 0}:p{program_id or 0}:v{version}"
+
+
+@dataclass
+class TimerProfile:
+    """Everything a workout's timers depend on apart from its exercises."""
+    type_seconds: Dict[str, int]
+    type_sources: Dict[str, str]
+    auto_start: bool
+    sound_enabled: bool
+    overrides: Dict[int, int] = field(default_factory=dict)  # exercise id -> seconds
+
+    def resolve(self, exercise_id: int, exercise_type: Optional[str]) -> Dict:
+        """Effective settings for one exercise of the given type."""
+        if exercise_type not in SYSTEM_TIMER_SECONDS:
+            exercise_type = 'accessory'
+        if exercise_id in self.overrides:
+            seconds, source = self.overrides[exercise_id], 'exercise'
+        else:
+            seconds, source = self.type_seconds[exercise_type], self.type_sources[exercise_type]
+        return {
+            'timer_seconds': seconds,
+            'source': source,
+            'auto_start': self.auto_start,
+            'sound_enabled': self.sound_enabled,
+        }
+
+
+def _first_set(*values):
+    for value in values:
+        if value is not None:
+            return value
+    return None
+
+
+def build_timer_profile(user_id: int, routine_id: Optional[int] = None, program_id: Optional[int] = None) -> TimerProfile:
+    """Query the timer layers for a (user, routine, program) from the database."""
+    type_fields = [f"{exercise_type}_timer_seconds" for exercise_type in EXERCISE_TYPES]
+    user_prefs = UserTimerPreference.objects.filter(user_id=user_id).values(
+        *type_fields, 'auto_start_timer', 'timer_sound_enabled'
+    ).first() or {}
+    routine_prefs = {}
+    if routine_id:
+        routine_prefs = RoutineTimerPreference.objects.filter(routine_id=routine_id).values(
+            *type_fields, 'auto_start_timer'
+        ).first() or {}
+    program_prefs = {}
+    if program_id:
+        program_prefs = ProgramTimerPreference.objects.filter(program_id=program_id).values(
+            *type_fields, 'auto_start_timer'
+        ).first() or {}
+
+    type_seconds = {}
+    type_sources = {}
+    for exercise_type in EXERCISE_TYPES:
+        name = f"{exercise_type}_timer_seconds"
+        # Routine and program forms store blanks as null (and the API stores 0 as null too)
+        for source, prefs in (('routine', routine_prefs), ('program', program_prefs), ('user', user_prefs)):
+            if prefs.get(name) is not None and (source == 'user' or prefs[name] > 0):
+                type_seconds[exercise_type], type_sources[exercise_type] = prefs[name], source
+                break
+        else:
+            type_seconds[exercise_type], type_sources[exercise_type] = SYSTEM_TIMER_SECONDS[exercise_type], 'system'
+
+    return TimerProfile(
+        type_seconds=type_seconds,
+        type_sources=type_sources,
+        auto_start=_first_set(
+            routine_prefs.get('auto_start_timer'), program_prefs.get('auto_start_timer'),
+            user_prefs.get('auto_start_timer'), DEFAULT_AUTO_START,
+        ),
+        sound_enabled=_first_set(user_prefs.get('timer_sound_enabled'), DEFAULT_SOUND_ENABLED),
+        overrides=dict(ExerciseTimerOverride.objects.filter(user_id=user_id).values_list('exercise_id', 'timer_seconds')),
+    )
+
+
+def get_timer_profile(user_id: int, routine_id: Optional[int] = None, program_id: Optional[int] = None) -> TimerProfile:
+    """The cached TimerProfile for a (user, routine, program), built on a miss."""
+    version = current_version(user_version_key(user_id))
+    if version is None:
+        return build_timer_profile(user_id, routine_id, program_id)
+
+    key = _profile_key(user_id, routine_id, program_id, version)
+    try:
+        data = cache.get(key)
+    except Exception as e:
+        print(f"Timer settings cache unavailable: {e}")
+        data = None
+    if data is not None:
+        return TimerProfile(**data)
+
+    profile = build_timer_profile(user_id, routine_id, program_id)
+    try:
+        cache.set(key, asdict(profile), TIMER_PROFILE_CACHE_TIMEOUT)
+    except Exception as e:
+        print(f"Could not cache timer settings: {e}")
+    return profile
+
+
+def program_for_routine(user_id: int, routine_id: Optional[int]) -> Optional[int]:
+    """The user's program containing the routine, preferring the active one."""
+    if not routine_id:
+        return None
+    return Program.objects.filter(user_id=user_id, program_routines__routine_id=routine_id).order_by(
+        '-is_active', 'id'
+    ).values_list('id', flat=True).first()
+
+
+def resolve_workout_timers(workout, workout_exercises: Optional[Iterable] = None, profiles: Optional[Dict] = None) -> Dict:
+    """
+    Timer settings for every exercise of `workout`, keyed by workout exercise
+    id (the id the workout page's timer controls carry):
+
+        {'timer_seconds': 150, 'source': 'routine', 'auto_start': True, 'sound_enabled': True}
+
+    Pass `workout_exercises` (with their exercises loaded) when the caller
+    already has them; otherwise they're read in one query. `profiles` is an
+    optional dict to share profiles between workouts of one response.
+    """
+    profiles = {} if profiles is None else profiles
+    context = (workout.user_id, workout.routine_source_id)
+    if context not in profiles:
+        program_id = program_for_routine(workout.user_id, workout.routine_source_id)
+        profiles[context] = get_timer_profile(workout.user_id, workout.routine_source_id, program_id)
+    profile = profiles[context]
+
+    if workout_exercises is None:
+        rows = workout.exercises.values_list('id', 'exercise_id', 'exercise_type', 'exercise__exercise_type')
+    else:
+        rows = (
+            (workout_exercise.id, workout_exercise.exercise_id, workout_exercise.exercise_type, workout_exercise.exercise.exercise_type)
+            for workout_exercise in workout_exercises
+        )
+    return {
+        workout_exercise_id: profile.resolve(exercise_id, exercise_type or default_type)
+        for workout_exercise_id, exercise_id, exercise_type, default_type in rows
+    }
+
+
+def invalidate_timer_settings(user_id: int) -> None:
+    """Bump the user's timer version; every cached profile of theirs goes stale."""
+    bump_version(user_version_key(user_id))
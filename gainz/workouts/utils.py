@@ -1,10 +1,18 @@
 import re
 from decimal import Decimal, ROUND_HALF_UP
-from datetime import date, timedelta
-from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Iterable, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Prefetch, Subquery, Window
+from django.db.models.functions import DenseRank
+from django.utils import timezone
 
 from gainz.workouts.models import Workout, ExerciseSet, RoutineExerciseSet, RoutineExercise, Routine, UserTimerPreference, WorkoutExercise
 from gainz.exercises.models import Exercise, ExerciseAlternativeName
+from gainz.exercises.name_index import find_exercise_by_name
+from gainz.workouts.sync import record_workout_tree
+from gainz.utils.set_upkeep import queue_created_sets
 
 
 # Helper to resolve target_reps string to an integer
@@ -84,64 +92,173 @@ def _get_weight_from_1rm_for_reps(one_rm_estimate, target_reps):
 
 
 def get_prefill_data(user, routine_exercise_set_template: RoutineExerciseSet, current_date: date):
-    suggested_reps = None
-    suggested_weight = None
-    
-    routine_exercise = routine_exercise_set_template.routine_exercise
-    base_exercise = routine_exercise.exercise
+    """Suggest reps/weight for a single planned set; see resolve_prefill."""
+    return resolve_prefill(user, [routine_exercise_set_template], current_date)[routine_exercise_set_template.id]
+
+
+def _apply_auto_progression(suggested_reps, suggested_weight, performance_feedback, timer_prefs):
+    """Adjust last session's reps/weight by the user's progression increments."""
+    if not (timer_prefs and timer_prefs.auto_progression_enabled and performance_feedback):
+        return suggested_reps, suggested_weight
+
+    if performance_feedback == 'increase':
+        # Try to increase weight first
+        if suggested_weight and timer_prefs.default_weight_increment:
+            suggested_weight = suggested_weight + timer_prefs.default_weight_increment
+        # If no weight or weight is bodyweight exercise, increase reps
+        elif timer_prefs.default_rep_increment:
+            suggested_reps = suggested_reps + timer_prefs.default_rep_increment
+
+    elif performance_feedback == 'decrease':
+        # Try to decrease weight first
+        if suggested_weight and timer_prefs.default_weight_increment:
+            new_weight = suggested_weight - timer_prefs.default_weight_increment
+            suggested_weight = max(new_weight, Decimal('0.0'))  # Don't go below 0
+        # If no weight or already at minimum weight, decrease reps
+        elif timer_prefs.default_rep_increment and suggested_reps > timer_prefs.default_rep_increment:
+            suggested_reps = suggested_reps - timer_prefs.default_rep_increment
+
+    return suggested_reps, suggested_weight
+
+
+def get_last_routine_sessions(user, routine_exercise_ids: Iterable[int]) -> Dict[int, Tuple[Optional[str], Dict[int, ExerciseSet]]]:
+    """
+    Return the sets logged the last time each routine exercise was performed.
+
+    A single windowed query ranks logged sets per routine exercise by workout
+    date (then exercise order) and keeps the most recent session. Maps routine
+    exercise id to (performance feedback, sets by set number).
+    """
+    routine_exercise_ids = list(routine_exercise_ids)
+    if not routine_exercise_ids:
+        return {}
+
+    sets = ExerciseSet.objects.filter(
+        workout_exercise__workout__user=user,
+        workout_exercise__routine_exercise_source_id__in=routine_exercise_ids,
+        # Ensure workout is from the same routine
+        workout_exercise__workout__routine_source_id=F('workout_exercise__routine_exercise_source__routine_id'),
+    ).annotate(
+        session_rank=Window(
+            expression=DenseRank(),
+            partition_by=[F('workout_exercise__routine_exercise_source_id')],
+            order_by=[
+                F('workout_exercise__workout__date').desc(),
+                F('workout_exercise__workout_id').desc(),
+                F('workout_exercise__order').asc(),
+                F('workout_exercise_id').asc(),
+            ],
+        ),
+    ).filter(session_rank=1).select_related('workout_exercise')
+
+    sessions: Dict[int, Tuple[Optional[str], Dict[int, ExerciseSet]]] = {}
+    for exercise_set in sets:
+        workout_exercise = exercise_set.workout_exercise
+        feedback, by_set_number = sessions.setdefault(
+            workout_exercise.routine_exercise_source_id,
+            (workout_exercise.performance_feedback, {}),
+        )
+        by_set_number.setdefault(exercise_set.set_number, exercise_set)
+    return sessions
+
+
+def resolve_prefill(user, set_templates: Iterable[RoutineExerciseSet], current_date: date) -> Dict[int, Dict[str, Optional[Decimal]]]:
+    """
+    Suggest reps/weight for many planned sets at once.
+
+    1. The set logged for the same set number the last time the routine
+       exercise was performed, adjusted by auto-progression.
+    2.-5. Template values, then the most recent session of the base exercise
+       (matching reps, else a 1RM-based estimate), else reps only.
+
+    Runs a fixed number of queries for any number of sets. Templates need
+    their routine_exercise loaded. Returns suggestions keyed by
+    RoutineExerciseSet id.
+    """
+    set_templates = list(set_templates)
+    if not set_templates:
+        return {}
 
     # Get user's auto-progression preferences
-    timer_prefs = None
-    try:
-        timer_prefs = UserTimerPreference.objects.get(user=user)
-    except UserTimerPreference.DoesNotExist:
-        pass
-
-    # --- 1. Last Logged Performance (Same Routine, Same Set Number) ---
-    # Find the most recent Workout by user linked to routine_exercise_set_template.routine_exercise.
-    # From that workout, get the actual reps and weight logged for the ExerciseSet
-    # corresponding to routine_exercise_set_template.set_number.
-    last_workout_with_routine_exercise = Workout.objects.filter(
+    timer_prefs = UserTimerPreference.objects.filter(user=user).first()
+
+    last_sessions = get_last_routine_sessions(
+        user,
+        {set_template.routine_exercise_id for set_template in set_templates},
+    )
+
+    suggestions: Dict[int, Dict[str, Optional[Decimal]]] = {}
+    fallback_templates = []
+    for set_template in set_templates:
+        # --- 1. Last Logged Performance (Same Routine, Same Set Number) ---
+        feedback, logged_sets = last_sessions.get(set_template.routine_exercise_id, (None, {}))
+        logged_set = logged_sets.get(set_template.set_number)
+        if logged_set is None:
+            fallback_templates.append(set_template)
+            continue
+
+        suggested_reps, suggested_weight = _apply_auto_progression(
+            logged_set.reps, logged_set.weight, feedback, timer_prefs
+        )
+        suggestions[set_template.id] = {'reps': suggested_reps, 'weight': suggested_weight}
+
+    if fallback_templates:
+        latest_sessions = get_latest_sessions_for_exercises(
+            user,
+            {set_template.routine_exercise.exercise_id for set_template in fallback_templates},
+        )
+        for set_template in fallback_templates:
+            suggestions[set_template.id] = _prefill_from_template(
+                set_template,
+                latest_sessions.get(set_template.routine_exercise.exercise_id),
+                current_date,
+            )
+
+    return suggestions
+
+
+def get_latest_sessions_for_exercises(user, exercise_ids: Iterable[int]) -> Dict[int, Tuple[datetime, List[ExerciseSet]]]:
+    """
+    Return the sets of the most recent workout containing each exercise.
+
+    One query for any number of exercises; maps exercise id to
+    (workout date, sets of that exercise in that workout).
+    """
+    exercise_ids = list(exercise_ids)
+    if not exercise_ids:
+        return {}
+
+    latest_workout = Workout.objects.filter(
         user=user,
-        routine_source=routine_exercise.routine, # Ensure workout is from the same routine
-        exercises__routine_exercise_source=routine_exercise # Link WorkoutExercise back to the RoutineExercise
-    ).order_by('-date').first()
-
-    if last_workout_with_routine_exercise:
-        workout_exercise_instance = last_workout_with_routine_exercise.exercises.filter(
-            routine_exercise_source=routine_exercise
-        ).first()
-        if workout_exercise_instance:
-            logged_set = ExerciseSet.objects.filter(
-                workout_exercise=workout_exercise_instance,
-                set_number=routine_exercise_set_template.set_number
-            ).first()
-            if logged_set:
-                suggested_reps = logged_set.reps
-                suggested_weight = logged_set.weight
-                
-                # Apply auto-progression if enabled and performance feedback exists
-                if (timer_prefs and timer_prefs.auto_progression_enabled and 
-                    workout_exercise_instance.performance_feedback):
-                    
-                    if workout_exercise_instance.performance_feedback == 'increase':
-                        # Try to increase weight first
-                        if suggested_weight and timer_prefs.default_weight_increment:
-                            suggested_weight = suggested_weight + timer_prefs.default_weight_increment
-                        # If no weight or weight is bodyweight exercise, increase reps
-                        elif timer_prefs.default_rep_increment:
-                            suggested_reps = suggested_reps + timer_prefs.default_rep_increment
-                            
-                    elif workout_exercise_instance.performance_feedback == 'decrease':
-                        # Try to decrease weight first
-                        if suggested_weight and timer_prefs.default_weight_increment:
-                            new_weight = suggested_weight - timer_prefs.default_weight_increment
-                            suggested_weight = max(new_weight, Decimal('0.0'))  # Don't go below 0
-                        # If no weight or already at minimum weight, decrease reps
-                        elif timer_prefs.default_rep_increment and suggested_reps > timer_prefs.default_rep_increment:
-                            suggested_reps = suggested_reps - timer_prefs.default_rep_increment
-                
-                return {'reps': suggested_reps, 'weight': suggested_weight}
+        exercises__exercise=OuterRef('workout_exercise__exercise'),
+    ).order_by('-date').values('id')[:1]
+
+    sets = ExerciseSet.objects.filter(
+        workout_exercise__workout__user=user,
+        workout_exercise__exercise_id__in=exercise_ids,
+        workout_exercise__workout_id=Subquery(latest_workout),
+    ).select_related('workout_exercise__workout')
+
+    sessions: Dict[int, Tuple[datetime, List[ExerciseSet]]] = {}
+    for exercise_set in sets:
+        workout_exercise = exercise_set.workout_exercise
+        sessions.setdefault(workout_exercise.exercise_id, (workout_exercise.workout.date, []))[1].append(exercise_set)
+    return sessions
+
+
+def _prefill_from_template(
+    routine_exercise_set_template: RoutineExerciseSet,
+    latest_session: Optional[Tuple[datetime, List[ExerciseSet]]],
+    current_date: date,
+) -> Dict[str, Optional[Decimal]]:
+    """
+    Suggest reps/weight for a planned set without a previous routine session.
+
+    `latest_session` is the (date, sets) of the most recent workout with the
+    same base exercise, as returned by get_latest_sessions_for_exercises.
+    """
+    suggested_reps = None
+    suggested_weight = None
 
     # --- 2. First Time with Routine - Use Template Values ---
     template_target_reps_int = _resolve_target_reps_to_integer(routine_exercise_set_template.target_reps)
@@ -150,87 +267,144 @@ def get_prefill_data(user, routine_exercise_set_template: RoutineExerciseSet, cu
     if template_target_reps_int is not None: # If target_reps is something, use it
         suggested_reps = template_target_reps_int
         if template_target_weight is not None:
-            suggested_weight = template_target_weight
-            # If both reps and weight are from template, we can return.
-            # If weight is null, we will proceed to try and find a weight.
-            return {'reps': suggested_reps, 'weight': suggested_weight} 
             # This rule only pre-fills both if both template values are present.
             # If only target_reps is present, we will use it but then try to find a weight in step 3 or 4.
-    
-    # If we are here, either the template didn't have weight, or didn't have reps.
+            return {'reps': suggested_reps, 'weight': template_target_weight}
+
     # We need a rep count for the next steps.
-    if suggested_reps is None and template_target_reps_int:
-        suggested_reps = template_target_reps_int
-    elif suggested_reps is None: # Still no reps, try to get a default (e.g. 10 if not specified at all)
+    if suggested_reps is None: # Still no reps, try to get a default (e.g. 10 if not specified at all)
         suggested_reps = _resolve_target_reps_to_integer(None) # Will use default_amrap_reps=10
 
-    # If template_target_weight was None, we proceed to find a weight using suggested_reps (which is now set)
+    if suggested_reps is None or latest_session is None:
+        # --- 5. Empty Field ---
+        return {'reps': suggested_reps, 'weight': None}
 
-    # --- 3. Match Reps in Most Recent Workout (Any Routine, Same Base Exercise) ---
-    if suggested_reps is not None: # We need a rep target for this logic
-        last_workout_with_base_exercise = Workout.objects.filter(
-            user=user,
-            exercises__exercise=base_exercise
-        ).order_by('-date').first()
+    last_workout_date, last_sets = latest_session
 
-        if last_workout_with_base_exercise:
-            # Find WorkoutExercise instances for the base exercise in that last workout
-            workout_exercises_for_base = last_workout_with_base_exercise.exercises.filter(exercise=base_exercise)
-            
-            matching_sets = ExerciseSet.objects.filter(
-                workout_exercise__in=workout_exercises_for_base,
-                reps=suggested_reps
-            ).order_by('-weight') # Heaviest weight first
-            
-            best_matching_set = matching_sets.first()
-            if best_matching_set:
-                suggested_weight = best_matching_set.weight
-                return {'reps': suggested_reps, 'weight': suggested_weight}
+    # --- 3. Match Reps in Most Recent Workout (Any Routine, Same Base Exercise) ---
+    matching_weights = [s_set.weight for s_set in last_sets if s_set.reps == suggested_reps]
+    if matching_weights:
+        return {'reps': suggested_reps, 'weight': max(matching_weights)} # Heaviest weight first
 
     # --- 4. Estimate via 1RM (from best set in last session, detraining adjustment) ---
-    if suggested_reps is not None: # We still need a rep target
-        template_target_reps_for_estimation = suggested_reps # Use the already resolved/defaulted rep count
+    if suggested_reps <= 15: # Rep Limit Check (Input)
+        highest_1rm_estimate = Decimal('0.0')
+        for s_set in last_sets:
+            if s_set.reps <= 15 and s_set.reps > 0 and s_set.weight > 0: # Rep Limit Check (Historical Set) and valid data
+                highest_1rm_estimate = max(highest_1rm_estimate, _calculate_epley_1rm(s_set.weight, s_set.reps))
 
-        if template_target_reps_for_estimation <= 15: # Rep Limit Check (Input)
-            last_workout_for_1rm = Workout.objects.filter(
-                user=user,
-                exercises__exercise=base_exercise
-            ).order_by('-date').first()
+        if highest_1rm_estimate > Decimal('0.0'):
+            estimated_weight_for_reps = _get_weight_from_1rm_for_reps(highest_1rm_estimate, suggested_reps)
 
-            if last_workout_for_1rm:
-                workout_exercises_for_1rm = last_workout_for_1rm.exercises.filter(exercise=base_exercise)
-                
-                highest_1rm_estimate = Decimal('0.0')
-                workout_date_for_highest_1rm = None
+            if estimated_weight_for_reps is not None:
+                # Detraining Adjustment
+                if (current_date - last_workout_date.date()) > timedelta(days=90): # > 3 months
+                    estimated_weight_for_reps *= Decimal('0.9') # Reduce by 10%
+                    estimated_weight_for_reps = estimated_weight_for_reps.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
-                sets_for_1rm_calc = ExerciseSet.objects.filter(workout_exercise__in=workout_exercises_for_1rm)
+                return {'reps': suggested_reps, 'weight': estimated_weight_for_reps}
 
-                for s_set in sets_for_1rm_calc:
-                    if s_set.reps <= 15 and s_set.reps > 0 and s_set.weight > 0: # Rep Limit Check (Historical Set) and valid data
-                        current_set_1rm = _calculate_epley_1rm(s_set.weight, s_set.reps)
-                        if current_set_1rm > highest_1rm_estimate:
-                            highest_1rm_estimate = current_set_1rm
-                            workout_date_for_highest_1rm = last_workout_for_1rm.date.date() # Store date part only
-                
-                if highest_1rm_estimate > Decimal('0.0'):
-                    estimated_weight_for_reps = _get_weight_from_1rm_for_reps(highest_1rm_estimate, template_target_reps_for_estimation)
-                    
-                    if estimated_weight_for_reps is not None:
-                        # Detraining Adjustment
-                        if workout_date_for_highest_1rm and (current_date - workout_date_for_highest_1rm) > timedelta(days=90): # > 3 months
-                            estimated_weight_for_reps *= Decimal('0.9') # Reduce by 10%
-                            estimated_weight_for_reps = estimated_weight_for_reps.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-                        suggested_weight = estimated_weight_for_reps
-                        return {'reps': suggested_reps, 'weight': suggested_weight}
-    
     # --- 5. Empty Field ---
-    # If suggested_reps has a value (from template or default), but no weight was found, return reps with None weight
-    if suggested_reps is not None and suggested_weight is None:
-        return {'reps': suggested_reps, 'weight': None}
-        
-    # If all else fails, return no pre-fill
-    return {'reps': None, 'weight': None}
+    # suggested_reps has a value (from template or default), but no weight was found
+    return {'reps': suggested_reps, 'weight': None}
+
+
+def instantiate_workout_from_routine(user, routine: Routine, current_date: Optional[date] = None) -> Workout:
+    """
+    Create a new workout from a routine in a fixed number of queries.
+
+    Clones the exercises and sets of the routine's most recent workout when
+    there is one; otherwise lays out the routine's planned sets with prefilled
+    reps and weights. Exercises and sets are written with bulk_create.
+    """
+    current_date = current_date or date.today()
+
+    # Auto-generate workout name: "Routine Name #X"
+    completed_count = Workout.objects.filter(user=user, routine_source=routine).count()
+
+    # Determine last workout for this routine (to clone if present)
+    last_workout = Workout.objects.filter(user=user, routine_source=routine).order_by('-date').first()
+
+    plan: List[Tuple[WorkoutExercise, List[ExerciseSet]]] = []
+    if last_workout:
+        # Clone last session structure: exercises and sets, preserving order and links
+        previous_exercises = last_workout.exercises.prefetch_related(
+            Prefetch('sets', queryset=ExerciseSet.objects.order_by('set_number'))
+        ).order_by('order')
+        for prev_we in previous_exercises:
+            plan.append((
+                WorkoutExercise(
+                    exercise_id=prev_we.exercise_id,
+                    order=prev_we.order,
+                    notes="",  # do not copy notes
+                    routine_exercise_source_id=prev_we.routine_exercise_source_id,
+                    exercise_type=prev_we.exercise_type,
+                    performance_feedback=prev_we.performance_feedback,
+                ),
+                [
+                    ExerciseSet(
+                        set_number=prev_set.set_number,
+                        reps=prev_set.reps,
+                        weight=prev_set.weight,
+                        is_warmup=prev_set.is_warmup,
+                    )
+                    for prev_set in prev_we.sets.all()
+                ],
+            ))
+    else:
+        # First time with this routine: use planned template + prefill
+        routine_exercises = list(
+            routine.exercises.select_related('exercise').prefetch_related('planned_sets').order_by('order')
+        )
+        prefill = resolve_prefill(
+            user,
+            [set_template for routine_exercise in routine_exercises for set_template in routine_exercise.planned_sets.all()],
+            current_date,
+        )
+        for routine_exercise in routine_exercises:
+            plan.append((
+                WorkoutExercise(
+                    exercise_id=routine_exercise.exercise_id,
+                    order=routine_exercise.order,
+                    notes="",
+                    routine_exercise_source=routine_exercise,
+                    exercise_type=routine_exercise.routine_specific_exercise_type or routine_exercise.exercise.exercise_type,
+                ),
+                [
+                    ExerciseSet(
+                        set_number=set_template.set_number,
+                        reps=prefill[set_template.id].get('reps', 0) or 0,
+                        weight=prefill[set_template.id].get('weight', 0) or 0,
+                        is_warmup=False,
+                    )
+                    for set_template in routine_exercise.planned_sets.all()
+                ],
+            ))
+
+    with transaction.atomic():
+        workout = Workout.objects.create(
+            user=user,
+            name=f"{routine.name} #{completed_count + 1}",
+            notes="",
+            date=timezone.now(),
+            routine_source=routine,
+        )
+
+        for workout_exercise, _ in plan:
+            workout_exercise.workout = workout
+        WorkoutExercise.objects.bulk_create([workout_exercise for workout_exercise, _ in plan])
+
+        exercise_sets = []
+        for workout_exercise, planned in plan:
+            for exercise_set in planned:
+                exercise_set.workout_exercise = workout_exercise
+                exercise_sets.append(exercise_set)
+        ExerciseSet.objects.bulk_create(exercise_sets)
+
+        queue_created_sets(workout, exercise_sets)
+        record_workout_tree(user.id, [], [workout_exercise for workout_exercise, _ in plan], exercise_sets)
+
+    return workout
 
 
 class WorkoutParser:
@@ -345,24 +519,10 @@ class WorkoutParser:
         # Clean the exercise name
         clean_name = exercise_name.strip()
         
-        # Try exact match (case-insensitive)
-        exercise = Exercise.objects.filter(name__iexact=clean_name).first()
-        if exercise:
-            return exercise
-        
-        # Try alternative names
-        alt_name = ExerciseAlternativeName.objects.filter(name__iexact=clean_name).first()
-        if alt_name:
-            return alt_name.exercise
-        
-        # Try fuzzy matching using the model's matches_name method
-        all_exercises = Exercise.objects.all()
-        for ex in all_exercises:
-            if ex.matches_name(clean_name):
-                return ex
-        
-        # If no match found, return None (will need to create)
-        return None
+        # Exact/alternative name match, then containment fuzzy matching
+        # (same rules as Exercise.matches_name), via the shared name index.
+        # If no match found, returns None (will need to create)
+        return find_exercise_by_name(clean_name)
     
     def parse_workout_days(self, text: str) -> List[List[Dict]]:
         """
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for the JSON rendering path (gainz/utils/json_rendering.py)
+
+Serializes a large exercise chart payload (points like api_exercise_chart_data
+returns, with Decimal and datetime values as they come out of the ORM) with
+the stdlib encoders and with orjson.
+
+    python scripts/benchmark_json.py            # 5 exercises x 2000 points
+    python scripts/benchmark_json.py 20000      # points per exercise
+"""
+import datetime
+import decimal
+import json
+import os
+import sys
+import timeit
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gainz.settings')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+django.setup()
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from rest_framework.renderers import JSONRenderer
+
+from gainz.utils.json_rendering import FastJsonResponse, OrjsonRenderer, orjson
+
+
+def chart_payload(points_per_exercise):
+    start = datetime.datetime(2020, 1, 1, 7, 30, tzinfo=datetime.timezone.utc)
+    exercises = {}
+    for exercise_id in range(1, 6):
+        points = []
+        for day in range(points_per_exercise):
+            weight = decimal.Decimal('60.00') + decimal.Decimal(day % 40) * decimal.Decimal('2.50')
+            reps = 3 + day % 8
+            points.append({
+                'x': start + datetime.timedelta(days=day),
+                'date': (start + datetime.timedelta(days=day)).date(),
+                'y': weight * (1 + decimal.Decimal('0.0333') * reps),
+                'estimated_1rm': weight * (1 + decimal.Decimal('0.0333') * reps),
+                'weight': weight,
+                'volume': weight * reps * 3,
+                'workout_id': 100000 + day,
+            })
+        exercises[exercise_id] = {'exercise_name': f'Exercise {exercise_id}', 'data': points}
+    return {'success': True, 'period_days': points_per_exercise, 'exercises': exercises}
+
+
+def run(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print(f"  {label:<45} {seconds * 1000:8.2f} ms")
+    return seconds
+
+
+def main(points_per_exercise):
+    payload = chart_payload(points_per_exercise)
+    size = len(JsonResponse(payload).content)
+    print(f"Chart payload: 5 exercises x {points_per_exercise} points, {size / 1024:.0f} KiB of JSON")
+    if orjson is None:
+        print("  orjson is not installed: the fast path falls back to the stdlib encoders")
+
+    number = max(1, 20000 // points_per_exercise)
+    print("JsonResponse views:")
+    stdlib = run('django.http.JsonResponse (DjangoJSONEncoder)', lambda: JsonResponse(payload), number)
+    fast = run('FastJsonResponse (orjson)', lambda: FastJsonResponse(payload), number)
+    print(f"  speedup: {stdlib / fast:.1f}x")
+
+    # DRF serializers hand the renderer strings for Decimals, so compare on that shape
+    drf_payload = json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+    print("DRF renderer:")
+    stdlib = run('rest_framework JSONRenderer', lambda: JSONRenderer().render(drf_payload), number)
+    fast = run('OrjsonRenderer', lambda: OrjsonRenderer().render(drf_payload), number)
+    print(f"  speedup: {stdlib / fast:.1f}x")
+
+    # Same data either way (apart from sub-millisecond digits in datetimes)
+    assert json.loads(FastJsonResponse(drf_payload).content) == drf_payload
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
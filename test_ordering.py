@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 """
-Simple test script to verify the exercise ordering logic
+Test and benchmark script for the exercise ordering engine (gainz/workouts/ordering.py)
+
+    python test_ordering.py              # ordering checks + benchmark with 200 exercises
+    python test_ordering.py 1000         # benchmark a bigger workout
 """
 import os
 import sys
+import time
 import django
 
 # Setup Django
@@ -11,28 +15,57 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 sys.path.insert(0, os.path.dirname(__file__))
 django.setup()
 
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
 from gainz.workouts.models import Workout, WorkoutExercise
+from gainz.workouts.ordering import insert_order_key, reorder_exercises
 from gainz.exercises.models import Exercise
 from django.contrib.auth.models import User
 
-def test_ordering_logic():
-    print("Testing exercise ordering logic...")
+EXERCISE_TYPES = ['primary', 'secondary', 'accessory']
 
-    # Create a test user if it doesn't exist
+
+def get_test_workout(name):
     user, created = User.objects.get_or_create(
         username='testuser',
         defaults={'email': 'test@example.com'}
     )
-
-    # Create a test workout
     workout, created = Workout.objects.get_or_create(
-        name='Test Workout',
+        name=name,
         user=user,
         defaults={'date': '2024-01-01'}
     )
+    # Clear existing workout exercises
+    workout.exercises.all().delete()
+    return workout
+
+
+def add_exercise(workout, exercise, ex_type, current_exercise_id=None):
+    # The type is set on the workout exercise, so exercises already in the database keep theirs
+    with transaction.atomic():
+        order = insert_order_key(workout, ex_type, current_exercise_id)
+        return WorkoutExercise.objects.create(workout=workout, exercise=exercise, exercise_type=ex_type, order=order)
+
+
+def reorder_updates(queries):
+    """UPDATE statements on workout exercise rows (one bulk update counts once)."""
+    table = WorkoutExercise._meta.db_table
+    return sum(1 for q in queries.captured_queries if q['sql'].startswith(f'UPDATE "{table}"'))
+
+
+def ordered_names(workout):
+    return [we.exercise.name for we in workout.exercises.select_related('exercise').order_by('order')]
+
+
+def test_ordering_logic():
+    print("Testing exercise ordering logic...")
+
+    workout = get_test_workout('Test Workout')
 
     # Create some test exercises
-    exercises = []
+    exercises = {}
+    types = {}
     for name, ex_type in [
         ('Bench Press', 'primary'),
         ('Squat', 'primary'),
@@ -41,70 +74,122 @@ def test_ordering_logic():
         ('Rows', 'secondary'),
         ('Dips', 'secondary'),
         ('Curls', 'accessory'),
-        ('Tricep Extensions', 'accessory')
+        ('Tricep Extensions', 'accessory'),
+        ('Overhead Press', 'primary'),
+        ('Lunges', 'secondary'),
+        ('Face Pulls', 'accessory'),
+        ('Push-ups', 'primary'),
     ]:
         exercise, created = Exercise.objects.get_or_create(
             name=name,
             defaults={'exercise_type': ex_type}
         )
-        exercises.append(exercise)
-
-    # Clear existing workout exercises
-    workout.exercises.all().delete()
+        exercises[name] = exercise
+        types[name] = ex_type
 
-    # Add exercises in order to simulate existing workout
+    # Legacy sequential orders, as importers create them; the engine rebalances them on first edit
     workout_exercises = []
-    for i, exercise in enumerate(exercises):
-        we = WorkoutExercise.objects.create(
-            workout=workout,
-            exercise=exercise,
-            order=i
-        )
-        workout_exercises.append(we)
+    for i, name in enumerate(['Bench Press', 'Pull-ups', 'Squat', 'Rows', 'Curls', 'Deadlift', 'Dips', 'Tricep Extensions']):
+        workout_exercises.append(WorkoutExercise.objects.create(
+            workout=workout, exercise=exercises[name], exercise_type=types[name], order=i
+        ))
+    by_name = {we.exercise.name: we for we in workout_exercises}
 
     print("Created workout with exercises:")
     for we in workout_exercises:
         print(f"  {we.exercise.name} ({we.get_exercise_type()}) - order: {we.order}")
 
-    # Test the ordering logic by simulating adding new exercises
-    from gainz.views import WorkoutViewSet
-
-    viewset = WorkoutViewSet()
-    viewset.request = type('Request', (), {'user': user})()
-
     # Test cases
     test_cases = [
-        # (new_exercise_name, current_exercise_index, expected_description)
-        ('Overhead Press', 0, 'Add primary while viewing first primary'),
-        ('Lunges', 3, 'Add secondary while viewing first secondary'),
-        ('Face Pulls', 3, 'Add accessory while viewing first secondary'),
-        ('Push-ups', 6, 'Add primary while viewing accessory'),
+        # (new_exercise_name, current_exercise_name, expected_description)
+        ('Overhead Press', 'Bench Press', 'Add primary while viewing first primary'),
+        ('Lunges', 'Pull-ups', 'Add secondary while viewing first secondary'),
+        ('Face Pulls', 'Pull-ups', 'Add accessory while viewing first secondary'),
+        ('Push-ups', 'Curls', 'Add primary while viewing accessory'),
     ]
 
-    for new_ex_name, current_idx, description in test_cases:
-        # Find the new exercise
-        try:
-            new_ex = Exercise.objects.get(name=new_ex_name)
-        except Exercise.DoesNotExist:
-            # Create it if it doesn't exist
-            new_ex = Exercise.objects.create(name=new_ex_name, exercise_type='primary')
-
-        current_ex_id = workout_exercises[current_idx].id if current_idx < len(workout_exercises) else None
-
-        # Calculate order
-        new_order = viewset._calculate_exercise_order(workout, new_ex.id, current_ex_id)
+    for new_ex_name, current_name, description in test_cases:
+        new_ex = exercises[new_ex_name]
+        we = add_exercise(workout, new_ex, types[new_ex_name], by_name[current_name].id)
+        by_name[new_ex_name] = we
 
+        names = ordered_names(workout)
         print(f"\n{description}:")
-        print(f"  Adding {new_ex.name} ({new_ex.exercise_type}) while viewing {workout_exercises[current_idx].exercise.name if current_idx < len(workout_exercises) else 'none'}")
-        print(f"  Calculated order: {new_order}")
+        print(f"  Adding {new_ex.name} ({types[new_ex_name]}) while viewing {current_name}")
+        print(f"  Order key: {we.order}")
+        print(f"  Inserted at position: {names.index(new_ex_name) + 1}")
+
+    expected = [
+        'Bench Press', 'Overhead Press', 'Squat', 'Deadlift', 'Push-ups',
+        'Pull-ups', 'Lunges', 'Rows', 'Dips',
+        'Face Pulls', 'Curls', 'Tricep Extensions',
+    ]
+    result = ordered_names(workout)
+    print(f"\nFinal order: {result}")
+    assert result == expected, f"Expected {expected}"
+
+    # Moving one exercise rewrites one row
+    primaries = ['Deadlift', 'Bench Press', 'Overhead Press', 'Squat', 'Push-ups']
+    with transaction.atomic():
+        written = reorder_exercises(workout, [by_name[name].id for name in primaries])
+    print(f"Moved Deadlift to the top: {written} row(s) written")
+    assert written == 1
+    assert ordered_names(workout)[:5] == primaries
+    print("Ordering checks passed.")
+
+
+def benchmark(size):
+    print(f"\nBenchmark: workout with {size} exercises")
+    workout = get_test_workout('Ordering Benchmark')
+    exercise, created = Exercise.objects.get_or_create(
+        name='Benchmark Exercise',
+        defaults={'exercise_type': 'primary'}
+    )
+
+    # Build the workout through the engine: first appending to each type, then inserting right
+    # after the first exercise of a type, the worst spot for the gaps
+    first_of_type = {}
+    for label, count, after_first in [('appends', size // 2, False), ('inserts after first', size - size // 2, True)]:
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(count):
+                ex_type = EXERCISE_TYPES[i % 3]
+                current_id = first_of_type.get(ex_type) if after_first else None
+                we = add_exercise(workout, exercise, ex_type, current_id)
+                first_of_type.setdefault(ex_type, we.id)
+        elapsed = time.perf_counter() - started
+        updates = reorder_updates(queries)
+        print(f"  {count} {label}: {elapsed:.2f}s, {len(queries)} queries, {updates} order updates "
+              f"({updates / count:.2f} per insert, rebalances included)")
+
+    # Move the last exercise of each type to the front of its type, like a drag and drop would
+    moves = 0
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(20):
+            for ex_type in EXERCISE_TYPES:
+                ids = list(workout.exercises.filter(exercise_type=ex_type).order_by('order').values_list('id', flat=True))
+                with transaction.atomic():
+                    reorder_exercises(workout, ids[-1:] + ids[:-1])
+                moves += 1
+    elapsed = time.perf_counter() - started
+    updates = reorder_updates(queries)
+    print(f"  {moves} moves: {elapsed:.2f}s, {updates} order updates ({updates / moves:.2f} per move)")
+
+    # For comparison: renumbering every row, as each add/delete used to
+    all_exercises = list(workout.exercises.all())
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        with transaction.atomic():
+            for index, we in enumerate(all_exercises):
+                we.order = index
+                we.save()
+    elapsed = time.perf_counter() - started
+    print(f"  One full renumber (previous behaviour, per insert): {elapsed:.3f}s, {len(queries)} queries")
 
-        # Show where it would be inserted
-        existing_orders = [we.order for we in workout_exercises]
-        existing_orders.append(new_order)
-        existing_orders.sort()
+    workout.exercises.all().delete()
 
-        position = existing_orders.index(new_order) + 1
-        print(f"  Would be inserted at position: {position}")
 
 if __name__ == '__main__':
     test_ordering_logic()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)